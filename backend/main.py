@@ -1,4 +1,4 @@
-from firebase_functions import https_fn
+from firebase_functions import https_fn, firestore_fn, scheduler_fn
 import os
 from dotenv import load_dotenv
 
@@ -7,18 +7,33 @@ load_dotenv('.env')
 
 # Import after loading env variables
 import firebase_admin
-from firebase_admin import firestore, storage
+from firebase_admin import firestore
 from flask import Flask, request, jsonify
-from flask_cors import CORS
+import click
 from datetime import datetime
 import uuid
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
-# WhatsApp service imports
-import asyncio
-from twilio.rest import Client
+# Twilio (aiohttp), smtplib/email.mime and Firebase Storage are imported lazily on
+# first use so cold starts (e.g. GET /api/health) don't pay for them
+
+# Firebase entry point dispatch
+from utils.wsgi_bridge import WSGIBridge
+from utils.conditional_get import conditional_json_response
+from utils.cors import CORSLayer
+from utils.phone import whatsapp_address
+from services.cache_service import public_cache
+from services.outbox_service import OutboxWorker, enqueue_notification
+from services.smtp_pool_service import SMTPConnectionPool
+from services.gallery_snapshot_service import PublicGallerySnapshot
+from services.client_index_service import booking_for_event, rebuild_client_index
+from services.rollup_service import rebuild_rollups
+from services.booking_write_service import (
+    record_new_booking, record_new_event, apply_booking_update, apply_event_update
+)
+from services.analytics_snapshot_service import AnalyticsSnapshot
+from services.audience_service import rebuild_audiences
+from services.reminder_service import backfill_reminder_queue
+from services.delivery_log_service import delivery_log
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -28,25 +43,47 @@ TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
 TWILIO_WHATSAPP_FROM = os.getenv('TWILIO_WHATSAPP_FROM', 'whatsapp:+14155238886')
 
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN else None
+_twilio_sender = None
+
+def get_twilio_sender():
+    """Get the shared Twilio sender (pooled keep-alive HTTP session) with lazy initialization"""
+    global _twilio_sender
+    if _twilio_sender is None and TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
+        from services.twilio_transport import TwilioSender
+        _twilio_sender = TwilioSender(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_FROM)
+    return _twilio_sender
+
+_smtp_pool = None
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """Get the shared SMTP pool; sessions are opened, STARTTLS'd and logged in once and reused"""
+    global _smtp_pool
+    if _smtp_pool is None:
+        _smtp_pool = SMTPConnectionPool(
+            os.getenv('EMAIL_SERVER', 'smtp.gmail.com'),
+            int(os.getenv('EMAIL_PORT', 587)),
+            username=os.getenv('EMAIL_USERNAME'),
+            password=os.getenv('EMAIL_PASSWORD'),
+            max_connections=int(os.getenv('EMAIL_POOL_SIZE', 2)),
+            idle_timeout=int(os.getenv('EMAIL_POOL_IDLE_TIMEOUT', 240))
+        )
+    return _smtp_pool
 
-async def send_whatsapp_notification(phone: str, message: str, notification_type: str) -> bool:
-    """Send WhatsApp notification using Twilio"""
-    if not twilio_client:
+def send_whatsapp_notification(phone: str, message: str, notification_type: str) -> bool:
+    """Send WhatsApp notification using Twilio (blocks only the calling request, not an event loop)"""
+    twilio_sender = get_twilio_sender()
+    if not twilio_sender:
         print("Twilio client not configured")
         return False
 
     try:
-        if not phone.startswith('whatsapp:'):
-            if not phone.startswith('+'):
-                phone = '+' + phone
-            phone = f'whatsapp:{phone}'
-
-        message_instance = twilio_client.messages.create(
-            body=message,
-            from_=TWILIO_WHATSAPP_FROM,
-            to=phone
-        )
+        address = whatsapp_address(phone)
+        if address is None:
+            print(f"Invalid phone number: {phone}")
+            return False
+        phone = address
+
+        twilio_sender.send_sync(phone, message)
 
         print(f"WhatsApp sent successfully to {phone}")
         return True
@@ -58,11 +95,12 @@ async def send_whatsapp_notification(phone: str, message: str, notification_type
 def send_admin_email_notification(booking_data: dict) -> bool:
     """Send email notification to admin about new booking"""
     try:
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
         service_name = 'Pizzeros en Acción' if booking_data.get('service_type') == 'workshop' else 'Pizza Party'
 
         # Email configuration
-        smtp_server = os.getenv('EMAIL_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('EMAIL_PORT', 587))
         email_username = os.getenv('EMAIL_USERNAME')
         email_password = os.getenv('EMAIL_PASSWORD')
         email_from = os.getenv('EMAIL_FROM')
@@ -118,11 +156,7 @@ def send_admin_email_notification(booking_data: dict) -> bool:
         msg.attach(MIMEText(html_content, 'html'))
 
         # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_username, email_password)
-        server.send_message(msg)
-        server.quit()
+        get_smtp_pool().send_message(msg)
 
         print(f"Admin email notification sent successfully")
         return True
@@ -213,7 +247,23 @@ cors_origins = os.getenv('CORS_ORIGINS', '')
 if cors_origins:
     allowed_origins.extend(cors_origins.split(','))
 
-CORS(app, origins=allowed_origins)
+# Preflights are answered before routing and cached by browsers for CORS_MAX_AGE seconds.
+# The public gallery reads keep answering any origin with *, as they always did
+CORSLayer(
+    app,
+    origins=allowed_origins,
+    max_age=int(os.getenv('CORS_MAX_AGE', 86400)),
+    public_paths=('/api/gallery/public', '/api/gallery/event/')
+)
+
+# Delivery log records are written before each invocation ends: the CPU is
+# throttled once the response is sent, and SIGTERM closes the buffer on shutdown
+@app.after_request
+def flush_delivery_log(response):
+    delivery_log.flush()
+    return response
+
+delivery_log.install_sigterm_handler()
 
 # Firebase initialization with lazy loading
 _db = None
@@ -243,14 +293,35 @@ def get_db():
         _db = firestore.client()
     return _db
 
+_bucket = None
+
+def get_storage_bucket():
+    """Get default Firebase Storage bucket with lazy initialization"""
+    global _bucket
+    if _bucket is None:
+        from firebase_admin import storage
+        get_db()  # Ensures the Firebase app is initialized
+        _bucket = storage.bucket()
+    return _bucket
+
+def refresh_public_gallery(event_id: str):
+    """Update one event in the materialized public gallery; never fails the calling write"""
+    if event_id:
+        try:
+            PublicGallerySnapshot(get_db()).refresh_event(event_id)
+        except Exception as e:
+            print(f"Error refreshing public gallery for event {event_id}: {e}")
+    public_cache.invalidate("gallery_public")
+
 def send_confirmation_email(booking_data: dict) -> bool:
     """Send professional HTML confirmation email to client"""
     try:
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
         print(f"Enviando email de confirmación a: {booking_data.get('client_email')}")
 
         # Email configuration from environment variables
-        smtp_server = os.getenv('EMAIL_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('EMAIL_PORT', 587))
         email_username = os.getenv('EMAIL_USERNAME')
         email_password = os.getenv('EMAIL_PASSWORD')
         email_from = os.getenv('EMAIL_FROM')
@@ -738,12 +809,7 @@ def send_confirmation_email(booking_data: dict) -> bool:
             print("Invitación de calendario agregada al email")
 
         # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_username, email_password)
-        text = msg.as_string()
-        server.sendmail(email_from, booking_data.get('client_email'), text)
-        server.quit()
+        get_smtp_pool().send_message(msg, email_from, [booking_data.get('client_email')])
 
         # Save email record to Firestore
         try:
@@ -868,9 +934,14 @@ def create_event_from_booking(booking_data: dict) -> bool:
             "source": "auto_booking"  # Indicador de que fue creado automáticamente
         }
         
-        # Save to Firestore events collection
+        # Save to Firestore events collection together with the client ledger
         db = get_db()
-        db.collection("events").document(event_id).set(event_data)
+        batch = db.batch()
+        batch.set(db.collection("events").document(event_id), event_data)
+        record_new_event(db, batch, event_data, booking_data, event_date)
+        batch.commit()
+        public_cache.invalidate("events_list")
+        refresh_public_gallery(event_id)
         
         print(f"Evento creado exitosamente: {event_id} para booking {booking_data.get('id')}")
         return True
@@ -919,6 +990,12 @@ def root():
         "environment": os.getenv('ENVIRONMENT', 'production')
     })
 
+# Cache statistics endpoint
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the public read cache"""
+    return jsonify(public_cache.stats()), 200
+
 # Bookings endpoint
 @app.route('/api/bookings/', methods=['POST'])
 def create_booking():
@@ -956,31 +1033,11 @@ def create_booking():
             "estimated_price": estimated_price
         }
 
-        # Save to Firestore
-        db = get_db()
-        db.collection("bookings").document(booking_id).set(booking_data)
-        print(f"GUARDADO EN FIRESTORE: {booking_id} con precio ${estimated_price}")
-
-        # Send EMAIL notification to admin about new booking
-        try:
-            print(f"Enviando email de notificación de nuevo agendamiento al admin")
-            email_sent = send_admin_email_notification(booking_data)
-
-            if email_sent:
-                print(f"Email de notificación de nuevo agendamiento enviado exitosamente al admin")
-            else:
-                print(f"Error al enviar email de notificación de nuevo agendamiento al admin")
-
-        except Exception as e:
-            print(f"Error enviando email al admin: {e}")
-            # No fallar la creación de la reserva si falla la notificación
-
-        # Send WhatsApp notification to admin about new booking
-        try:
-            admin_phone = os.getenv('ADMIN_WHATSAPP_NUMBER', '+56989424566')
-            service_name = 'Pizzeros en Acción' if booking_data.get('service_type') == 'workshop' else 'Pizza Party'
+        service_name = 'Pizzeros en Acción' if booking_data.get('service_type') == 'workshop' else 'Pizza Party'
 
-            admin_whatsapp_message = f"""🍕 *Pablo's Pizza - NUEVO AGENDAMIENTO*
+        # WhatsApp notification for admin about new booking
+        admin_phone = os.getenv('ADMIN_WHATSAPP_NUMBER', '+56989424566')
+        admin_whatsapp_message = f"""🍕 *Pablo's Pizza - NUEVO AGENDAMIENTO*
 
 ¡Te acaban de agendar un evento!
 
@@ -999,28 +1056,9 @@ def create_booking():
 
 ID: {booking_data.get('id', 'N/A')}"""
 
-            print(f"Enviando WhatsApp de nueva reserva al admin: {admin_phone}")
-            admin_whatsapp_sent = asyncio.run(send_whatsapp_notification(
-                admin_phone,
-                admin_whatsapp_message,
-                "new_booking_admin_alert"
-            ))
-
-            if admin_whatsapp_sent:
-                print(f"WhatsApp de nueva reserva enviado exitosamente al admin")
-            else:
-                print(f"Error al enviar WhatsApp de nueva reserva al admin")
-
-        except Exception as e:
-            print(f"Error enviando WhatsApp al admin: {e}")
-            # No fallar la creación de la reserva si falla la notificación
-
-        # Send WhatsApp notification to business partner about new booking
-        try:
-            partner_phone = os.getenv('PARTNER_WHATSAPP_NUMBER', '+56961093818')
-            service_name = 'Pizzeros en Acción' if booking_data.get('service_type') == 'workshop' else 'Pizza Party'
-
-            partner_message = f"""🍕 *Pablo's Pizza - NUEVO AGENDAMIENTO*
+        # WhatsApp notification for business partner about new booking
+        partner_phone = os.getenv('PARTNER_WHATSAPP_NUMBER', '+56961093818')
+        partner_message = f"""🍕 *Pablo's Pizza - NUEVO AGENDAMIENTO*
 
 ¡Hola! Te informo que acabamos de recibir una nueva reserva:
 
@@ -1036,21 +1074,26 @@ ID: {booking_data.get('id', 'N/A')}"""
 
 ¡Excelente! 🎉"""
 
-            print(f"Enviando WhatsApp de nueva reserva al socio: {partner_phone}")
-            whatsapp_sent = asyncio.run(send_whatsapp_notification(
-                partner_phone,
-                partner_message,
-                "new_booking_partner_alert"
-            ))
-
-            if whatsapp_sent:
-                print(f"WhatsApp de nueva reserva enviado exitosamente al socio")
-            else:
-                print(f"Error al enviar WhatsApp de nueva reserva al socio")
-
-        except Exception as e:
-            print(f"Error enviando WhatsApp al socio: {e}")
-            # No fallar la creación de la reserva si falla la notificación
+        # Save booking and its notification jobs in a single batch; the outbox
+        # worker sends them, so this request only waits on the Firestore write
+        db = get_db()
+        batch = db.batch()
+        batch.set(db.collection("bookings").document(booking_id), booking_data)
+        enqueue_notification(db, batch, "admin_email", {"booking": booking_data}, booking_id)
+        enqueue_notification(db, batch, "whatsapp", {
+            "phone": admin_phone,
+            "message": admin_whatsapp_message,
+            "notification_type": "new_booking_admin_alert"
+        }, booking_id)
+        enqueue_notification(db, batch, "whatsapp", {
+            "phone": partner_phone,
+            "message": partner_message,
+            "notification_type": "new_booking_partner_alert"
+        }, booking_id)
+        record_new_booking(db, batch, booking_id, booking_data)
+        batch.commit()
+        public_cache.invalidate("dashboard")
+        print(f"GUARDADO EN FIRESTORE: {booking_id} con precio ${estimated_price} y 3 notificaciones encoladas")
 
         return jsonify(booking_data), 201
 
@@ -1059,20 +1102,86 @@ ID: {booking_data.get('id', 'N/A')}"""
         return jsonify({"error": str(e)}), 500
 
 # Get bookings endpoint
+BOOKINGS_MAX_PAGE_SIZE = 500
+
 @app.route('/api/bookings/', methods=['GET'])
 def get_bookings():
-    """Get all bookings"""
+    """
+    Get bookings, filtered and paginated in the Firestore query
+
+    Query parameters:
+        status, service_type: equality filters
+        event_date_from, event_date_to: inclusive YYYY-MM-DD range on event_date
+        fields: comma-separated projection (e.g. fields=client_name,status,event_date)
+        limit: page size; when given the response is {"bookings": [...], "next_cursor": ...}
+        start_after: next_cursor value from the previous page
+
+    Without limit the response is the plain list of bookings, as before.
+    """
     try:
         db = get_db()
         bookings_ref = db.collection("bookings")
-        bookings = []
+        query = bookings_ref
+
+        status = request.args.get('status')
+        service_type = request.args.get('service_type')
+        event_date_from = request.args.get('event_date_from')
+        event_date_to = request.args.get('event_date_to')
+
+        if status:
+            query = query.where("status", "==", status)
+        if service_type:
+            query = query.where("service_type", "==", service_type)
+
+        if event_date_from:
+            query = query.where("event_date", ">=", event_date_from)
+        if event_date_to:
+            # event_date may carry a time part (YYYY-MM-DDTHH:MM), keep the whole last day
+            query = query.where("event_date", "<=", f"{event_date_to}\uf8ff")
+
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+        if fields:
+            query = query.select(fields)
+
+        limit = request.args.get('limit')
+        cursor = request.args.get('start_after')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                return jsonify({"error": "limit must be an integer"}), 400
+            if limit < 1:
+                return jsonify({"error": "limit must be positive"}), 400
+            limit = min(limit, BOOKINGS_MAX_PAGE_SIZE)
+
+        # Pages need a stable order; a range filter requires event_date as the first sort key
+        if limit is not None or cursor:
+            if event_date_from or event_date_to:
+                query = query.order_by("event_date")
+            else:
+                query = query.order_by("created_at", direction=firestore.Query.DESCENDING)
+
+        if cursor:
+            cursor_doc = bookings_ref.document(cursor).get()
+            if not cursor_doc.exists:
+                return jsonify({"error": "Invalid start_after cursor"}), 400
+            query = query.start_after(cursor_doc)
+
+        if limit is not None:
+            query = query.limit(limit)
 
-        for doc in bookings_ref.stream():
+        bookings = []
+        for doc in query.stream():
             booking = doc.to_dict()
             booking['id'] = doc.id
             bookings.append(booking)
 
-        return jsonify(bookings), 200
+        if limit is None:
+            return conditional_json_response(bookings)
+
+        # A full page means there may be more; the last id is the cursor for the next one
+        next_cursor = bookings[-1]['id'] if len(bookings) == limit else None
+        return conditional_json_response({"bookings": bookings, "next_cursor": next_cursor})
 
     except Exception as e:
         print(f"Error getting bookings: {e}")
@@ -1103,6 +1212,10 @@ def get_booking(booking_id):
 def get_events():
     """Get all events"""
     try:
+        cached_events = public_cache.get("events_list")
+        if cached_events is not None:
+            return conditional_json_response(cached_events)
+
         db = get_db()
         events_ref = db.collection("events").order_by("created_at", direction=firestore.Query.DESCENDING)
         events = []
@@ -1112,7 +1225,8 @@ def get_events():
             event['id'] = doc.id
             events.append(event)
 
-        return jsonify(events), 200
+        public_cache.set("events_list", events)
+        return conditional_json_response(events)
 
     except Exception as e:
         print(f"Error getting events: {e}")
@@ -1157,9 +1271,15 @@ def create_event():
             'age_group': data.get('age_group', 'Todas las edades')
         }
 
-        # Add to database
-        doc_ref = db.collection("events").add(event_data)
-        event_id = doc_ref[1].id
+        # Add to database together with the client ledger and the rollups
+        event_ref = db.collection("events").document()
+        booking = booking_for_event(db, event_data['booking_id'])
+        batch = db.batch()
+        batch.set(event_ref, event_data)
+        record_new_event(db, batch, event_data, booking, event_data['event_date'])
+        batch.commit()
+        event_id = event_ref.id
+        public_cache.invalidate("events_list")
 
         # Return created event
         event_data['id'] = event_id
@@ -1217,8 +1337,10 @@ def update_event(event_id):
         # Add update timestamp
         update_data['updated_at'] = datetime.now()
 
-        # Update in Firestore
-        doc_ref.update(update_data)
+        # Update in Firestore; price and cost changes move the client ledger and the rollups
+        apply_event_update(db, doc_ref, update_data)
+        public_cache.invalidate("events_list")
+        refresh_public_gallery(event_id)
 
         # Get updated event data
         updated_doc = doc_ref.get()
@@ -1231,24 +1353,13 @@ def update_event(event_id):
         print(f"Error updating event: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/events/<event_id>/publish', methods=['PUT', 'OPTIONS'])
+@app.route('/api/events/<event_id>/publish', methods=['PUT'])
 def publish_event(event_id):
     """Publish or unpublish an event"""
-    # Handle preflight OPTIONS request
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
-        return response
-
     try:
         data = request.get_json()
         if not data:
             response = jsonify({"error": "No data provided"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
             return response, 400
 
         db = get_db()
@@ -1257,9 +1368,6 @@ def publish_event(event_id):
 
         if not doc.exists:
             response = jsonify({"error": "Event not found"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
             return response, 404
 
         # Update publication fields
@@ -1273,6 +1381,8 @@ def publish_event(event_id):
 
         # Update in Firestore
         doc_ref.update(update_data)
+        public_cache.invalidate("events_list")
+        refresh_public_gallery(event_id)
 
         # Get updated event data
         updated_doc = doc_ref.get()
@@ -1282,37 +1392,20 @@ def publish_event(event_id):
         print(f"✅ Event {event_id} publication status updated: published={update_data['is_published']}")
 
         response = jsonify(updated_event)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
         return response, 200
 
     except Exception as e:
         print(f"Error publishing event: {e}")
         response = jsonify({"error": str(e)})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
         return response, 500
 
-@app.route('/api/gallery/<photo_id>/publish', methods=['PUT', 'OPTIONS'])
+@app.route('/api/gallery/<photo_id>/publish', methods=['PUT'])
 def publish_gallery_photo(photo_id):
     """Publish or unpublish a gallery photo"""
-    # Handle preflight OPTIONS request
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
-        return response
-
     try:
         data = request.get_json()
         if not data:
             response = jsonify({"error": "No data provided"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
             return response, 400
 
         db = get_db()
@@ -1321,9 +1414,6 @@ def publish_gallery_photo(photo_id):
 
         if not doc.exists:
             response = jsonify({"error": "Photo not found"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
             return response, 404
 
         # Update publication status
@@ -1334,6 +1424,7 @@ def publish_gallery_photo(photo_id):
 
         # Update in Firestore
         doc_ref.update(update_data)
+        refresh_public_gallery(doc.to_dict().get('event_id'))
 
         # Get updated photo data
         updated_doc = doc_ref.get()
@@ -1343,17 +1434,11 @@ def publish_gallery_photo(photo_id):
         print(f"✅ Photo {photo_id} publication status updated: published={update_data['is_published']}")
 
         response = jsonify(updated_photo)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
         return response, 200
 
     except Exception as e:
         print(f"Error publishing photo: {e}")
         response = jsonify({"error": str(e)})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
         return response, 500
 
 # Gallery endpoints (basic implementation)
@@ -1390,7 +1475,7 @@ def get_gallery_images():
             gallery_items.append(gallery_item)
 
         print(f"Returning {len(gallery_items)} gallery items")
-        return jsonify(gallery_items), 200
+        return conditional_json_response(gallery_items)
 
     except Exception as e:
         print(f"Error getting gallery images: {e}")
@@ -1398,25 +1483,14 @@ def get_gallery_images():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/gallery/event/<event_id>', methods=['GET', 'OPTIONS'])
+@app.route('/api/gallery/event/<event_id>', methods=['GET'])
 def get_gallery_by_event(event_id):
     """Get gallery images for a specific event"""
-    # Handle preflight OPTIONS request
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
-        return response
-
     try:
         print(f"Getting gallery images for event: {event_id}")
         db = get_db()
         if db is None:
             response = jsonify({"error": "Database connection failed"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
             return response, 500
 
         # Query images by event_id
@@ -1436,15 +1510,9 @@ def get_gallery_by_event(event_id):
             import traceback
             traceback.print_exc()
             response = jsonify({"error": "Database query failed", "details": str(db_error), "event_id": event_id})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
             return response, 500
 
         response = jsonify(images)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
         return response, 200
 
     except Exception as e:
@@ -1452,94 +1520,41 @@ def get_gallery_by_event(event_id):
         import traceback
         traceback.print_exc()
         response = jsonify({"error": str(e), "event_id": event_id})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
         return response, 500
 
-@app.route('/api/gallery/public', methods=['GET', 'OPTIONS'])
+@app.route('/api/gallery/public', methods=['GET'])
 def get_public_gallery_images():
     """Get public gallery images grouped by events for the website gallery page"""
-    # Handle preflight OPTIONS request
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
-        return response
-
     try:
         print("📸 GALLERY PUBLIC - Starting request")
+        cached_gallery = public_cache.get("gallery_public")
+        if cached_gallery is not None:
+            print(f"📸 Returning {len(cached_gallery)} cached gallery events")
+            response = jsonify(cached_gallery)
+            return response, 200
+
         db = get_db()
         if db is None:
             print("❌ Database connection failed")
             response = jsonify({"error": "Database connection failed"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 500
 
         gallery_events = []
+        query_failed = False
 
-        # Simplify by getting all published gallery images directly
+        # One read of the materialized gallery; built from scratch the first time
         try:
-            print("📸 Querying published gallery images directly...")
-            gallery_ref = db.collection("gallery").where("is_published", "==", True)
-            events_dict = {}
-
-            # Group images by event_id
-            for img_doc in gallery_ref.stream():
-                img_data = img_doc.to_dict()
-                event_id = img_data.get('event_id')
-                if not event_id or not img_data.get('url'):
-                    continue
-
-                if event_id not in events_dict:
-                    events_dict[event_id] = {
-                        'images': [],
-                        'event_data': None
-                    }
-                events_dict[event_id]['images'].append(img_data.get('url'))
-
-            # Now get event details for each event that has images
-            events_count = 0
-            for event_id, data in events_dict.items():
-                try:
-                    event_doc = db.collection("events").document(event_id).get()
-                    if event_doc.exists:
-                        event = event_doc.to_dict()
-                        if event.get("status") == "completed":
-                            events_count += 1
-                            event_images = data['images']
-
-                            # Determine title based on available fields
-                            event_title = event.get('title', 'Evento Pablo\'s Pizza')
-                            if not event_title or event_title == 'Evento Pablo\'s Pizza':
-                                # Try to construct from other fields
-                                service_type = 'Taller' if 'workshop' in event.get('category', '').lower() or 'taller' in event.get('title', '').lower() else 'Fiesta'
-                                event_title = f"{service_type} Pablo's Pizza"
-
-                            gallery_event = {
-                                'id': event_id,
-                                'title': event_title,
-                                'description': event.get('description', 'Una experiencia inolvidable con Pablo\'s Pizza'),
-                                'category': event.get('category', 'party'),
-                                'images': event_images,
-                                'participants': event.get('participants', 15),
-                                'date': event.get('event_date'),
-                                'featured': len(event_images) >= 3,  # Featured if has 3+ images
-                                'highlight': event.get('highlight', f"Evento para {event.get('participants', 15)} personas"),
-                                'age_group': event.get('age_group', 'Todas las edades')
-                            }
-                            gallery_events.append(gallery_event)
-                            print(f"📸 Added event {event_id} with {len(event_images)} images")
-
-                except Exception as event_error:
-                    print(f"❌ Error processing event {event_id}: {event_error}")
-                    continue
-
-            print(f"📸 Processed {events_count} events, added {len(gallery_events)} with images")
+            snapshot = PublicGallerySnapshot(db)
+            gallery_events = snapshot.read()
+            if gallery_events is None:
+                print("📸 Public gallery snapshot missing, rebuilding...")
+                gallery_events = snapshot.rebuild()
+            print(f"📸 Public gallery snapshot has {len(gallery_events)} events")
 
         except Exception as events_error:
-            print(f"❌ Error querying events: {events_error}")
+            print(f"❌ Error reading public gallery snapshot: {events_error}")
+            gallery_events = []
+            query_failed = True
 
         # If no events with images, return individual published images
         if not gallery_events:
@@ -1568,6 +1583,7 @@ def get_public_gallery_images():
 
             except Exception as images_error:
                 print(f"❌ Error querying individual images: {images_error}")
+                query_failed = True
 
         # If still no gallery events, create some sample data
         if not gallery_events:
@@ -1585,9 +1601,12 @@ def get_public_gallery_images():
                 'age_group': 'Todas las edades'
             }]
 
+        # Don't keep degraded results around for the whole TTL
+        if not query_failed:
+            public_cache.set("gallery_public", gallery_events)
+
         print(f"📸 Returning {len(gallery_events)} gallery events")
         response = jsonify(gallery_events)
-        response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 200
 
     except Exception as e:
@@ -1610,20 +1629,49 @@ def get_public_gallery_images():
         }]
 
         response = jsonify(fallback_data)
-        response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 200
 
-@app.route('/api/gallery/upload', methods=['POST', 'OPTIONS'])
+@app.cli.command('rebuild-public-gallery')
+def rebuild_public_gallery_command():
+    """flask --app main rebuild-public-gallery"""
+    gallery_events = PublicGallerySnapshot(get_db()).rebuild()
+    print(f"Public gallery rebuilt with {len(gallery_events)} events")
+
+@app.cli.command('refresh-analytics-snapshot')
+@click.option('--rebuild', is_flag=True, help='Discard the snapshot and copy every collection again')
+def refresh_analytics_snapshot_command(rebuild):
+    """flask --app main refresh-analytics-snapshot [--rebuild]"""
+    snapshot = AnalyticsSnapshot()
+    appended = snapshot.rebuild(get_db()) if rebuild else snapshot.refresh(get_db())
+    print(f"Analytics snapshot refreshed: {sum(appended.values())} rows ({appended})")
+
+@app.cli.command('backfill-rollups')
+def backfill_rollups_command():
+    """flask --app main backfill-rollups"""
+    rollups = rebuild_rollups(get_db())
+    print(f"Rollups rebuilt: {rollups} documents")
+
+@app.cli.command('backfill-client-index')
+def backfill_client_index_command():
+    """flask --app main backfill-client-index"""
+    clients = rebuild_client_index(get_db())
+    print(f"Client index rebuilt with {clients} clients")
+
+@app.cli.command('backfill-audiences')
+def backfill_audiences_command():
+    """flask --app main backfill-audiences"""
+    audiences = rebuild_audiences(get_db())
+    print(f"Audiences rebuilt: {audiences}")
+
+@app.cli.command('backfill-reminders')
+def backfill_reminders_command():
+    """flask --app main backfill-reminders"""
+    scheduled = backfill_reminder_queue(get_db())
+    print(f"Reminder queue: {scheduled} reminders scheduled")
+
+@app.route('/api/gallery/upload', methods=['POST'])
 def upload_gallery_image():
     """Upload image to Firebase Storage and save metadata to Firestore"""
-    # Handle preflight OPTIONS request
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
-        return response
-
     try:
         print(f"📸 GALLERY UPLOAD - Headers: {dict(request.headers)}")
         print(f"📸 GALLERY UPLOAD - Form data: {dict(request.form)}")
@@ -1633,18 +1681,12 @@ def upload_gallery_image():
         if 'image' not in request.files:
             print("❌ No image file provided")
             response = jsonify({"error": "No image file provided", "received_files": list(request.files.keys())})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
             return response, 400
 
         file = request.files['image']
         if file.filename == '':
             print("❌ No file selected")
             response = jsonify({"error": "No file selected"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
             return response, 400
 
         # Validate file type
@@ -1653,9 +1695,6 @@ def upload_gallery_image():
         if file_extension not in allowed_extensions:
             print(f"❌ Invalid file type: {file_extension}")
             response = jsonify({"error": f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
             return response, 400
 
         # Get form data
@@ -1672,7 +1711,7 @@ def upload_gallery_image():
         filename = f"{image_id}.{file_extension}"
 
         # Upload to Firebase Storage - using default bucket for the project
-        bucket = storage.bucket()
+        bucket = get_storage_bucket()
         blob_path = f"gallery/{event_id}/{filename}" if event_id else f"gallery/{filename}"
         blob = bucket.blob(blob_path)
 
@@ -1714,21 +1753,16 @@ def upload_gallery_image():
         if db is None:
             print("❌ Database connection failed")
             response = jsonify({"error": "Database connection failed"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
             return response, 500
 
         db.collection("gallery").document(image_id).set(image_data)
+        refresh_public_gallery(event_id)
         print(f"📸 Metadata saved to Firestore: {image_id}")
 
         # Convert datetime for JSON serialization
         image_data['uploaded_at'] = image_data['uploaded_at'].isoformat()
 
         response = jsonify(image_data)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
         return response, 201
 
     except Exception as e:
@@ -1736,22 +1770,12 @@ def upload_gallery_image():
         import traceback
         traceback.print_exc()
         response = jsonify({"error": str(e), "details": "Check server logs for more information"})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
         return response, 500
 
 # Contact System Endpoints
-@app.route('/api/contacts', methods=['GET', 'POST', 'OPTIONS'])
+@app.route('/api/contacts', methods=['GET', 'POST'])
 def handle_contacts():
     """Handle contact messages - GET to retrieve, POST to create"""
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
-        return response
-
     if request.method == 'GET':
         try:
             print("🔍 Getting contact messages...")
@@ -1781,14 +1805,12 @@ def handle_contacts():
                 contacts.append(contact)
 
             print(f"✅ Found {len(contacts)} contact messages")
-            response = jsonify(contacts)
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            return response, 200
+            response = conditional_json_response(contacts)
+            return response
 
         except Exception as e:
             print(f"❌ Error getting contacts: {e}")
             response = jsonify({"error": str(e)})
-            response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 500
 
     if request.method == 'POST':
@@ -1848,25 +1870,16 @@ def handle_contacts():
 
             print(f"✅ Contact message created: {contact_id}")
             response = jsonify(contact_data)
-            response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 201
 
         except Exception as e:
             print(f"❌ Error creating contact: {e}")
             response = jsonify({"error": str(e)})
-            response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 500
 
-@app.route('/api/contacts/<contact_id>', methods=['PUT', 'OPTIONS'])
+@app.route('/api/contacts/<contact_id>', methods=['PUT'])
 def update_contact(contact_id):
     """Update contact message status, assignment, notes, etc."""
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'PUT,OPTIONS')
-        return response
-
     try:
         print(f"📝 Updating contact: {contact_id}")
         data = request.get_json()
@@ -1902,23 +1915,22 @@ def update_contact(contact_id):
 
         print(f"✅ Contact updated: {contact_id}")
         response = jsonify(updated_contact)
-        response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 200
 
     except Exception as e:
         print(f"❌ Error updating contact: {e}")
         response = jsonify({"error": str(e)})
-        response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 500
 
 def send_contact_response_email(contact_data: dict, response_message: str) -> bool:
     """Send email response to contact inquiry"""
     try:
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
         print(f"📧 Sending response email to: {contact_data['email']}")
 
         # Email configuration
-        smtp_server = os.getenv('EMAIL_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('EMAIL_PORT', 587))
         email_username = os.getenv('EMAIL_USERNAME')
         email_password = os.getenv('EMAIL_PASSWORD')
         email_from = os.getenv('EMAIL_FROM')
@@ -2147,12 +2159,7 @@ def send_contact_response_email(contact_data: dict, response_message: str) -> bo
         msg.attach(html_part)
 
         # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_username, email_password)
-        text = msg.as_string()
-        server.sendmail(email_from, contact_data.get('email'), text)
-        server.quit()
+        get_smtp_pool().send_message(msg, email_from, [contact_data.get('email')])
 
         print(f"✅ Response email sent successfully to: {contact_data.get('email')}")
         return True
@@ -2161,29 +2168,20 @@ def send_contact_response_email(contact_data: dict, response_message: str) -> bo
         print(f"❌ Error sending response email: {e}")
         return False
 
-@app.route('/api/contacts/<contact_id>/respond', methods=['POST', 'OPTIONS'])
+@app.route('/api/contacts/<contact_id>/respond', methods=['POST'])
 def respond_to_contact(contact_id):
     """Send response to contact via email or WhatsApp"""
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
-        return response
-
     try:
         print(f"📧 Sending response to contact: {contact_id}")
         data = request.get_json()
         if not data:
             response = jsonify({"error": "No data provided"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 400
 
         required_fields = ['response_message', 'response_method']
         for field in required_fields:
             if field not in data:
                 response = jsonify({"error": f"Missing required field: {field}"})
-                response.headers.add('Access-Control-Allow-Origin', '*')
                 return response, 400
 
         db = get_db()
@@ -2192,7 +2190,6 @@ def respond_to_contact(contact_id):
 
         if not contact_doc.exists:
             response = jsonify({"error": "Contact not found"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 404
 
         contact_data = contact_doc.to_dict()
@@ -2205,7 +2202,6 @@ def respond_to_contact(contact_id):
             response_success = send_contact_response_email(contact_data, response_message)
             if not response_success:
                 response = jsonify({"error": "Failed to send email response. Please check email configuration."})
-                response.headers.add('Access-Control-Allow-Origin', '*')
                 return response, 500
 
         elif response_method == 'whatsapp':
@@ -2213,7 +2209,6 @@ def respond_to_contact(contact_id):
             phone = contact_data.get('phone')
             if not phone:
                 response = jsonify({"error": "No phone number available for WhatsApp response"})
-                response.headers.add('Access-Control-Allow-Origin', '*')
                 return response, 400
 
             try:
@@ -2232,11 +2227,11 @@ Si tienes más preguntas, no dudes en contactarnos.
 ¡Saludos cordiales del equipo Pablo's Pizza! 🍕"""
 
                 # Send WhatsApp using existing function
-                whatsapp_sent = asyncio.run(send_whatsapp_notification(
+                whatsapp_sent = send_whatsapp_notification(
                     phone,
                     whatsapp_message,
                     "contact_response"
-                ))
+                )
 
                 if whatsapp_sent:
                     print(f"✅ WhatsApp response sent successfully to: {phone}")
@@ -2244,18 +2239,15 @@ Si tienes más preguntas, no dudes en contactarnos.
                 else:
                     print(f"❌ Failed to send WhatsApp response to: {phone}")
                     response = jsonify({"error": "Failed to send WhatsApp response"})
-                    response.headers.add('Access-Control-Allow-Origin', '*')
                     return response, 500
 
             except Exception as whatsapp_error:
                 print(f"❌ WhatsApp error: {whatsapp_error}")
                 response = jsonify({"error": f"WhatsApp error: {str(whatsapp_error)}"})
-                response.headers.add('Access-Control-Allow-Origin', '*')
                 return response, 500
 
         else:
             response = jsonify({"error": "Invalid response method. Use 'email' or 'whatsapp'"})
-            response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 400
 
         # Update contact as resolved with response info
@@ -2294,7 +2286,6 @@ Si tienes más preguntas, no dudes en contactarnos.
         }
 
         response = jsonify(response_data)
-        response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 200
 
     except Exception as e:
@@ -2302,7 +2293,6 @@ Si tienes más preguntas, no dudes en contactarnos.
         import traceback
         traceback.print_exc()
         response = jsonify({"error": str(e)})
-        response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 500
 
 
@@ -2344,8 +2334,9 @@ def update_booking(booking_id):
         # Add update timestamp
         update_data['updated_at'] = datetime.now()
 
-        # Update in Firestore
-        doc_ref.update(update_data)
+        # Update in Firestore together with the client index and the rollups
+        apply_booking_update(db, doc_ref, update_data)
+        public_cache.invalidate("dashboard")
         print(f"BOOKING ACTUALIZADO EN FIRESTORE: {booking_id}")
 
         # Get updated booking data
@@ -2384,31 +2375,91 @@ def update_booking(booking_id):
         print(f"Error updating booking {booking_id}: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Notification outbox delivery
+def deliver_admin_email(payload: dict) -> bool:
+    """Outbox handler: admin email for a new booking"""
+    return send_admin_email_notification(payload['booking'])
+
+def deliver_whatsapp(payload: dict) -> bool:
+    """Outbox handler: WhatsApp message"""
+    return send_whatsapp_notification(
+        payload['phone'],
+        payload['message'],
+        payload['notification_type']
+    )
+
+OUTBOX_HANDLERS = {
+    "admin_email": deliver_admin_email,
+    "whatsapp": deliver_whatsapp
+}
+
+def get_outbox_worker() -> OutboxWorker:
+    """Outbox worker bound to the Firestore client and notification handlers"""
+    return OutboxWorker(get_db(), OUTBOX_HANDLERS)
+
+@firestore_fn.on_document_created(document="notification_outbox/{jobId}")
+def deliver_notification(event: firestore_fn.Event) -> None:
+    """Send a notification job as soon as it is committed"""
+    result = get_outbox_worker().process_job(event.params["jobId"])
+    delivery_log.flush()
+    print(f"Outbox job {event.params['jobId']}: {result}")
+
+@scheduler_fn.on_schedule(schedule="every 5 minutes")
+def drain_notification_outbox(event: scheduler_fn.ScheduledEvent) -> None:
+    """Retry sweep for notification jobs that are due again"""
+    stats = get_outbox_worker().drain()
+    delivery_log.flush()
+    print(f"Outbox drain: {stats}")
+
+@scheduler_fn.on_schedule(schedule="every day 04:00")
+def rebuild_public_gallery(event: scheduler_fn.ScheduledEvent) -> None:
+    """Regenerate the materialized public gallery, resizing its shards to the current payload"""
+    gallery_events = PublicGallerySnapshot(get_db()).rebuild()
+    print(f"Public gallery rebuilt with {len(gallery_events)} events")
+
+@scheduler_fn.on_schedule(schedule="every 10 minutes")
+def resume_bulk_sends(event: scheduler_fn.ScheduledEvent) -> None:
+    """Resume bulk send jobs that were interrupted or whose worker let the lease expire"""
+    import asyncio
+    from services.bulk_send_service import BulkSendRunner
+    from services.notification_service import close_whatsapp_transport, send_whatsapp_notification as send_whatsapp_async
+
+    async def resume():
+        # The loop ends with this run, so its Twilio session is closed here
+        try:
+            return await BulkSendRunner(get_db(), send_whatsapp_async).resume_stale()
+        finally:
+            await close_whatsapp_transport()
+
+    resumed = asyncio.run(resume())
+    print(f"Bulk sends resumed: {resumed}")
+
+@scheduler_fn.on_schedule(schedule="every 5 minutes")
+def send_due_reminders(event: scheduler_fn.ScheduledEvent) -> None:
+    """Send the booking reminders that are due (about 24 hours before each event), spaced out"""
+    import asyncio
+    from services.reminder_service import FirestoreReminderQueue, ReminderScheduler
+    from services.notification_service import close_whatsapp_transport, send_booking_reminder
+
+    async def run_due():
+        # The loop ends with this run, so its Twilio session is closed here
+        try:
+            return await ReminderScheduler(FirestoreReminderQueue(get_db()), send_booking_reminder).run_due()
+        finally:
+            await close_whatsapp_transport()
+
+    stats = asyncio.run(run_due())
+    print(f"Reminders: {stats}")
+
 # Firebase Functions entry point using new SDK
+wsgi_bridge = WSGIBridge(app, https_fn.Response)
+
 @https_fn.on_request()
 def main(req: https_fn.Request) -> https_fn.Response:
     """Firebase Function entry point - Production ready"""
-    from werkzeug.test import Client
-
-    # Create a test client to handle the request properly
-    client = Client(app)
-
     try:
-        # Convert Firebase request to Flask-compatible format
-        response = client.open(
-            path=req.path,
-            method=req.method,
-            headers=list(req.headers.items()),
-            data=req.get_data(),
-            query_string=req.query_string
-        )
-
-        # Return properly formatted response
-        return https_fn.Response(
-            response.get_data(),
-            status=response.status_code,
-            headers=dict(response.headers)
-        )
+        # Hand the Firebase request environ straight to Flask and stream the response
+        return wsgi_bridge(req)
 
     except Exception as e:
         print(f"Error in main function: {e}")
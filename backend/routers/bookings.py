@@ -2,7 +2,10 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from firebase_admin import firestore
 from models.schemas import BookingCreate, BookingUpdate, Booking, BookingStatus
 from services.notification_service import send_whatsapp_notification
+from services.delivery_log_service import flush_after_request
 from services.email_service import send_confirmation_email
+from services.booking_write_service import record_new_booking, apply_booking_update
+from services.cache_service import public_cache
 from typing import List
 import uuid
 import logging
@@ -12,7 +15,8 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+# Los registros de envío de cada request se escriben antes de responder
+router = APIRouter(dependencies=[Depends(flush_after_request, scope="function")])
 
 def get_firestore_client():
     """Get Firestore client instance"""
@@ -48,7 +52,11 @@ async def create_booking(booking: BookingCreate):
     try:
         # Guardar en Firestore
         db = get_firestore_client()
-        db.collection("bookings").document(booking_id).set(booking_data)
+        batch = db.batch()
+        batch.set(db.collection("bookings").document(booking_id), booking_data)
+        record_new_booking(db, batch, booking_id, booking_data)
+        batch.commit()
+        public_cache.invalidate("dashboard")
         print(f"GUARDADO EN FIRESTORE: {booking_id}")
 
         # Verificar que se guardó correctamente
@@ -159,7 +167,8 @@ async def update_booking(booking_id: str, booking_update: BookingUpdate):
             # Enviar Email de confirmación con detalles completos
             await send_confirmation_email(current_data)
         
-        booking_ref.update(update_data)
+        apply_booking_update(db, booking_ref, update_data)
+        public_cache.invalidate("dashboard")
         
         # Obtener datos actualizados
         updated_doc = booking_ref.get()
@@ -188,10 +197,11 @@ async def cancel_booking(booking_id: str):
                 detail="Agendamiento no encontrado"
             )
         
-        booking_ref.update({
+        apply_booking_update(db, booking_ref, {
             "status": BookingStatus.CANCELLED,
             "updated_at": datetime.now()
         })
+        public_cache.invalidate("dashboard")
         
         return {"message": "Agendamiento cancelado exitosamente"}
     except HTTPException:
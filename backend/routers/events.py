@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from firebase_admin import firestore
 from models.schemas import EventCreate, Event, EventFinancials
 from services.notification_service import send_review_request
+from services.delivery_log_service import flush_after_request
+from services.booking_write_service import record_booking_change, record_new_event, apply_event_update
+from services.cache_service import public_cache
 from typing import List
 import uuid
 from datetime import datetime
 
-router = APIRouter()
+# Los registros de envío de cada request se escriben antes de responder
+router = APIRouter(dependencies=[Depends(flush_after_request, scope="function")])
 db = firestore.client()
 
 @router.post("/", response_model=Event)
@@ -21,15 +25,22 @@ async def create_event(event: EventCreate):
     }
     
     try:
-        # Guardar evento
-        db.collection("events").document(event_id).set(event_data)
-        
-        # Actualizar estado del booking a completado
         booking_ref = db.collection("bookings").document(event.booking_id)
-        booking_ref.update({
+        booking_doc = booking_ref.get()
+        
+        # Guardar evento y marcar el booking como completado
+        batch = db.batch()
+        batch.set(db.collection("events").document(event_id), event_data)
+        batch.update(booking_ref, {
             "status": "completed",
             "updated_at": datetime.now()
         })
+        booking = booking_doc.to_dict() if booking_doc.exists else None
+        if booking is not None:
+            record_booking_change(db, batch, event.booking_id, {**booking, "status": "completed"}, booking)
+        record_new_event(db, batch, event_data, booking, event.start_time)
+        batch.commit()
+        public_cache.invalidate("dashboard")
         
         # Programar envío de solicitud de review (después de 2 horas)
         # En producción, usar un scheduler como Celery
@@ -96,10 +107,12 @@ async def update_event_financials(event_id: str, financials: EventFinancials):
                 detail="Evento no encontrado"
             )
         
-        event_ref.update({
+        # Actualizar el evento junto con los rollups y el ledger del cliente
+        apply_event_update(db, event_ref, {
             "financials": financials.model_dump(),
             "updated_at": datetime.now()
         })
+        public_cache.invalidate("dashboard")
         
         return {"message": "Información financiera actualizada"}
     except HTTPException:
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from firebase_admin import firestore
 from models.schemas import InventoryItemCreate, InventoryItem
 from services.notification_service import send_inventory_alert
+from services.delivery_log_service import flush_after_request
+from services.cache_service import public_cache
 from typing import List
 import uuid
 from datetime import datetime
 
-router = APIRouter()
+# Los registros de envío de cada request se escriben antes de responder
+router = APIRouter(dependencies=[Depends(flush_after_request, scope="function")])
 db = firestore.client()
 
 @router.post("/", response_model=InventoryItem)
@@ -23,6 +26,7 @@ async def create_inventory_item(item: InventoryItemCreate):
     
     try:
         db.collection("inventory").document(item_id).set(item_data)
+        public_cache.invalidate("dashboard")
         return InventoryItem(**item_data)
     except Exception as e:
         raise HTTPException(
@@ -95,6 +99,7 @@ async def update_stock(item_id: str, new_stock: int, operation: str = "set"):
             "needs_restock": needs_restock,
             "last_updated": datetime.now()
         })
+        public_cache.invalidate("dashboard")
         
         # Enviar alerta si es necesario
         if needs_restock and not current_data.get("needs_restock", False):
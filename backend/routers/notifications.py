@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, status
 from firebase_admin import firestore
 from models.schemas import NotificationCreate, Notification
-from services.notification_service import send_whatsapp_notification
+from services.notification_service import send_whatsapp_notification, send_booking_reminder
+from services.delivery_log_service import flush_after_request
+from services.audience_service import resolve_audience
+from services.reminder_service import FirestoreReminderQueue, ReminderScheduler
+from services.bulk_send_service import BULK_JOBS_COLLECTION, BulkSendRunner, create_bulk_job, job_progress
 from typing import List
 from datetime import datetime, timedelta
 
-router = APIRouter()
+# Los registros de envío de cada request se escriben antes de responder
+router = APIRouter(dependencies=[Depends(flush_after_request, scope="function")])
 db = firestore.client()
 
 @router.post("/send")
@@ -137,52 +142,19 @@ async def send_test_notification(phone: str, message: str = "Este es un mensaje
 
 @router.post("/reminders/send-daily")
 async def send_daily_reminders():
-    """Enviar recordatorios diarios automáticos"""
-    try:
-        from datetime import date
-        tomorrow = date.today() + timedelta(days=1)
-        
-        # Obtener eventos para mañana
-        bookings = db.collection("bookings").where(
-            "event_date", "==", tomorrow
-        ).where(
-            "status", "==", "confirmed"
-        ).stream()
-        
-        sent_count = 0
-        
-        for booking_doc in bookings:
-            booking_data = booking_doc.to_dict()
-            
-            message = f"""
-⏰ RECORDATORIO - Pablo's Pizza
-
-Hola {booking_data['client_name']},
-
-Te recordamos tu evento programado para MAÑANA:
-
-📅 Fecha: {booking_data['event_date'].strftime('%d/%m/%Y')}
-⏰ Hora: {booking_data['event_time']}
-👥 Participantes: {booking_data['participants']}
-📍 Ubicación: {booking_data['location']}
+    """
+    Enviar ahora los recordatorios vencidos de la cola
 
-¡Estamos emocionados por hacer de tu evento algo especial! 🍕✨
-
-Si tienes alguna pregunta, ¡contáctanos!
-            """
-            
-            success = await send_whatsapp_notification(
-                booking_data['client_phone'],
-                message,
-                "daily_reminder"
-            )
-            
-            if success:
-                sent_count += 1
+    Los recordatorios se encolan al confirmar cada booking y los envía la
+    función programada send_due_reminders; este endpoint adelanta una ejecución.
+    """
+    try:
+        stats = await ReminderScheduler(FirestoreReminderQueue(db), send_booking_reminder).run_due()
         
         return {
             "message": f"Recordatorios enviados exitosamente",
-            "sent_count": sent_count
+            "sent_count": stats["sent"],
+            "failed_count": stats["failed"]
         }
         
     except Exception as e:
@@ -191,71 +163,76 @@ Si tienes alguna pregunta, ¡contáctanos!
             detail=f"Error enviando recordatorios diarios: {str(e)}"
         )
 
-@router.post("/bulk-send")
+@router.post("/bulk-send", status_code=status.HTTP_202_ACCEPTED)
 async def send_bulk_notification(
     message: str,
     notification_type: str,
+    background_tasks: BackgroundTasks,
     recipient_filter: str = "all"  # "all", "recent_clients", "active_bookings"
 ):
-    """Enviar notificación masiva"""
+    """
+    Enviar notificación masiva como trabajo en segundo plano
+
+    La lista de destinatarios se lee del índice de audiencias y se guarda en un
+    documento de bulk_send_jobs; los envíos corren después de responder, con
+    concurrencia acotada y token bucket. El progreso se consulta en /bulk-send/{job_id}.
+    """
     try:
-        recipients = []
+        # Teléfonos E.164 sin duplicados, en una sola lectura del índice de audiencias
+        recipients = resolve_audience(db, recipient_filter)
         
-        if recipient_filter == "recent_clients":
-            # Clientes de los últimos 30 días
-            cutoff_date = datetime.now() - timedelta(days=30)
-            bookings = db.collection("bookings").where(
-                "created_at", ">=", cutoff_date
-            ).stream()
-            
-            seen_phones = set()
-            for booking_doc in bookings:
-                booking_data = booking_doc.to_dict()
-                phone = booking_data.get("client_phone")
-                if phone and phone not in seen_phones:
-                    recipients.append(phone)
-                    seen_phones.add(phone)
-                    
-        elif recipient_filter == "active_bookings":
-            # Clientes con bookings confirmados futuros
-            today = datetime.now().date()
-            bookings = db.collection("bookings").where(
-                "event_date", ">", today
-            ).where(
-                "status", "==", "confirmed"
-            ).stream()
-            
-            for booking_doc in bookings:
-                booking_data = booking_doc.to_dict()
-                phone = booking_data.get("client_phone")
-                if phone:
-                    recipients.append(phone)
-        
-        # Enviar a todos los recipients
-        sent_count = 0
-        failed_count = 0
-        
-        for phone in recipients:
-            success = await send_whatsapp_notification(
-                phone,
-                message,
-                f"bulk_{notification_type}"
-            )
-            
-            if success:
-                sent_count += 1
-            else:
-                failed_count += 1
+        job = create_bulk_job(db, message, notification_type, recipients, recipient_filter)
+        background_tasks.add_task(bulk_send_runner().run, job["id"])
         
         return {
-            "message": "Notificación masiva procesada",
-            "total_recipients": len(recipients),
-            "sent": sent_count,
-            "failed": failed_count
+            "message": "Notificación masiva en proceso",
+            "job_id": job["id"],
+            "total_recipients": job["total"]
         }
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error enviando notificación masiva: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/bulk-send/{job_id}")
+async def get_bulk_send_job(job_id: str):
+    """Progreso de un envío masivo"""
+    job_doc = db.collection(BULK_JOBS_COLLECTION).document(job_id).get()
+    if not job_doc.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Envío masivo no encontrado"
+        )
+    return job_progress(job_doc.to_dict())
+
+@router.post("/bulk-send/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+async def resume_bulk_send_job(job_id: str, background_tasks: BackgroundTasks):
+    """Reanudar un envío masivo interrumpido (solo envía a los destinatarios pendientes)"""
+    job_doc = db.collection(BULK_JOBS_COLLECTION).document(job_id).get()
+    if not job_doc.exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Envío masivo no encontrado"
+        )
+    
+    runner = bulk_send_runner()
+    job = job_doc.to_dict()
+    if not runner.resumable(job):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El envío masivo está {job['status']} y no se puede reanudar"
+        )
+    
+    background_tasks.add_task(runner.run, job_id)
+    return job_progress(job)
+
+def bulk_send_runner() -> BulkSendRunner:
+    """Runner de envíos masivos con el cliente Firestore del router"""
+    return BulkSendRunner(db, send_whatsapp_notification)
@@ -1,10 +1,19 @@
 from fastapi import APIRouter, HTTPException, status, Response
+from fastapi.responses import StreamingResponse
 from firebase_admin import firestore
 from models.schemas import MonthlyReport
+from services.rollup_service import get_month_reports, save_month_reports
+from services.cache_service import public_cache
+from services.client_index_service import first_event_days, normalize_email, top_clients
+from services.common import event_day
+from services.export_service import EXPORT_COLUMNS, export_chunks
+from services.analytics_snapshot_service import analytics_snapshot
+from services.batch_read_service import gather_reads
 from typing import List, Dict, Any
 from datetime import datetime, date, timedelta
 import pandas as pd
 from io import BytesIO
+import asyncio
 import calendar
 
 router = APIRouter()
@@ -12,81 +21,26 @@ db = firestore.client()
 
 @router.get("/monthly/{year}/{month}", response_model=MonthlyReport)
 async def get_monthly_report(year: int, month: int):
-    """Generar reporte mensual"""
+    """Generar reporte mensual (cacheado en Firestore; los meses cerrados no expiran)"""
     try:
-        # Rango de fechas del mes
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1)
-        else:
-            end_date = date(year, month + 1, 1)
-        
-        # Obtener eventos del mes
-        events_query = db.collection("events").where(
-            "start_time", ">=", start_date
-        ).where(
-            "start_time", "<", end_date
-        )
-        
-        events = list(events_query.stream())
-        total_events = len(events)
-        
-        if total_events == 0:
-            return MonthlyReport(
-                month=month,
-                year=year,
-                total_events=0,
-                total_income=0.0,
-                total_expenses=0.0,
-                total_profit=0.0,
-                avg_participants=0.0,
-                most_popular_service="N/A",
-                client_retention_rate=0.0
-            )
-        
-        # Calcular métricas financieras
-        total_income = 0.0
-        total_expenses = 0.0
-        total_participants = 0
-        service_counts = {}
-        
-        for event_doc in events:
-            event_data = event_doc.to_dict()
-            financials = event_data.get("financials", {})
-            
-            total_income += financials.get("income", 0.0)
-            total_expenses += financials.get("total_expenses", 0.0)
-            total_participants += event_data.get("actual_participants", 0)
-            
-            # Contar servicios (obtener del booking)
-            booking_id = event_data.get("booking_id")
-            if booking_id:
-                booking_doc = db.collection("bookings").document(booking_id).get()
-                if booking_doc.exists:
-                    booking_data = booking_doc.to_dict()
-                    service_type = booking_data.get("service_type", "unknown")
-                    service_counts[service_type] = service_counts.get(service_type, 0) + 1
+        # Reporte cacheado y rollup del mes en una sola lectura
+        cached_reports, month_rollups = get_month_reports(db, year, [month])
+        if month in cached_reports:
+            return MonthlyReport(month=month, year=year, **cached_reports[month])
         
-        total_profit = total_income - total_expenses
-        avg_participants = total_participants / total_events if total_events > 0 else 0
+        # Agregados del mes desde su rollup (un documento, sin recorrer eventos)
+        rollup = month_rollups.get(month)
+        monthly_stats = report_fields(rollup) if rollup else None
         
-        # Servicio más popular
-        most_popular_service = max(service_counts.items(), key=lambda x: x[1])[0] if service_counts else "N/A"
-        
-        # Calcular tasa de retención (clientes que volvieron)
-        client_retention_rate = await calculate_client_retention_rate(year, month)
+        if monthly_stats is None:
+            report = dict(EMPTY_MONTH)
+        else:
+            # Calcular tasa de retención (clientes que volvieron)
+            client_retention_rate = await calculate_client_retention_rate(year, month)
+            report = {**monthly_stats, "client_retention_rate": round(client_retention_rate, 2)}
         
-        return MonthlyReport(
-            month=month,
-            year=year,
-            total_events=total_events,
-            total_income=round(total_income, 2),
-            total_expenses=round(total_expenses, 2),
-            total_profit=round(total_profit, 2),
-            avg_participants=round(avg_participants, 1),
-            most_popular_service=most_popular_service,
-            client_retention_rate=round(client_retention_rate, 2)
-        )
+        save_month_reports(db, year, {month: report}, month_rollups)
+        return MonthlyReport(month=month, year=year, **report)
         
     except Exception as e:
         raise HTTPException(
@@ -96,27 +50,40 @@ async def get_monthly_report(year: int, month: int):
 
 @router.get("/annual/{year}")
 async def get_annual_summary(year: int):
-    """Resumen anual por meses"""
+    """Resumen anual por meses (reportes cacheados, rollups mensuales y retención desde el índice de clientes)"""
     try:
-        monthly_reports = []
+        start_date, end_date = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        
+        # Reportes cacheados y rollups de los doce meses en un solo get_all
+        monthly_stats, month_rollups = get_month_reports(db, year)
+        missing_months = [month for month in range(1, 13) if month not in monthly_stats]
+        
+        if missing_months:
+            # Bookings del año y primer evento de sus clientes, para la retención
+            year_bookings = [booking_doc.to_dict() for booking_doc in db.collection("bookings").where(
+                "event_date", ">=", start_date
+            ).where(
+                "event_date", "<", end_date
+            ).select(["client_email", "event_date"]).stream()]
+            first_days = first_event_days(db, [booking.get("client_email") for booking in year_bookings])
+            retention = monthly_retention(year, year_bookings, first_days)
+            
+            computed = {}
+            for month in missing_months:
+                rollup = month_rollups.get(month)
+                fields = report_fields(rollup) if rollup else None
+                if fields is None:
+                    computed[month] = dict(EMPTY_MONTH)
+                else:
+                    computed[month] = {**fields, "client_retention_rate": round(float(retention.get(month, 0.0)), 2)}
+            
+            save_month_reports(db, year, computed, month_rollups)
+            monthly_stats.update(computed)
         
-        for month in range(1, 13):
-            try:
-                report = await get_monthly_report(year, month)
-                monthly_reports.append(report)
-            except:
-                # Si hay error en un mes, usar valores por defecto
-                monthly_reports.append(MonthlyReport(
-                    month=month,
-                    year=year,
-                    total_events=0,
-                    total_income=0.0,
-                    total_expenses=0.0,
-                    total_profit=0.0,
-                    avg_participants=0.0,
-                    most_popular_service="N/A",
-                    client_retention_rate=0.0
-                ))
+        monthly_reports = [
+            MonthlyReport(month=month, year=year, **monthly_stats[month])
+            for month in range(1, 13)
+        ]
         
         # Calcular totales anuales
         annual_summary = {
@@ -141,60 +108,76 @@ async def get_annual_summary(year: int):
 
 @router.get("/dashboard")
 async def get_dashboard_stats():
-    """Estadísticas para el dashboard principal"""
+    """
+    Estadísticas para el dashboard principal (snapshot cacheado con TTL corto)
+
+    Las consultas son independientes y se ejecutan en paralelo, cada una con
+    FANOUT_TIMEOUT_SECONDS como máximo. Si alguna falla o se demora, su valor
+    queda en None, el motivo se informa en "errors" y el resultado parcial no
+    se cachea.
+    """
     try:
+        cached_stats = public_cache.get("dashboard")
+        if cached_stats is not None:
+            return cached_stats
+        
         now = datetime.now()
         today = now.date()
+        today_start = datetime.combine(today, datetime.min.time())
         current_month = now.month
         current_year = now.year
         
-        # Estadísticas de hoy
-        today_bookings = len(list(db.collection("bookings").where(
-            "created_at", ">=", today
-        ).where(
-            "created_at", "<", today + timedelta(days=1)
-        ).stream()))
-        
-        # Estadísticas del mes actual
-        monthly_report = await get_monthly_report(current_year, current_month)
-        
-        # Próximos eventos (próximos 7 días)
-        next_week = today + timedelta(days=7)
-        upcoming_events = list(db.collection("bookings").where(
-            "event_date", ">=", today
-        ).where(
-            "event_date", "<=", next_week
-        ).where(
-            "status", "==", "confirmed"
-        ).stream())
-        
-        # Estadísticas de inventario
-        low_stock_items = len(list(db.collection("inventory").where(
-            "needs_restock", "==", True
-        ).stream()))
-        
-        # Reseñas pendientes
-        pending_reviews = len(list(db.collection("reviews").where(
-            "is_approved", "==", False
-        ).stream()))
-        
-        return {
+        results, errors = await gather_reads({
+            # Estadísticas de hoy (conteos en el servidor, sin descargar documentos)
+            "today_bookings": lambda: count_documents(db.collection("bookings").where(
+                "created_at", ">=", today_start
+            ).where(
+                "created_at", "<", today_start + timedelta(days=1)
+            )),
+            # Estadísticas del mes actual (corre en un hilo del pool con su propio event loop)
+            "current_month": lambda: asyncio.run(get_monthly_report(current_year, current_month)),
+            # Próximos eventos (hoy y los próximos 7 días)
+            "upcoming_events": lambda: count_documents(db.collection("bookings").where(
+                "event_date", ">=", today_start
+            ).where(
+                "event_date", "<", today_start + timedelta(days=8)
+            ).where(
+                "status", "==", "confirmed"
+            )),
+            # Estadísticas de inventario
+            "low_stock_items": lambda: count_documents(db.collection("inventory").where(
+                "needs_restock", "==", True
+            )),
+            # Reseñas pendientes
+            "pending_reviews": lambda: count_documents(db.collection("reviews").where(
+                "is_approved", "==", False
+            ))
+        })
+        
+        monthly_report = results.get("current_month")
+        dashboard_stats = {
             "today": {
-                "new_bookings": today_bookings,
+                "new_bookings": results.get("today_bookings"),
                 "date": today.isoformat()
             },
             "current_month": {
                 "month_name": calendar.month_name[current_month],
-                "events": monthly_report.total_events,
-                "income": monthly_report.total_income,
-                "profit": monthly_report.total_profit
+                "events": monthly_report.total_events if monthly_report else None,
+                "income": monthly_report.total_income if monthly_report else None,
+                "profit": monthly_report.total_profit if monthly_report else None
             },
-            "upcoming_events": len(upcoming_events),
+            "upcoming_events": results.get("upcoming_events"),
             "alerts": {
-                "low_stock_items": low_stock_items,
-                "pending_reviews": pending_reviews
+                "low_stock_items": results.get("low_stock_items"),
+                "pending_reviews": results.get("pending_reviews")
             }
         }
+        if errors:
+            dashboard_stats["errors"] = errors
+        else:
+            public_cache.set("dashboard", dashboard_stats)
+        
+        return dashboard_stats
         
     except Exception as e:
         raise HTTPException(
@@ -262,91 +245,278 @@ async def export_monthly_report(year: int, month: int, format: str = "excel"):
             detail=f"Error al exportar reporte: {str(e)}"
         )
 
+@router.get("/export/{collection}")
+async def export_rows(collection: str, date_from: date, date_to: date, format: str = "csv"):
+    """
+    Exportar bookings o eventos fila por fila en un rango de fechas (CSV o XLSX)
+
+    La respuesta se genera en streaming mientras se recorre Firestore por páginas,
+    así que la memoria no depende del número de filas.
+    """
+    if collection not in EXPORT_COLUMNS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Colección no soportada. Use: {', '.join(EXPORT_COLUMNS)}"
+        )
+    if format.lower() not in ("csv", "xlsx"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato no soportado. Use: csv, xlsx"
+        )
+    if date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_to debe ser igual o posterior a date_from"
+        )
+    
+    format = format.lower()
+    media_type = "text/csv; charset=utf-8" if format == "csv" else \
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    filename = f"{collection}_{date_from.isoformat()}_{date_to.isoformat()}.{format}"
+    
+    return StreamingResponse(
+        export_chunks(db, collection, date_from, date_to, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @router.get("/clients/top")
 async def get_top_clients(limit: int = 10):
     """Obtener clientes más frecuentes"""
     try:
-        # Obtener todos los bookings
-        bookings = list(db.collection("bookings").stream())
+        # Ledger de clientes ordenado por número de bookings
+        return {"clients": top_clients(db, limit)}
         
-        client_stats = {}
-        for booking_doc in bookings:
-            booking_data = booking_doc.to_dict()
-            client_email = booking_data.get("client_email")
-            client_name = booking_data.get("client_name")
-            
-            if client_email not in client_stats:
-                client_stats[client_email] = {
-                    "name": client_name,
-                    "email": client_email,
-                    "total_bookings": 0,
-                    "total_spent": 0.0
-                }
-            
-            client_stats[client_email]["total_bookings"] += 1
-            
-            # Buscar evento asociado para obtener ingresos
-            events = list(db.collection("events").where(
-                "booking_id", "==", booking_data.get("id")
-            ).stream())
-            
-            for event_doc in events:
-                event_data = event_doc.to_dict()
-                income = event_data.get("financials", {}).get("income", 0.0)
-                client_stats[client_email]["total_spent"] += income
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener clientes top: {str(e)}"
+        )
+
+@router.get("/analytics/revenue")
+async def get_analytics_revenue(date_from: date, date_to: date, freq: str = "month", max_age_seconds: int = None):
+    """
+    Ingresos, gastos y ganancia por día, semana o mes desde el snapshot analítico
+
+    Si el snapshot tiene más de max_age_seconds (por defecto
+    ANALYTICS_SNAPSHOT_MAX_AGE) se actualiza antes de responder; snapshot_at
+    indica hasta cuándo llegan los datos.
+    """
+    validate_analytics_range(date_from, date_to)
+    if freq not in ANALYTICS_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Frecuencia no soportada. Use: {', '.join(ANALYTICS_PERIODS)}"
+        )
+    
+    try:
+        # La actualización lee Firestore y escribe Parquet: fuera del event loop
+        snapshot_at = await asyncio.to_thread(analytics_snapshot.ensure_fresh, db, max_age_seconds)
+        periods = revenue_by_period(
+            analytics_snapshot.load("events"), analytics_snapshot.load("bookings"), date_from, date_to, freq
+        )
+        return {"snapshot_at": snapshot_at.isoformat(), "freq": freq, "periods": periods}
         
-        # Ordenar por número de bookings
-        top_clients = sorted(
-            client_stats.values(),
-            key=lambda x: x["total_bookings"],
-            reverse=True
-        )[:limit]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al generar análisis de ingresos: {str(e)}"
+        )
+
+@router.get("/analytics/overview")
+async def get_analytics_overview(date_from: date, date_to: date, max_age_seconds: int = None):
+    """Bookings por estado, reseñas y notificaciones de un rango desde el snapshot analítico"""
+    validate_analytics_range(date_from, date_to)
+    
+    try:
+        # La actualización lee Firestore y escribe Parquet: fuera del event loop
+        snapshot_at = await asyncio.to_thread(analytics_snapshot.ensure_fresh, db, max_age_seconds)
+        bookings = in_range(analytics_snapshot.load("bookings"), "event_date", date_from, date_to)
+        reviews = in_range(analytics_snapshot.load("reviews"), "created_at", date_from, date_to)
+        notifications = in_range(analytics_snapshot.load("notifications"), "sent_at", date_from, date_to)
         
-        return {"clients": top_clients}
+        status_counts = bookings["status"].fillna("unknown").value_counts()
+        booked = int(status_counts.reindex(["confirmed", "completed"], fill_value=0).sum())
+        ratings = reviews["rating"].dropna()
+        
+        return {
+            "snapshot_at": snapshot_at.isoformat(),
+            "bookings": {
+                "total": len(bookings),
+                "by_status": {key: int(value) for key, value in status_counts.items()},
+                "conversion_rate": round(booked / len(bookings) * 100, 2) if len(bookings) else 0.0
+            },
+            "reviews": {
+                "total": len(reviews),
+                "approved": int(reviews["is_approved"].fillna(False).astype(bool).sum()),
+                "avg_rating": round(float(ratings.mean()), 2) if len(ratings) else None
+            },
+            "notifications": {
+                "total": len(notifications),
+                "by_type_status": {
+                    f"{notification_type}:{notification_status}": int(count)
+                    for (notification_type, notification_status), count in notifications.fillna("unknown")
+                    .groupby(["notification_type", "status"]).size().items()
+                }
+            }
+        }
         
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error al obtener clientes top: {str(e)}"
+            detail=f"Error al generar resumen analítico: {str(e)}"
+        )
+
+# Funciones auxiliares
+ANALYTICS_PERIODS = {"day": "D", "week": "W", "month": "M"}
+
+def validate_analytics_range(date_from: date, date_to: date):
+    if date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_to debe ser igual o posterior a date_from"
         )
 
-# Función auxiliar
+def in_range(frame: pd.DataFrame, column: str, date_from: date, date_to: date) -> pd.DataFrame:
+    """Filas con `column` entre date_from y date_to (ambos días incluidos)"""
+    start = pd.Timestamp(date_from)
+    end = pd.Timestamp(date_to) + pd.Timedelta(days=1)
+    return frame[(frame[column] >= start) & (frame[column] < end)]
+
+def revenue_by_period(events: pd.DataFrame, bookings: pd.DataFrame, date_from: date, date_to: date,
+                      freq: str) -> list:
+    """
+    Agregados de eventos por periodo, con el conteo por tipo de servicio
+
+    Returns:
+        list: Un dict por periodo con eventos, ingresos, gastos, ganancia,
+        participantes promedio y servicios
+    """
+    events = in_range(events, "event_date", date_from, date_to)
+    if events.empty:
+        return []
+    
+    events = events.merge(
+        bookings[["id", "service_type"]].rename(columns={"id": "booking_id"}), on="booking_id", how="left"
+    )
+    events["period"] = events["event_date"].dt.to_period(ANALYTICS_PERIODS[freq]).astype(str)
+    events["service_type"] = events["service_type"].fillna("unknown")
+    
+    totals = events.groupby("period").agg(
+        events=("id", "size"),
+        income=("income", "sum"),
+        expenses=("expenses", "sum"),
+        profit=("profit", "sum"),
+        avg_participants=("participants", "mean")
+    )
+    services = events.groupby(["period", "service_type"]).size().unstack(fill_value=0)
+    
+    return [
+        {
+            "period": period,
+            "events": int(row.events),
+            "income": float(row.income),
+            "expenses": float(row.expenses),
+            "profit": float(row.profit),
+            "avg_participants": round(float(row.avg_participants), 2),
+            "service_counts": {service: int(count) for service, count in services.loc[period].items() if count}
+        }
+        for period, row in totals.iterrows()
+    ]
+
+def count_documents(query) -> int:
+    """Contar documentos con una aggregation query count() en el servidor"""
+    return int(query.count().get()[0][0].value)
+
+def month_range(year: int, month: int):
+    """Inicio del mes y del mes siguiente (datetime: Firestore no admite date)"""
+    start_date = datetime(year, month, 1)
+    if month == 12:
+        end_date = datetime(year + 1, 1, 1)
+    else:
+        end_date = datetime(year, month + 1, 1)
+    return start_date, end_date
+
+EMPTY_MONTH = {
+    "total_events": 0,
+    "total_income": 0.0,
+    "total_expenses": 0.0,
+    "total_profit": 0.0,
+    "avg_participants": 0.0,
+    "most_popular_service": "N/A",
+    "client_retention_rate": 0.0
+}
+
+def report_fields(rollup: dict) -> dict:
+    """
+    Campos de MonthlyReport (sin la retención) a partir de un rollup mensual
+
+    Returns:
+        dict: Métricas del mes, o None si el mes no tiene eventos
+    """
+    total_events = int(rollup.get("event_count", 0))
+    if total_events <= 0:
+        return None
+    
+    # Servicio más popular: en empate gana el primero registrado en el rollup
+    service_counts = {service: count for service, count in rollup.get("service_counts", {}).items() if count > 0}
+    total_income = rollup.get("income", 0.0)
+    total_expenses = rollup.get("expenses", 0.0)
+    
+    return {
+        "total_events": total_events,
+        "total_income": round(float(total_income), 2),
+        "total_expenses": round(float(total_expenses), 2),
+        "total_profit": round(float(total_income - total_expenses), 2),
+        "avg_participants": round(float(rollup.get("participants", 0)) / total_events, 1),
+        "most_popular_service": max(service_counts.items(), key=lambda x: x[1])[0] if service_counts else "N/A"
+    }
+
+def monthly_retention(year: int, year_bookings: list, first_days: dict) -> dict:
+    """
+    Retención de cada mes del año en un solo group-by
+
+    Args:
+        year: Año del resumen
+        year_bookings: Bookings con event_date dentro del año
+        first_days: {email normalizado: YYYYMMDD del primer evento} del índice de clientes
+
+    Returns:
+        dict: {mes: porcentaje de clientes del mes cuyo primer evento es anterior al mes}
+    """
+    visits = pd.DataFrame({
+        "month": [booking["event_date"].month for booking in year_bookings],
+        "client_email": [normalize_email(booking.get("client_email")) for booking in year_bookings]
+    }).drop_duplicates()
+    if visits.empty:
+        return {}
+    
+    month_start = visits["month"].map(lambda month: event_day(date(year, month, 1)))
+    first_day = visits["client_email"].map(lambda email: first_days.get(email, float("inf")))
+    visits["returning"] = first_day < month_start
+    return (visits.groupby("month")["returning"].mean() * 100).to_dict()
+
 async def calculate_client_retention_rate(year: int, month: int) -> float:
     """Calcular tasa de retención de clientes para el mes"""
     try:
         # Obtener clientes del mes actual
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1)
-        else:
-            end_date = date(year, month + 1, 1)
+        start_date, end_date = month_range(year, month)
         
         current_bookings = list(db.collection("bookings").where(
             "event_date", ">=", start_date
         ).where(
             "event_date", "<", end_date
-        ).stream())
+        ).select(["client_email"]).stream())
         
         if not current_bookings:
             return 0.0
         
-        current_clients = set()
-        for booking_doc in current_bookings:
-            booking_data = booking_doc.to_dict()
-            current_clients.add(booking_data.get("client_email"))
-        
-        # Obtener clientes de meses anteriores
-        previous_bookings = list(db.collection("bookings").where(
-            "event_date", "<", start_date
-        ).stream())
-        
-        previous_clients = set()
-        for booking_doc in previous_bookings:
-            booking_data = booking_doc.to_dict()
-            previous_clients.add(booking_data.get("client_email"))
+        current_clients = {normalize_email(booking_doc.to_dict().get("client_email")) for booking_doc in current_bookings}
         
-        # Calcular retención
-        returning_clients = current_clients.intersection(previous_clients)
+        # Clientes cuyo primer evento (según el índice de clientes) es anterior al mes
+        first_days = first_event_days(db, current_clients)
+        start_day = event_day(start_date)
+        returning_clients = {email for email in current_clients if first_days.get(email, start_day) < start_day}
         retention_rate = (len(returning_clients) / len(current_clients)) * 100
         
         return retention_rate
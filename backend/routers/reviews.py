@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Query
 from firebase_admin import firestore
 from models.schemas import ReviewCreate, Review
+from services.cache_service import public_cache
 from typing import List, Optional
 import uuid
 from datetime import datetime
@@ -22,6 +23,7 @@ async def create_review(review: ReviewCreate):
     
     try:
         db.collection("reviews").document(review_id).set(review_data)
+        public_cache.invalidate("dashboard")
         return Review(**review_data)
     except Exception as e:
         raise HTTPException(
@@ -134,8 +136,10 @@ async def approve_review(review_id: str):
         
         review_ref.update({
             "is_approved": True,
-            "approved_at": datetime.now()
+            "approved_at": datetime.now(),
+            "updated_at": datetime.now()
         })
+        public_cache.invalidate("reviews_featured", "dashboard")
         
         return {"message": "Reseña aprobada exitosamente"}
     except HTTPException:
@@ -160,6 +164,7 @@ async def delete_review(review_id: str):
             )
         
         review_ref.delete()
+        public_cache.invalidate("reviews_featured", "dashboard")
         
         return {"message": "Reseña eliminada exitosamente"}
     except HTTPException:
@@ -196,6 +201,10 @@ async def get_reviews_by_event(event_id: str):
 async def get_featured_reviews(limit: int = Query(6, description="Número de reseñas destacadas")):
     """Obtener reseñas destacadas para mostrar en la página principal"""
     try:
+        cached_reviews = public_cache.get("reviews_featured", key=limit)
+        if cached_reviews is not None:
+            return cached_reviews
+
         docs = db.collection("reviews").where(
             "is_approved", "==", True
         ).where(
@@ -211,6 +220,7 @@ async def get_featured_reviews(limit: int = Query(6, description="Número de res
             data = doc.to_dict()
             reviews.append(Review(**data))
         
+        public_cache.set("reviews_featured", reviews, key=limit)
         return reviews
     except Exception as e:
         raise HTTPException(
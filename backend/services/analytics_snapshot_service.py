@@ -0,0 +1,371 @@
+from datetime import datetime, timedelta, timezone
+from decouple import config
+import json
+import logging
+import os
+import threading
+
+from services.rollup_service import event_figures
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Directorio local del snapshot y antigüedad máxima por defecto (segundos)
+ANALYTICS_SNAPSHOT_DIR = config('ANALYTICS_SNAPSHOT_DIR', default='/tmp/analytics_snapshot')
+ANALYTICS_SNAPSHOT_MAX_AGE = config('ANALYTICS_SNAPSHOT_MAX_AGE', default=900, cast=int)
+
+# Documentos por página al leer cambios y partes antes de compactar
+SNAPSHOT_PAGE_SIZE = config('ANALYTICS_SNAPSHOT_PAGE_SIZE', default=1000, cast=int)
+SNAPSHOT_MAX_PARTS = config('ANALYTICS_SNAPSHOT_MAX_PARTS', default=20, cast=int)
+
+# Cada actualización vuelve a leer desde la marca menos este margen (segundos),
+# para no perder escrituras cuya fecha llega después de otra ya vista
+SNAPSHOT_OVERLAP_SECONDS = config('ANALYTICS_SNAPSHOT_OVERLAP_SECONDS', default=60, cast=int)
+
+STATE_FILE = "_state.json"
+
+# Marca inicial para campos de cambio que aún no tienen fechas en la colección
+EPOCH = datetime(1970, 1, 1)
+
+# Columnas tipadas por colección: "string", "float", "bool" o "timestamp"
+SNAPSHOT_COLUMNS = {
+    "bookings": {
+        "id": "string", "client_email": "string", "service_type": "string", "status": "string",
+        "participants": "float", "estimated_price": "float", "confirmed_price": "float",
+        "event_date": "timestamp", "created_at": "timestamp", "updated_at": "timestamp"
+    },
+    "events": {
+        "id": "string", "booking_id": "string", "status": "string", "participants": "float",
+        "income": "float", "expenses": "float", "profit": "float",
+        "event_date": "timestamp", "created_at": "timestamp", "updated_at": "timestamp"
+    },
+    "reviews": {
+        "id": "string", "event_id": "string", "client_email": "string", "rating": "float",
+        "is_approved": "bool", "created_at": "timestamp", "updated_at": "timestamp"
+    },
+    "notifications": {
+        "id": "string", "notification_type": "string", "status": "string", "recipient_phone": "string",
+        "sent_at": "timestamp"
+    }
+}
+
+# Campos de fecha que marcan un documento nuevo o modificado. Las
+# notificaciones no se modifican después de escribirse, así que basta sent_at.
+SNAPSHOT_CHANGE_FIELDS = {
+    "bookings": ("created_at", "updated_at"),
+    "events": ("created_at", "updated_at"),
+    "reviews": ("created_at", "updated_at"),
+    "notifications": ("sent_at",)
+}
+
+
+def _timestamp(value):
+    """datetime en UTC sin zona horaria, desde datetime o texto ISO (YYYY-MM-DD...)"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value[:26])
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _string(value):
+    if value is None:
+        return None
+    return str(getattr(value, 'value', value))
+
+
+CONVERTERS = {"string": _string, "float": _float, "bool": lambda value: None if value is None else bool(value),
+              "timestamp": _timestamp}
+
+
+def snapshot_row(collection: str, doc) -> dict:
+    """Fila tipada del snapshot para un documento, con las columnas de SNAPSHOT_COLUMNS"""
+    data = doc.to_dict()
+    if collection == "events":
+        figures = event_figures(data)
+        data = {**data, **figures, "event_date": figures["date"]}
+    data["id"] = doc.id
+    return {
+        column: CONVERTERS[kind](data.get(column))
+        for column, kind in SNAPSHOT_COLUMNS[collection].items()
+    }
+
+
+def arrow_schema(collection: str):
+    import pyarrow as pa
+
+    types = {"string": pa.string(), "float": pa.float64(), "bool": pa.bool_(), "timestamp": pa.timestamp('us')}
+    return pa.schema([(column, types[kind]) for column, kind in SNAPSHOT_COLUMNS[collection].items()])
+
+
+def _encode_watermark(value) -> dict:
+    return {"value": value.isoformat(), "aware": value.tzinfo is not None}
+
+
+def _decode_watermark(data: dict):
+    value = datetime.fromisoformat(data["value"])
+    return value if data["aware"] else value.replace(tzinfo=None)
+
+
+def _within_overlap(stamps: dict, since) -> dict:
+    """Ids cuya fecha cae en la ventana de solape (las que no se pueden comparar se conservan)"""
+    kept = {}
+    for doc_id, stamp in stamps.items():
+        try:
+            if datetime.fromisoformat(stamp) < since:
+                continue
+        except TypeError:
+            pass
+        kept[doc_id] = stamp
+    return kept
+
+
+def _iter_changes(db, collection: str, field: str, since, page_size: int):
+    """Documentos con `field` igual o posterior a `since`, en páginas ordenadas por `field`"""
+    query = db.collection(collection).where(field, ">=", since).order_by(field)
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc is not None else query
+        page = list(page_query.limit(page_size).stream())
+        yield from page
+        if len(page) < page_size:
+            break
+        last_doc = page[-1]
+
+
+class AnalyticsSnapshot:
+    """
+    Snapshot columnar (Parquet) de bookings, eventos, reseñas y notificaciones
+
+    Cada colección se guarda como una serie de partes Parquet con columnas
+    tipadas. La primera actualización copia la colección completa y las
+    siguientes solo agregan los documentos con created_at/updated_at (sent_at
+    en notificaciones) posterior a la última marca vista, en una parte nueva.
+    La lectura empieza SNAPSHOT_OVERLAP_SECONDS antes de la marca, y los
+    documentos de esa ventana que ya se copiaron con la misma fecha (se guardan
+    sus ids) se descartan. Al leer se queda la versión más reciente de cada id,
+    y cuando hay más de SNAPSHOT_MAX_PARTS partes se compactan en una sola.
+
+    Los documentos eliminados en Firestore siguen en el snapshot hasta que se
+    reconstruya con rebuild().
+    """
+
+    def __init__(self, directory: str = None, clock=datetime.now):
+        self.directory = directory or ANALYTICS_SNAPSHOT_DIR
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._frames = {}
+
+    # --- Estado -------------------------------------------------------------
+
+    def _state_path(self) -> str:
+        return os.path.join(self.directory, STATE_FILE)
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self._state_path()) as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return {"refreshed_at": None, "collections": {}}
+
+    def _save_state(self, state: dict):
+        self._write_atomic(self._state_path(), lambda path: self._dump_json(path, state))
+
+    @staticmethod
+    def _dump_json(path: str, data: dict):
+        with open(path, "w") as state_file:
+            json.dump(data, state_file)
+
+    @staticmethod
+    def _write_atomic(path: str, write):
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def refreshed_at(self):
+        """Momento de la última actualización, o None si no existe snapshot"""
+        refreshed_at = self._load_state().get("refreshed_at")
+        return datetime.fromisoformat(refreshed_at) if refreshed_at else None
+
+    def age_seconds(self):
+        """Segundos desde la última actualización (None si no existe snapshot)"""
+        refreshed_at = self.refreshed_at()
+        return None if refreshed_at is None else (self.clock() - refreshed_at).total_seconds()
+
+    # --- Escritura ----------------------------------------------------------
+
+    def _write_part(self, collection: str, table, part_number: int) -> str:
+        import pyarrow.parquet as pq
+
+        collection_dir = os.path.join(self.directory, collection)
+        os.makedirs(collection_dir, exist_ok=True)
+        name = f"part-{part_number:05d}.parquet"
+        self._write_atomic(os.path.join(collection_dir, name), lambda path: pq.write_table(table, path))
+        return name
+
+    def _refresh_collection(self, db, collection: str, collection_state: dict) -> int:
+        import pyarrow as pa
+
+        watermarks = collection_state.get("watermarks")
+        # {campo: {id: fecha ISO}} de los documentos ya copiados dentro de la ventana de solape
+        recent = collection_state.get("recent", {})
+        overlap = timedelta(seconds=SNAPSHOT_OVERLAP_SECONDS)
+        if watermarks is None:
+            documents = db.collection(collection).stream()
+        else:
+            documents = {}
+            for field in SNAPSHOT_CHANGE_FIELDS[collection]:
+                watermark = _decode_watermark(watermarks[field]) if field in watermarks else EPOCH
+                seen = recent.get(field, {})
+                for doc in _iter_changes(db, collection, field, watermark - overlap, SNAPSHOT_PAGE_SIZE):
+                    value = doc.to_dict().get(field)
+                    if isinstance(value, datetime) and seen.get(doc.id) == value.isoformat():
+                        continue
+                    documents[doc.id] = doc
+            documents = documents.values()
+
+        rows = []
+        latest = {field: _decode_watermark(value) for field, value in (watermarks or {}).items()}
+        stamps = {field: dict(recent.get(field, {})) for field in SNAPSHOT_CHANGE_FIELDS[collection]}
+        for doc in documents:
+            rows.append(snapshot_row(collection, doc))
+            data = doc.to_dict()
+            for field in SNAPSHOT_CHANGE_FIELDS[collection]:
+                value = data.get(field)
+                if not isinstance(value, datetime):
+                    continue
+                stamps[field][doc.id] = value.isoformat()
+                try:
+                    if field not in latest or value > latest[field]:
+                        latest[field] = value
+                except TypeError:
+                    # Fechas con y sin zona horaria en el mismo campo: se queda la marca anterior
+                    continue
+
+        parts = collection_state.setdefault("parts", [])
+        if rows or watermarks is None:
+            next_part = collection_state.get("next_part", 0)
+            table = pa.Table.from_pylist(rows, schema=arrow_schema(collection))
+            parts.append(self._write_part(collection, table, next_part))
+            collection_state["next_part"] = next_part + 1
+        collection_state["watermarks"] = {field: _encode_watermark(value) for field, value in latest.items()}
+        collection_state["recent"] = {
+            field: _within_overlap(stamps[field], latest[field] - overlap)
+            for field in latest
+        }
+
+        if len(parts) > SNAPSHOT_MAX_PARTS:
+            self._compact(collection, collection_state)
+        return len(rows)
+
+    def _compact(self, collection: str, collection_state: dict):
+        import pyarrow as pa
+
+        frame = self._read_parts(collection, collection_state["parts"])
+        table = pa.Table.from_pandas(frame, schema=arrow_schema(collection), preserve_index=False)
+        old_parts = collection_state["parts"]
+        next_part = collection_state["next_part"]
+        collection_state["parts"] = [self._write_part(collection, table, next_part)]
+        collection_state["next_part"] = next_part + 1
+        for name in old_parts:
+            try:
+                os.remove(os.path.join(self.directory, collection, name))
+            except OSError:
+                pass
+        logger.info(f"Snapshot de {collection} compactado: {len(old_parts)} partes en 1")
+
+    def refresh(self, db) -> dict:
+        """
+        Agregar al snapshot los documentos nuevos o modificados desde la última actualización
+
+        Args:
+            db: Cliente Firestore
+
+        Returns:
+            dict: {colección: filas agregadas}
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            state = self._load_state()
+            appended = {}
+            for collection in SNAPSHOT_COLUMNS:
+                collection_state = state["collections"].setdefault(collection, {})
+                appended[collection] = self._refresh_collection(db, collection, collection_state)
+            state["refreshed_at"] = self.clock().isoformat()
+            self._save_state(state)
+            self._frames = {}
+
+        logger.info(f"Snapshot analítico actualizado: {appended}")
+        return appended
+
+    def rebuild(self, db) -> dict:
+        """Descartar el snapshot y copiar de nuevo todas las colecciones"""
+        with self._lock:
+            state = self._load_state()
+            for collection, collection_state in state["collections"].items():
+                for name in collection_state.get("parts", []):
+                    try:
+                        os.remove(os.path.join(self.directory, collection, name))
+                    except OSError:
+                        pass
+            self._save_state({"refreshed_at": None, "collections": {}})
+            self._frames = {}
+        return self.refresh(db)
+
+    def ensure_fresh(self, db, max_age_seconds: int = None) -> datetime:
+        """
+        Actualizar el snapshot si es más antiguo que max_age_seconds
+
+        Returns:
+            datetime: Momento de la actualización vigente
+        """
+        max_age_seconds = ANALYTICS_SNAPSHOT_MAX_AGE if max_age_seconds is None else max_age_seconds
+        age = self.age_seconds()
+        if age is None or age > max_age_seconds:
+            self.refresh(db)
+        return self.refreshed_at()
+
+    # --- Lectura ------------------------------------------------------------
+
+    def _read_parts(self, collection: str, parts: list):
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        schema = arrow_schema(collection)
+        frames = [
+            pq.read_table(os.path.join(self.directory, collection, name), schema=schema).to_pandas()
+            for name in parts
+        ]
+        if not frames:
+            return schema.empty_table().to_pandas()
+        frame = pd.concat(frames, ignore_index=True)
+        # Las partes están en orden de escritura: la última fila de cada id es la vigente
+        return frame.drop_duplicates(subset="id", keep="last").reset_index(drop=True)
+
+    def load(self, collection: str):
+        """
+        DataFrame de una colección, con una fila por documento
+
+        Returns:
+            pandas.DataFrame: Columnas de SNAPSHOT_COLUMNS[collection]
+        """
+        parts = tuple(self._load_state()["collections"].get(collection, {}).get("parts", []))
+        cached = self._frames.get(collection)
+        if cached is None or cached[0] != parts:
+            cached = self._frames[collection] = (parts, self._read_parts(collection, list(parts)))
+        return cached[1]
+
+
+analytics_snapshot = AnalyticsSnapshot()
@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+from decouple import config
+from firebase_admin import firestore
+import logging
+import zlib
+
+from services.common import event_day, status_name
+from utils.phone import normalize_phone
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUDIENCES_COLLECTION = "audiences"
+
+# Segmentos de destinatarios de los envíos masivos y el índice que los resuelve:
+# audiences/clients-NN:         members.{+E164}.last_booking_day = YYYYMMDD del último booking creado
+# audiences/active_bookings-NN: members.{+E164}.{booking_id} = YYYYMMDD del evento confirmado
+# "all" es el filtro por defecto de /bulk-send y nunca tuvo destinatarios: un
+# envío sin filtro no debe llegar a toda la base de clientes
+AUDIENCE_SEGMENTS = {
+    "all": None,
+    "recent_clients": "clients",
+    "active_bookings": "active_bookings"
+}
+
+# Documentos en que se reparte cada índice (el teléfono decide el shard), para
+# que las escrituras de bookings no se concentren en un solo documento ni se
+# acerquen al límite de 1 MiB. Al cambiarlo hay que correr backfill-audiences.
+AUDIENCE_SHARDS = config('AUDIENCE_SHARDS', default=10, cast=int)
+
+# Días hacia atrás que cuenta un cliente como reciente
+RECENT_CLIENT_DAYS = 30
+
+
+def audience_shard(db, index: str, phone: str):
+    """Documento del índice que guarda un teléfono (estable entre procesos)"""
+    return db.collection(AUDIENCES_COLLECTION).document(
+        f"{index}-{zlib.crc32(phone.encode('utf-8')) % AUDIENCE_SHARDS:02d}"
+    )
+
+
+def audience_shards(db, index: str) -> list:
+    """Todos los documentos de un índice"""
+    collection = db.collection(AUDIENCES_COLLECTION)
+    return [collection.document(f"{index}-{shard:02d}") for shard in range(AUDIENCE_SHARDS)]
+
+
+def _active_day(booking: dict):
+    """Día del evento si el booking está confirmado, None si no cuenta como activo"""
+    if booking is None or status_name(booking.get('status')) != 'confirmed':
+        return None
+    return event_day(booking.get('event_date'))
+
+
+def record_booking_audience(db, batch, booking_id: str, booking: dict, previous: dict = None):
+    """
+    Actualizar el índice de audiencias con un booking escrito en el mismo batch
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch (o Transaction) donde se escribe el booking
+        booking_id: ID del booking
+        booking: Datos del booking después de la escritura
+        previous: Datos antes de la escritura (None si el booking es nuevo)
+    """
+    phone = normalize_phone(booking.get('client_phone'))
+
+    if previous is None and phone is not None:
+        created_day = event_day(booking.get('created_at') or datetime.now())
+        batch.set(audience_shard(db, "clients", phone), {
+            "members": {phone: {"last_booking_day": firestore.Maximum(created_day)}},
+            "updated_at": datetime.now()
+        }, merge=True)
+
+    previous_phone = normalize_phone((previous or {}).get('client_phone'))
+    previous_day, day = _active_day(previous), _active_day(booking)
+    if phone is None:
+        day = None
+    if (previous_phone, previous_day) == (phone, day):
+        return
+
+    members = {}
+    if previous_day is not None and previous_phone is not None:
+        members[previous_phone] = {booking_id: firestore.DELETE_FIELD}
+    if day is not None:
+        members.setdefault(phone, {})[booking_id] = day
+    # Un cambio de teléfono puede tocar dos shards
+    shards = {}
+    for member_phone, member in members.items():
+        shard_ref = audience_shard(db, "active_bookings", member_phone)
+        shards.setdefault(shard_ref.id, (shard_ref, {}))[1][member_phone] = member
+    for shard_ref, shard_members in shards.values():
+        batch.set(shard_ref, {
+            "members": shard_members,
+            "updated_at": datetime.now()
+        }, merge=True)
+
+
+def resolve_audience(db, segment: str, today: datetime = None) -> list:
+    """
+    Teléfonos E.164 de un segmento, con una sola lectura (get_all) de los shards del índice
+
+    Cada teléfono es una clave del mapa members de un único shard, así que un
+    cliente con varios bookings aparece una sola vez.
+
+    Args:
+        segment: "all" (sin destinatarios), "recent_clients" o "active_bookings"
+        today: Fecha de referencia (por defecto hoy)
+
+    Returns:
+        list: Teléfonos ordenados
+
+    Raises:
+        ValueError: Si el segmento no existe
+    """
+    if segment not in AUDIENCE_SEGMENTS:
+        raise ValueError(f"Segmento desconocido: {segment}")
+    if AUDIENCE_SEGMENTS[segment] is None:
+        return []
+
+    today = today or datetime.now()
+    members = {}
+    for shard_doc in db.get_all(audience_shards(db, AUDIENCE_SEGMENTS[segment])):
+        if shard_doc.exists:
+            members.update((shard_doc.to_dict() or {}).get("members", {}))
+
+    if segment == "recent_clients":
+        cutoff = event_day(today - timedelta(days=RECENT_CLIENT_DAYS))
+        members = {phone: member for phone, member in members.items()
+                   if (member.get("last_booking_day") or 0) >= cutoff}
+    elif segment == "active_bookings":
+        # Eventos confirmados de hoy en adelante
+        first_day = event_day(today)
+        members = {phone: days for phone, days in members.items()
+                   if any(day >= first_day for day in days.values())}
+
+    return sorted(members)
+
+
+def rebuild_audiences(db, today: datetime = None) -> dict:
+    """
+    Reconstruir el índice de audiencias desde todos los bookings (backfill)
+
+    También descarta los eventos confirmados que ya pasaron, que las
+    escrituras incrementales dejan en el índice.
+
+    Returns:
+        dict: {índice: número de teléfonos}
+    """
+    first_day = event_day(today or datetime.now())
+    clients = {}
+    active = {}
+    for booking_doc in db.collection("bookings").select(
+        ["client_phone", "status", "event_date", "created_at"]
+    ).stream():
+        booking = booking_doc.to_dict()
+        phone = normalize_phone(booking.get('client_phone'))
+        if phone is None:
+            continue
+
+        created_day = event_day(booking.get('created_at'))
+        member = clients.setdefault(phone, {"last_booking_day": None})
+        if created_day is not None and (member["last_booking_day"] or 0) < created_day:
+            member["last_booking_day"] = created_day
+
+        day = _active_day(booking)
+        if day is not None and day >= first_day:
+            active.setdefault(phone, {})[booking_doc.id] = day
+
+    now = datetime.now()
+    batch = db.batch()
+    for index, members in (("clients", clients), ("active_bookings", active)):
+        shards = {shard_ref.id: (shard_ref, {}) for shard_ref in audience_shards(db, index)}
+        for phone, member in members.items():
+            shards[audience_shard(db, index, phone).id][1][phone] = member
+        for shard_ref, shard_members in shards.values():
+            batch.set(shard_ref, {"members": shard_members, "updated_at": now})
+    batch.commit()
+
+    logger.info(f"Audiencias reconstruidas: {len(clients)} clientes, {len(active)} con bookings activos")
+    return {"clients": len(clients), "active_bookings": len(active)}
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+import asyncio
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Documentos por llamada a get_all y llamadas simultáneas
+BATCH_READ_CHUNK_SIZE = config('BATCH_READ_CHUNK_SIZE', default=100, cast=int)
+BATCH_READ_MAX_WORKERS = config('BATCH_READ_MAX_WORKERS', default=4, cast=int)
+
+# Hilos del pool compartido para consultas independientes y tiempo máximo por consulta (segundos)
+FANOUT_MAX_WORKERS = config('FANOUT_MAX_WORKERS', default=8, cast=int)
+FANOUT_TIMEOUT_SECONDS = config('FANOUT_TIMEOUT_SECONDS', default=5.0, cast=float)
+
+_fanout_executor = None
+_fanout_lock = threading.Lock()
+
+
+def get_documents(db, collection: str, document_ids, chunk_size: int = None,
+                  max_workers: int = None, field_paths=None) -> dict:
+    """
+    Leer muchos documentos de una colección con get_all por bloques concurrentes
+
+    En lugar de un document(id).get() por documento (N idas y vueltas en serie),
+    los IDs se agrupan en bloques de chunk_size y cada bloque es una sola llamada
+    get_all; los bloques se piden en paralelo.
+
+    Args:
+        db: Cliente Firestore
+        collection: Nombre de la colección
+        document_ids: IDs a leer (se ignoran vacíos y duplicados)
+        chunk_size: Documentos por get_all
+        max_workers: Bloques leídos simultáneamente
+        field_paths: Proyección opcional de campos
+
+    Returns:
+        dict: {document_id: DocumentSnapshot} solo con los documentos que existen
+    """
+    chunk_size = chunk_size or BATCH_READ_CHUNK_SIZE
+    max_workers = max_workers or BATCH_READ_MAX_WORKERS
+
+    unique_ids = list(dict.fromkeys(doc_id for doc_id in document_ids if doc_id))
+    if not unique_ids:
+        return {}
+
+    collection_ref = db.collection(collection)
+    chunks = [
+        [collection_ref.document(doc_id) for doc_id in unique_ids[start:start + chunk_size]]
+        for start in range(0, len(unique_ids), chunk_size)
+    ]
+
+    def read_chunk(refs):
+        return list(db.get_all(refs, field_paths=field_paths))
+
+    if len(chunks) == 1:
+        results = [read_chunk(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(read_chunk, chunks))
+
+    documents = {}
+    for snapshots in results:
+        for snapshot in snapshots:
+            if snapshot.exists:
+                documents[snapshot.id] = snapshot
+
+    logger.info(f"Lectura por lotes de {collection}: {len(unique_ids)} IDs en {len(chunks)} llamadas, {len(documents)} encontrados")
+    return documents
+
+
+def get_fanout_executor() -> ThreadPoolExecutor:
+    """Pool de hilos acotado, compartido por todas las llamadas a gather_reads"""
+    global _fanout_executor
+    with _fanout_lock:
+        if _fanout_executor is None:
+            _fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+        return _fanout_executor
+
+
+async def gather_reads(reads: dict, timeout: float = None) -> tuple:
+    """
+    Ejecutar lecturas bloqueantes independientes en paralelo, cada una con su tiempo máximo
+
+    Cada lectura corre en el pool compartido (el cliente Firestore es síncrono)
+    y se espera como mucho timeout segundos. Una lectura que falla o se demora
+    no detiene a las demás: queda registrada en los errores. Un hilo que
+    excede el tiempo sigue ocupando su lugar en el pool hasta terminar.
+
+    Args:
+        reads: {nombre: función sin argumentos}
+        timeout: Segundos por lectura (por defecto FANOUT_TIMEOUT_SECONDS)
+
+    Returns:
+        tuple: ({nombre: resultado} de las lecturas completadas,
+                {nombre: descripción del error} de las que fallaron)
+    """
+    timeout = FANOUT_TIMEOUT_SECONDS if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    executor = get_fanout_executor()
+
+    names = list(reads)
+    outcomes = await asyncio.gather(*(
+        asyncio.wait_for(loop.run_in_executor(executor, reads[name]), timeout) for name in names
+    ), return_exceptions=True)
+
+    results, errors = {}, {}
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            errors[name] = f"timeout after {timeout}s"
+        elif isinstance(outcome, Exception):
+            errors[name] = str(outcome) or type(outcome).__name__
+        else:
+            results[name] = outcome
+
+    if errors:
+        logger.warning(f"Lecturas con error: {errors}")
+    return results, errors
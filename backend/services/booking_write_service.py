@@ -0,0 +1,109 @@
+from firebase_admin import firestore
+
+from services.audience_service import record_booking_audience
+from services.client_index_service import (
+    record_booking, record_event_date_change, record_event_income, record_status_change
+)
+from services.common import event_income
+from services.reminder_service import record_booking_reminder
+from services.rollup_service import record_booking_rollup, record_event_rollup
+
+# Escrituras de bookings y eventos junto con los índices que dependen de ellas
+# (índice y ledger de clientes, rollups, audiencias y cola de recordatorios).
+# Cada índice conoce solo sus propios documentos; este módulo decide cuáles
+# se actualizan con cada escritura.
+
+
+def record_new_booking(db, batch, booking_id: str, booking: dict):
+    """
+    Registrar un booking nuevo en los índices dentro del mismo batch
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch donde se escribe el booking
+        booking_id: ID del booking
+        booking: Datos del booking
+    """
+    record_booking(db, batch, booking_id, booking)
+    record_booking_rollup(db, batch, booking)
+    record_booking_audience(db, batch, booking_id, booking)
+
+
+def record_booking_change(db, batch, booking_id: str, booking: dict, previous: dict):
+    """
+    Registrar en los índices el cambio de un booking existente
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch (o Transaction) donde se escribe el booking
+        booking_id: ID del booking
+        booking: Datos del booking después del cambio
+        previous: Datos antes del cambio
+    """
+    record_status_change(db, batch, previous, previous.get('status'), booking.get('status'))
+    record_booking_rollup(db, batch, booking, previous=previous)
+    record_booking_audience(db, batch, booking_id, booking, previous=previous)
+    record_booking_reminder(db, batch, booking_id, booking, previous=previous)
+
+
+def record_new_event(db, batch, event: dict, booking: dict, event_date=None):
+    """
+    Registrar un evento nuevo en los rollups y en el ledger del cliente de su booking
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch donde se escribe el evento
+        event: Datos del evento
+        booking: Booking del evento, o None
+        event_date: Fecha del evento, para la última visita del cliente
+    """
+    record_event_income(db, batch, booking, event_income(event), event_date)
+    record_event_rollup(db, batch, event, booking)
+
+
+def apply_booking_update(db, booking_ref, update_data: dict) -> dict:
+    """
+    Actualizar un booking junto con sus índices en una transacción
+
+    Returns:
+        dict: Datos del booking antes de la actualización
+    """
+    return _update_booking(db.transaction(), db, booking_ref, update_data)
+
+
+@firestore.transactional
+def _update_booking(transaction, db, booking_ref, update_data: dict) -> dict:
+    current = booking_ref.get(transaction=transaction).to_dict()
+    updated = {**current, **update_data}
+
+    # Lee el índice del cliente: va antes de las escrituras de la transacción
+    record_event_date_change(db, transaction, booking_ref.id, updated, current)
+    transaction.update(booking_ref, update_data)
+    record_booking_change(db, transaction, booking_ref.id, updated, current)
+    return current
+
+
+def apply_event_update(db, event_ref, update_data: dict) -> dict:
+    """
+    Actualizar un evento junto con los rollups y el ledger del cliente en una transacción
+
+    Returns:
+        dict: Datos del evento antes de la actualización
+    """
+    return _update_event(db.transaction(), db, event_ref, update_data)
+
+
+@firestore.transactional
+def _update_event(transaction, db, event_ref, update_data: dict) -> dict:
+    current = event_ref.get(transaction=transaction).to_dict()
+    updated = {**current, **update_data}
+
+    booking = None
+    if current.get('booking_id'):
+        booking_doc = db.collection("bookings").document(current['booking_id']).get(transaction=transaction)
+        booking = booking_doc.to_dict() if booking_doc.exists else None
+
+    transaction.update(event_ref, update_data)
+    record_event_rollup(db, transaction, updated, booking, previous=current)
+    record_event_income(db, transaction, booking, event_income(updated) - event_income(current))
+    return current
@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta
+from decouple import config
+from firebase_admin import firestore
+import asyncio
+import logging
+import time
+import uuid
+
+from services.common import BATCH_LIMIT, TokenBucket, as_naive_utc
+from services.delivery_log_service import delivery_log
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BULK_JOBS_COLLECTION = "bulk_send_jobs"
+BULK_JOB_CHUNKS_COLLECTION = "bulk_send_job_chunks"
+
+# Destinatarios por documento de bulk_send_job_chunks (cada uno guarda sus
+# teléfonos y sus resultados, lejos del límite de 1 MiB por documento)
+BULK_SEND_CHUNK_SIZE = config('BULK_SEND_CHUNK_SIZE', default=1000, cast=int)
+
+# Envíos simultáneos por trabajo y ritmo del sender de Twilio (mensajes/segundo y ráfaga)
+BULK_SEND_CONCURRENCY = config('BULK_SEND_CONCURRENCY', default=5, cast=int)
+BULK_SEND_RATE = config('BULK_SEND_RATE', default=10.0, cast=float)
+BULK_SEND_BURST = config('BULK_SEND_BURST', default=10, cast=int)
+
+# Cada cuántos envíos (o segundos) se guarda el progreso, y duración del lease del worker
+BULK_SEND_CHECKPOINT_EVERY = config('BULK_SEND_CHECKPOINT_EVERY', default=20, cast=int)
+BULK_SEND_CHECKPOINT_SECONDS = config('BULK_SEND_CHECKPOINT_SECONDS', default=2.0, cast=float)
+BULK_SEND_LEASE_SECONDS = config('BULK_SEND_LEASE_SECONDS', default=120, cast=int)
+
+# Estados de un trabajo de envío masivo
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_INTERRUPTED = "interrupted"
+STATUS_COMPLETED = "completed"
+
+
+def chunk_refs(db, job: dict) -> list:
+    """Documentos bulk_send_job_chunks/{job_id}-NNNN del trabajo, en orden"""
+    collection = db.collection(BULK_JOB_CHUNKS_COLLECTION)
+    return [collection.document(f"{job['id']}-{chunk:04d}") for chunk in range(job["chunks"])]
+
+
+def create_bulk_job(db, message: str, notification_type: str, recipients: list, recipient_filter: str = None,
+                    chunk_size: int = None) -> dict:
+    """
+    Registrar un trabajo de envío masivo con su lista de destinatarios ya resuelta
+
+    La lista queda fija, así que al reanudar se envía a los mismos destinatarios
+    aunque cambien los bookings. Los destinatarios y su resultado se reparten en
+    documentos de chunk_size en bulk_send_job_chunks; el documento del trabajo
+    solo lleva el estado y los contadores.
+
+    Returns:
+        dict: Documento del trabajo
+    """
+    chunk_size = chunk_size or BULK_SEND_CHUNK_SIZE
+    recipients = list(recipients)
+    job_id = str(uuid.uuid4())
+    now = datetime.now()
+    job = {
+        "id": job_id,
+        "status": STATUS_PENDING,
+        "message": message,
+        "notification_type": notification_type,
+        "recipient_filter": recipient_filter,
+        "total": len(recipients),
+        "chunk_size": chunk_size,
+        "chunks": -(-len(recipients) // chunk_size),
+        "sent": 0,
+        "failed": 0,
+        "lease_expires_at": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+    # Índice global del destinatario (como texto) -> "sent" | "failed"
+    writes = [
+        (chunk_ref, {"job_id": job_id, "chunk": chunk, "recipients": recipients[chunk * chunk_size:(chunk + 1) * chunk_size],
+                     "outcomes": {}})
+        for chunk, chunk_ref in enumerate(chunk_refs(db, job))
+    ]
+    # El trabajo va en el último batch, así nunca queda visible sin todos sus chunks
+    writes.append((db.collection(BULK_JOBS_COLLECTION).document(job_id), job))
+    for start in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        for doc_ref, data in writes[start:start + BATCH_LIMIT]:
+            batch.set(doc_ref, data)
+        batch.commit()
+    return job
+
+
+def job_progress(job: dict) -> dict:
+    """Vista pública del trabajo"""
+    done = job.get("sent", 0) + job.get("failed", 0)
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "notification_type": job.get("notification_type"),
+        "total": job["total"],
+        "sent": job.get("sent", 0),
+        "failed": job.get("failed", 0),
+        "pending": job["total"] - done,
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+
+class BulkSendRunner:
+    """
+    Ejecuta trabajos de envío masivo con concurrencia acotada y token bucket
+
+    El trabajo se toma en una transacción, así que dos workers no lo envían a
+    la vez. El progreso (resultado por destinatario en su chunk y contadores en
+    el trabajo) se guarda en un WriteBatch, junto con un flush del registro de
+    envíos, cada BULK_SEND_CHECKPOINT_EVERY envíos o
+    BULK_SEND_CHECKPOINT_SECONDS segundos, lo que ocurra primero, y al
+    terminar o interrumpirse. Un trabajo interrumpido, o cuyo worker dejó vencer
+    el lease, se reanuda con run() y solo envía a los destinatarios sin
+    resultado. Los envíos hechos después del último checkpoint de un worker
+    caído se repiten al reanudar (entrega al menos una vez).
+    """
+
+    def __init__(self, db, send, concurrency: int = None, rate: float = None, burst: int = None,
+                 checkpoint_every: int = None, checkpoint_seconds: float = None,
+                 lease_seconds: int = None, clock=datetime.now):
+        self.db = db
+        self.send = send
+        self.concurrency = concurrency or BULK_SEND_CONCURRENCY
+        self.rate = rate or BULK_SEND_RATE
+        self.burst = burst or BULK_SEND_BURST
+        self.checkpoint_every = checkpoint_every or BULK_SEND_CHECKPOINT_EVERY
+        self.checkpoint_seconds = checkpoint_seconds or BULK_SEND_CHECKPOINT_SECONDS
+        self.lease_seconds = lease_seconds or BULK_SEND_LEASE_SECONDS
+        self.clock = clock
+
+    def resumable(self, job: dict) -> bool:
+        """True si el trabajo no terminó y nadie lo está procesando"""
+        return _resumable(job, self.clock())
+
+    def _lease(self) -> dict:
+        now = self.clock()
+        return {"lease_expires_at": now + timedelta(seconds=self.lease_seconds), "updated_at": now}
+
+    def _claim(self, job_ref):
+        return _claim_job(self.db.transaction(), job_ref, self.clock(),
+                          {"status": STATUS_RUNNING, **self._lease()})
+
+    def _save(self, job_ref, job: dict, outcomes: dict, final_status: str = None):
+        """Guardar resultados y contadores en un solo batch"""
+        batch = self.db.batch()
+        chunks = {}
+        for index, outcome in outcomes.items():
+            chunks.setdefault(int(index) // job["chunk_size"], {})[f"outcomes.{index}"] = outcome
+        refs = chunk_refs(self.db, job)
+        for chunk, fields in chunks.items():
+            batch.update(refs[chunk], fields)
+
+        update = self._lease()
+        for outcome in ("sent", "failed"):
+            count = sum(1 for value in outcomes.values() if value == outcome)
+            if count:
+                update[outcome] = firestore.Increment(count)
+        if final_status is not None:
+            update["status"] = final_status
+            update["lease_expires_at"] = None
+            if final_status == STATUS_COMPLETED:
+                update["finished_at"] = self.clock()
+        batch.update(job_ref, update)
+        batch.commit()
+        # Los registros de envío de lo ya guardado no esperan al hilo de fondo
+        delivery_log.flush()
+
+    def _pending(self, job: dict) -> list:
+        """(índice, teléfono) de los destinatarios sin resultado, en una sola lectura de los chunks"""
+        pending = []
+        for snapshot in self.db.get_all(chunk_refs(self.db, job)):
+            chunk = snapshot.to_dict()
+            outcomes = chunk.get("outcomes", {})
+            first = chunk["chunk"] * job["chunk_size"]
+            pending += [(first + offset, phone) for offset, phone in enumerate(chunk["recipients"])
+                        if str(first + offset) not in outcomes]
+        return sorted(pending)
+
+    async def run(self, job_id: str) -> dict:
+        """
+        Enviar a los destinatarios pendientes de un trabajo
+
+        Returns:
+            dict: Progreso del trabajo al terminar (o "skipped" si otro worker lo tiene)
+        """
+        job_ref = self.db.collection(BULK_JOBS_COLLECTION).document(job_id)
+        job = await asyncio.to_thread(self._claim, job_ref)
+        if job is None:
+            return {"id": job_id, "status": "skipped"}
+
+        pending = await asyncio.to_thread(self._pending, job)
+        logger.info(f"Envío masivo {job_id}: {len(pending)} de {job['total']} pendientes")
+
+        bucket = TokenBucket(self.rate, self.burst)
+        slots = asyncio.Semaphore(self.concurrency)
+        unsaved = {}
+        last_checkpoint = time.monotonic()
+
+        async def checkpoint(final_status: str = None):
+            # Lo que llegue mientras se escribe queda para el siguiente checkpoint
+            nonlocal last_checkpoint
+            saving = dict(unsaved)
+            unsaved.clear()
+            last_checkpoint = time.monotonic()
+            saved = asyncio.ensure_future(asyncio.to_thread(self._save, job_ref, job, saving, final_status))
+            try:
+                try:
+                    await asyncio.shield(saved)
+                except asyncio.CancelledError:
+                    # El hilo sigue escribiendo: esperar a que termine para no pisar el checkpoint final
+                    await saved
+                    raise
+            except Exception:
+                # La escritura falló: se reintenta con el siguiente checkpoint
+                for index, outcome in saving.items():
+                    unsaved.setdefault(index, outcome)
+                raise
+
+        async def deliver(index: int, phone: str):
+            async with slots:
+                await bucket.acquire()
+                try:
+                    delivered = await self.send(phone, job["message"], f"bulk_{job['notification_type']}")
+                except Exception as e:
+                    logger.error(f"Envío masivo {job_id}: error con el destinatario {index}: {e}")
+                    delivered = False
+            unsaved[str(index)] = "sent" if delivered else "failed"
+            if len(unsaved) >= self.checkpoint_every or time.monotonic() - last_checkpoint >= self.checkpoint_seconds:
+                await checkpoint()
+
+        deliveries = [asyncio.ensure_future(deliver(index, phone)) for index, phone in pending]
+        try:
+            await asyncio.gather(*deliveries)
+        except BaseException:
+            # Cancelación o error inesperado. gather no cancela los demás envíos, así
+            # que se cancelan y se espera a que terminen antes de soltar el lease:
+            # el checkpoint guarda todo lo enviado y nadie reanuda envíos en curso
+            for delivery in deliveries:
+                delivery.cancel()
+            await asyncio.gather(*deliveries, return_exceptions=True)
+            await checkpoint(STATUS_INTERRUPTED)
+            raise
+
+        await checkpoint(STATUS_COMPLETED)
+        progress = job_progress((await asyncio.to_thread(job_ref.get)).to_dict())
+        logger.info(f"Envío masivo {job_id} terminado: {progress['sent']} enviados, {progress['failed']} fallidos")
+        return progress
+
+    async def resume_stale(self) -> list:
+        """Reanudar los trabajos interrumpidos o con el lease vencido"""
+        resumed = []
+        for status in (STATUS_INTERRUPTED, STATUS_RUNNING):
+            for job_doc in self.db.collection(BULK_JOBS_COLLECTION).where("status", "==", status).stream():
+                job = job_doc.to_dict()
+                if self.resumable(job):
+                    resumed.append(await self.run(job["id"]))
+        return resumed
+
+
+def _resumable(job: dict, now: datetime) -> bool:
+    if job["status"] in (STATUS_PENDING, STATUS_INTERRUPTED):
+        return True
+    lease_expires_at = as_naive_utc(job.get("lease_expires_at"))
+    return job["status"] == STATUS_RUNNING and (lease_expires_at is None or lease_expires_at <= now)
+
+
+@firestore.transactional
+def _claim_job(transaction, job_ref, now: datetime, lease: dict):
+    """Tomar el trabajo si sigue libre; None si no existe o lo tiene otro worker"""
+    job_doc = job_ref.get(transaction=transaction)
+    if not job_doc.exists or not _resumable(job_doc.to_dict(), now):
+        return None
+    transaction.update(job_ref, lease)
+    return {**job_doc.to_dict(), **lease}
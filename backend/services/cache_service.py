@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from decouple import config
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# TTL (segundos) por ruta pública cacheada
+ROUTE_TTLS = {
+    "gallery_public": config('CACHE_TTL_GALLERY_PUBLIC', default=300, cast=int),
+    "events_list": config('CACHE_TTL_EVENTS', default=60, cast=int),
+    "reviews_featured": config('CACHE_TTL_REVIEWS_FEATURED', default=300, cast=int),
+    "dashboard": config('CACHE_TTL_DASHBOARD', default=30, cast=int),
+}
+
+CACHE_MAX_ENTRIES = config('CACHE_MAX_ENTRIES', default=256, cast=int)
+
+
+class RouteCache:
+    """
+    Caché en memoria con TTL por ruta, tamaño acotado y desalojo LRU
+
+    Las entradas se identifican por (ruta, clave). Las rutas de escritura
+    invalidan explícitamente las rutas cuyos datos modifican.
+    """
+
+    def __init__(self, ttls: dict, max_entries: int = 256, clock=time.monotonic):
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        self._evictions = 0
+
+    def get(self, route: str, key=None):
+        """
+        Obtener un valor cacheado
+
+        Returns:
+            El valor guardado, o None si no existe o expiró
+        """
+        cache_key = (route, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(cache_key)
+                    self._hits[route] = self._hits.get(route, 0) + 1
+                    return value
+                del self._entries[cache_key]
+
+            self._misses[route] = self._misses.get(route, 0) + 1
+            return None
+
+    def set(self, route: str, value, key=None, ttl: int = None):
+        """Guardar un valor con el TTL de la ruta (o uno explícito)"""
+        if value is None:
+            return
+
+        ttl = ttl if ttl is not None else self.ttls.get(route, 60)
+        cache_key = (route, key)
+        with self._lock:
+            self._entries[cache_key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, *routes: str) -> int:
+        """Eliminar todas las entradas de las rutas indicadas"""
+        with self._lock:
+            stale = [cache_key for cache_key in self._entries if cache_key[0] in routes]
+            for cache_key in stale:
+                del self._entries[cache_key]
+
+        if stale:
+            logger.info(f"Caché invalidada para {', '.join(routes)}: {len(stale)} entradas")
+        return len(stale)
+
+    def clear(self):
+        """Vaciar la caché y reiniciar contadores"""
+        with self._lock:
+            self._entries.clear()
+            self._hits.clear()
+            self._misses.clear()
+            self._evictions = 0
+
+    def stats(self) -> dict:
+        """Contadores de aciertos y fallos por ruta"""
+        with self._lock:
+            routes = sorted(set(self.ttls) | set(self._hits) | set(self._misses))
+            per_route = {
+                route: {
+                    "hits": self._hits.get(route, 0),
+                    "misses": self._misses.get(route, 0),
+                    "ttl_seconds": self.ttls.get(route, 60)
+                }
+                for route in routes
+            }
+            total_hits = sum(self._hits.values())
+            total_misses = sum(self._misses.values())
+            lookups = total_hits + total_misses
+
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": total_hits,
+                "misses": total_misses,
+                "hit_rate": round(total_hits / lookups * 100, 2) if lookups else 0.0,
+                "evictions": self._evictions,
+                "routes": per_route
+            }
+
+
+# Instancia compartida para las rutas de lectura cacheadas (públicas y dashboard)
+public_cache = RouteCache(ROUTE_TTLS, max_entries=CACHE_MAX_ENTRIES)
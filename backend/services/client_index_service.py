@@ -0,0 +1,252 @@
+from datetime import datetime
+from firebase_admin import firestore
+import logging
+
+from services.batch_read_service import get_documents
+from services.common import BATCH_LIMIT, event_day, status_name, event_income
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLIENTS_COLLECTION = "clients"
+
+
+def normalize_email(email) -> str:
+    """Email en minúsculas y sin espacios; None si no hay email"""
+    if not email or not isinstance(email, str) or not email.strip():
+        return None
+    return email.strip().lower()
+
+
+def record_booking(db, batch, booking_id: str, booking: dict):
+    """
+    Registrar un booking nuevo en el índice de clientes dentro del mismo batch
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch (o Transaction) donde se escribe el booking
+        booking_id: ID del booking
+        booking: Datos del booking
+    """
+    email = normalize_email(booking.get('client_email'))
+    if email is None:
+        return
+
+    client_data = {
+        "email": email,
+        "client_name": booking.get('client_name'),
+        "booking_count": firestore.Increment(1),
+        "status_counts": {status_name(booking.get('status')): firestore.Increment(1)},
+        "last_booking_at": booking.get('created_at') or datetime.now(),
+        "updated_at": datetime.now()
+    }
+    day = event_day(booking.get('event_date'))
+    if day is not None:
+        # event_days guarda el día de cada booking para recalcular el rango si cambia una fecha
+        client_data["event_days"] = {booking_id: day}
+        client_data["first_event_day"] = firestore.Minimum(day)
+        client_data["last_event_day"] = firestore.Maximum(day)
+
+    batch.set(db.collection(CLIENTS_COLLECTION).document(email), client_data, merge=True)
+
+
+def record_status_change(db, batch, booking: dict, old_status, new_status):
+    """Mover un booking de un estado a otro en los contadores del cliente"""
+    email = normalize_email(booking.get('client_email'))
+    old_status, new_status = status_name(old_status), status_name(new_status)
+    if email is None or old_status == new_status:
+        return
+
+    batch.set(db.collection(CLIENTS_COLLECTION).document(email), {
+        "status_counts": {
+            old_status: firestore.Increment(-1),
+            new_status: firestore.Increment(1)
+        },
+        "updated_at": datetime.now()
+    }, merge=True)
+
+
+def record_event_date_change(db, transaction, booking_id: str, booking: dict, previous: dict):
+    """
+    Recalcular first/last_event_day del cliente cuando cambia la fecha de un booking existente
+
+    Minimum/Maximum solo amplían el rango, así que al mover la fecha se lee el
+    mapa event_days del cliente y se escriben los dos extremos de nuevo. Lee
+    dentro de la transacción, por lo que va antes de sus escrituras.
+
+    Args:
+        db: Cliente Firestore
+        transaction: Transaction donde se actualiza el booking
+        booking_id: ID del booking
+        booking: Datos del booking después de la actualización
+        previous: Datos antes de la actualización
+    """
+    email = normalize_email(booking.get('client_email'))
+    day = event_day(booking.get('event_date'))
+    if email is None or day == event_day(previous.get('event_date')):
+        return
+
+    client_ref = db.collection(CLIENTS_COLLECTION).document(email)
+    client_doc = client_ref.get(transaction=transaction)
+    days = dict((client_doc.to_dict() or {}).get("event_days") or {}) if client_doc.exists else {}
+    days.pop(booking_id, None)
+    if day is not None:
+        days[booking_id] = day
+
+    transaction.set(client_ref, {
+        "event_days": {booking_id: day if day is not None else firestore.DELETE_FIELD},
+        "first_event_day": min(days.values()) if days else firestore.DELETE_FIELD,
+        "last_event_day": max(days.values()) if days else firestore.DELETE_FIELD,
+        "updated_at": datetime.now()
+    }, merge=True)
+
+
+def record_event_income(db, batch, booking: dict, income: float, event_date=None):
+    """
+    Sumar el ingreso de un evento (o su variación) al ledger del cliente del booking
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch donde se escribe el evento
+        booking: Datos del booking del evento (None si el evento no tiene booking)
+        income: Ingreso nuevo menos el ingreso ya registrado para el evento
+        event_date: Fecha del evento, para la última visita del cliente
+    """
+    email = normalize_email((booking or {}).get('client_email'))
+    day = event_day(event_date)
+    if email is None or (not income and day is None):
+        return
+
+    client_data = {
+        "email": email,
+        # Increment(0) deja el campo creado para que el cliente entre en el ranking
+        "booking_count": firestore.Increment(0),
+        "total_spent": firestore.Increment(income),
+        "updated_at": datetime.now()
+    }
+    if day is not None:
+        client_data["last_visit_day"] = firestore.Maximum(day)
+
+    batch.set(db.collection(CLIENTS_COLLECTION).document(email), client_data, merge=True)
+
+
+def booking_for_event(db, booking_id) -> dict:
+    """Datos del booking de un evento, o None si no existe"""
+    if not booking_id:
+        return None
+    booking_doc = db.collection("bookings").document(booking_id).get()
+    return booking_doc.to_dict() if booking_doc.exists else None
+
+
+def top_clients(db, limit: int = 10) -> list:
+    """
+    Clientes con más bookings, desde el ledger ordenado por booking_count
+
+    Returns:
+        list: [{name, email, total_bookings, total_spent, last_visit}]
+    """
+    clients = db.collection(CLIENTS_COLLECTION).order_by(
+        "booking_count", direction=firestore.Query.DESCENDING
+    ).limit(limit).select(["email", "client_name", "booking_count", "total_spent", "last_visit_day"]).stream()
+
+    result = []
+    for client_doc in clients:
+        client = client_doc.to_dict()
+        last_visit = client.get("last_visit_day")
+        result.append({
+            "name": client.get("client_name"),
+            "email": client.get("email", client_doc.id),
+            "total_bookings": client.get("booking_count", 0),
+            "total_spent": client.get("total_spent", 0.0),
+            "last_visit": f"{last_visit // 10000:04d}-{last_visit // 100 % 100:02d}-{last_visit % 100:02d}" if last_visit else None
+        })
+    return result
+
+
+def first_event_days(db, emails) -> dict:
+    """
+    Primer día con evento de cada cliente, leído del índice por lotes
+
+    Returns:
+        dict: {email normalizado: YYYYMMDD} para los clientes indexados
+    """
+    normalized = {normalize_email(email) for email in emails} - {None}
+    client_docs = get_documents(db, CLIENTS_COLLECTION, normalized, field_paths=["first_event_day"])
+    return {
+        email: client_doc.to_dict().get("first_event_day")
+        for email, client_doc in client_docs.items()
+        if client_doc.to_dict().get("first_event_day") is not None
+    }
+
+
+def rebuild_client_index(db) -> int:
+    """
+    Reconstruir el índice de clientes desde todos los bookings y eventos (backfill)
+
+    Returns:
+        int: Número de clientes indexados
+    """
+    clients = {}
+    booking_emails = {}
+    for booking_doc in db.collection("bookings").stream():
+        booking = booking_doc.to_dict()
+        email = normalize_email(booking.get('client_email'))
+        if email is None:
+            continue
+
+        client = clients.setdefault(email, {
+            "email": email,
+            "client_name": booking.get('client_name'),
+            "booking_count": 0,
+            "total_spent": 0.0,
+            "status_counts": {},
+            "last_booking_at": None
+        })
+        client["booking_count"] += 1
+        status = status_name(booking.get('status'))
+        client["status_counts"][status] = client["status_counts"].get(status, 0) + 1
+
+        created_at = booking.get('created_at')
+        if created_at is not None and (client["last_booking_at"] is None or created_at > client["last_booking_at"]):
+            client["last_booking_at"] = created_at
+            client["client_name"] = booking.get('client_name') or client["client_name"]
+
+        day = event_day(booking.get('event_date'))
+        if day is not None:
+            client.setdefault("event_days", {})[booking_doc.id] = day
+            client["first_event_day"] = min(client.get("first_event_day", day), day)
+            client["last_event_day"] = max(client.get("last_event_day", day), day)
+        booking_emails[booking_doc.id] = email
+
+    # Ledger: ingresos y última visita desde los eventos de cada booking
+    for event_doc in db.collection("events").select(
+        ["booking_id", "financials", "final_price", "start_time", "event_date"]
+    ).stream():
+        event = event_doc.to_dict()
+        email = booking_emails.get(event.get('booking_id'))
+        if email is None:
+            continue
+        client = clients[email]
+        client["total_spent"] += event_income(event)
+        day = event_day(event.get('start_time') or event.get('event_date'))
+        if day is not None:
+            client["last_visit_day"] = max(client.get("last_visit_day", day), day)
+
+    clients_ref = db.collection(CLIENTS_COLLECTION)
+    stale = [client_doc.id for client_doc in clients_ref.stream() if client_doc.id not in clients]
+
+    now = datetime.now()
+    writes = [(clients_ref.document(email), dict(client, updated_at=now)) for email, client in clients.items()]
+    writes += [(clients_ref.document(email), None) for email in stale]
+
+    for start in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        for client_ref, client in writes[start:start + BATCH_LIMIT]:
+            if client is None:
+                batch.delete(client_ref)
+            else:
+                batch.set(client_ref, client)
+        batch.commit()
+
+    logger.info(f"Índice de clientes reconstruido: {len(clients)} clientes, {len(stale)} eliminados")
+    return len(clients)
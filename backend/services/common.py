@@ -0,0 +1,75 @@
+from datetime import date, datetime, timezone
+import asyncio
+import time
+
+# Máximo de escrituras por WriteBatch de Firestore
+BATCH_LIMIT = 500
+
+
+def utc_now() -> datetime:
+    """Hora actual en UTC (naive)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def as_naive_utc(value: datetime) -> datetime:
+    """Firestore devuelve timestamps con zona horaria; el resto del código usa datetime naive"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def event_day(value) -> int:
+    """
+    Fecha del evento como entero YYYYMMDD
+
+    Firestore solo aplica Minimum/Maximum sobre números, así que las fechas de
+    los índices se guardan así para poder actualizarlas sin leer el documento.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value[:10], '%Y-%m-%d')
+        except ValueError:
+            return None
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    return None
+
+
+def status_name(value) -> str:
+    """Nombre del estado de un booking (acepta el enum BookingStatus)"""
+    return getattr(value, 'value', value) or 'unknown'
+
+
+def event_income(event: dict) -> float:
+    """Ingreso de un evento: financials.income o, en los eventos del panel, final_price"""
+    financials = event.get('financials') or {}
+    return float(financials.get('income', event.get('final_price')) or 0.0)
+
+
+class TokenBucket:
+    """
+    Limitador de ritmo: `rate` permisos por segundo con ráfagas de hasta `capacity`
+
+    Los que esperan se atienden en orden; el cerrojo se mantiene mientras se
+    espera el siguiente permiso.
+    """
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await self.sleep((1 - self._tokens) / self.rate)
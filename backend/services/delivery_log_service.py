@@ -0,0 +1,225 @@
+from decouple import config
+from firebase_admin import firestore
+import asyncio
+import atexit
+import logging
+import os
+import signal
+import threading
+import time
+import uuid
+
+from services.common import BATCH_LIMIT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Registros acumulados que disparan un flush y segundos máximos que espera un registro
+DELIVERY_LOG_MAX_RECORDS = config('DELIVERY_LOG_MAX_RECORDS', default=100, cast=int)
+DELIVERY_LOG_FLUSH_SECONDS = config('DELIVERY_LOG_FLUSH_SECONDS', default=2.0, cast=float)
+
+# Commits fallidos tras los que se descarta un registro (queda en el log de errores)
+# y máximo de registros en memoria mientras Firestore no responde
+DELIVERY_LOG_MAX_ATTEMPTS = config('DELIVERY_LOG_MAX_ATTEMPTS', default=5, cast=int)
+DELIVERY_LOG_MAX_BUFFERED = config('DELIVERY_LOG_MAX_BUFFERED', default=10000, cast=int)
+
+
+class DeliveryLogBuffer:
+    """
+    Buffer en proceso para los registros de envío (notifications, emails)
+
+    log() solo agrega el registro a memoria, así que un envío no espera la
+    escritura en Firestore. Un hilo de fondo escribe los registros con
+    WriteBatch (hasta BATCH_LIMIT por commit) cuando hay DELIVERY_LOG_MAX_RECORDS
+    acumulados o el más antiguo lleva DELIVERY_LOG_FLUSH_SECONDS esperando, y
+    close() (registrado con atexit) escribe lo que quede al terminar el proceso.
+
+    En Cloud Functions la CPU se limita apenas termina la invocación y la
+    instancia se detiene con SIGTERM, así que el hilo y atexit no bastan: cada
+    unidad de trabajo (request HTTP, checkpoint de envío masivo, ejecución de
+    los schedulers) llama a flush() antes de terminar, y
+    install_sigterm_handler() hace que SIGTERM cierre el buffer.
+
+    Cada registro recibe su ID al agregarse: si un commit falla, sus registros
+    vuelven al buffer y se reintentan en el siguiente flush sin duplicarse. Los
+    que fallan más de una vez se escriben de a uno, así un registro que nunca
+    se puede escribir no frena a los demás, y se descartan (con su contenido
+    en el log de errores) tras DELIVERY_LOG_MAX_ATTEMPTS intentos. Si el buffer
+    pasa de DELIVERY_LOG_MAX_BUFFERED registros se descartan los más antiguos.
+    """
+
+    def __init__(self, get_db=None, max_records: int = None, flush_seconds: float = None,
+                 max_attempts: int = None, max_buffered: int = None, clock=time.monotonic):
+        self.get_db = get_db or firestore.client
+        self.max_records = max_records or DELIVERY_LOG_MAX_RECORDS
+        self.flush_seconds = flush_seconds if flush_seconds is not None else DELIVERY_LOG_FLUSH_SECONDS
+        self.max_attempts = max_attempts or DELIVERY_LOG_MAX_ATTEMPTS
+        self.max_buffered = max_buffered or DELIVERY_LOG_MAX_BUFFERED
+        self.clock = clock
+        # (colección, ID, datos, commits fallidos)
+        self._records = []
+        self._dropped = 0
+        self._oldest_at = None
+        self._retry_at = 0.0
+        self._closed = False
+        self._thread = None
+        self._wake = threading.Condition(threading.Lock())
+        self._flush_lock = threading.Lock()
+
+    def log(self, collection: str, data: dict, document_id: str = None) -> str:
+        """
+        Agregar un registro para escribir en collection/{document_id}
+
+        Returns:
+            str: ID del documento (uno nuevo si no se indica)
+        """
+        document_id = document_id or uuid.uuid4().hex
+        with self._wake:
+            self._records.append((collection, document_id, data, 0))
+            self._trim()
+            if self._oldest_at is None:
+                self._oldest_at = self.clock()
+            closed = self._closed
+            if not closed:
+                self._start()
+                if len(self._records) >= self.max_records:
+                    self._wake.notify()
+        if closed:
+            # Después de close() no hay hilo de fondo: escribir en el momento
+            self.flush()
+        return document_id
+
+    def pending(self) -> int:
+        with self._wake:
+            return len(self._records)
+
+    def dropped(self) -> int:
+        """Registros descartados por fallar demasiadas veces o por exceder el tamaño del buffer"""
+        with self._wake:
+            return self._dropped
+
+    def flush(self) -> int:
+        """
+        Escribir los registros acumulados
+
+        Returns:
+            int: Registros escritos; los de un commit fallido quedan en el buffer
+        """
+        with self._flush_lock:
+            with self._wake:
+                records, self._records = self._records, []
+                self._oldest_at = None
+            if not records:
+                return 0
+
+            written = 0
+            chunk = []
+            try:
+                db = self.get_db()
+                while written < len(records):
+                    chunk = _next_chunk(records[written:])
+                    batch = db.batch()
+                    for collection, document_id, data, _ in chunk:
+                        batch.set(db.collection(collection).document(document_id), data)
+                    batch.commit()
+                    written += len(chunk)
+            except Exception as e:
+                failed = [(collection, document_id, data, attempts + 1) for collection, document_id, data, attempts in chunk]
+                for collection, document_id, data, attempts in failed:
+                    if attempts >= self.max_attempts:
+                        logger.error(f"Registro de envío descartado tras {attempts} intentos: {collection}/{document_id} {data}")
+                unwritten = [record for record in failed if record[3] < self.max_attempts] + records[written + len(chunk):]
+                with self._wake:
+                    self._dropped += len(records) - written - len(unwritten)
+                    self._records[:0] = unwritten
+                    self._trim()
+                    self._oldest_at = self.clock() if self._records else None
+                    self._retry_at = self.clock() + self.flush_seconds
+                logger.error(f"Error escribiendo registros de envío ({len(unwritten)} quedan en el buffer): {e}")
+            return written
+
+    def _trim(self):
+        """Descartar los registros más antiguos que excedan max_buffered (con el cerrojo tomado)"""
+        excess = len(self._records) - self.max_buffered
+        if excess > 0:
+            for collection, document_id, data, _ in self._records[:excess]:
+                logger.error(f"Registro de envío descartado, buffer lleno: {collection}/{document_id} {data}")
+            del self._records[:excess]
+            self._dropped += excess
+
+    def _due(self) -> bool:
+        if not self._records or self.clock() < self._retry_at:
+            return False
+        return len(self._records) >= self.max_records or self.clock() - self._oldest_at >= self.flush_seconds
+
+    def _wait_seconds(self) -> float:
+        if not self._records:
+            return None
+        wait_until = max(self._oldest_at + self.flush_seconds, self._retry_at)
+        return max(wait_until - self.clock(), 0.0)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._closed and not self._due():
+                    self._wake.wait(timeout=self._wait_seconds())
+                if self._closed:
+                    return
+            self.flush()
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="delivery-log", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def install_sigterm_handler(self) -> bool:
+        """
+        Cerrar el buffer al recibir SIGTERM, antes del handler que ya hubiera
+
+        Returns:
+            bool: False si no se pudo instalar (solo se puede desde el hilo principal)
+        """
+        try:
+            previous = signal.getsignal(signal.SIGTERM)
+
+            def on_sigterm(signum, frame):
+                self.close()
+                if callable(previous):
+                    previous(signum, frame)
+                elif previous != signal.SIG_IGN:
+                    # Handler por defecto: terminar el proceso como lo habría hecho SIGTERM
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    os.kill(os.getpid(), signal.SIGTERM)
+
+            signal.signal(signal.SIGTERM, on_sigterm)
+            return True
+        except ValueError:
+            return False
+
+    def close(self, timeout: float = 10.0) -> int:
+        """Detener el hilo de fondo y escribir lo que quede en el buffer"""
+        with self._wake:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            self._wake.notify()
+        if thread is not None:
+            thread.join(timeout=timeout)
+        return self.flush()
+
+
+def _next_chunk(records: list) -> list:
+    """Registros del siguiente commit: un lote de hasta BATCH_LIMIT, o uno solo si ya falló más de una vez"""
+    if records[0][3] >= 2:
+        return records[:1]
+    size = min(len(records), BATCH_LIMIT)
+    return records[:next((i for i, record in enumerate(records[:size]) if record[3] >= 2), size)]
+
+
+delivery_log = DeliveryLogBuffer()
+
+
+async def flush_after_request():
+    """Dependencia de FastAPI (scope="function"): escribir los registros del request antes de responder"""
+    yield
+    await asyncio.to_thread(delivery_log.flush)
@@ -6,6 +6,7 @@ from pathlib import Path
 import logging
 from datetime import datetime
 from typing import Optional
+from services.delivery_log_service import delivery_log
 
 # Buscar archivo .env en el directorio actual
 env_path = Path(__file__).parent.parent / '.env'
@@ -515,7 +516,7 @@ async def send_confirmation_email(booking_data: dict) -> bool:
         # Enviar email
         await fastmail.send_message(message)
 
-        # Guardar registro en base de datos
+        # Guardar registro (se escribe por lotes desde el buffer de registros)
         email_data = {
             "recipient_email": booking_data['client_email'],
             "subject": message.subject,
@@ -525,8 +526,7 @@ async def send_confirmation_email(booking_data: dict) -> bool:
             "status": "sent"
         }
 
-        db = get_firestore_client()
-        db.collection("emails").add(email_data)
+        delivery_log.log("emails", email_data)
 
         logger.info(f"Email de confirmación enviado exitosamente a {booking_data['client_email']}")
         return True
@@ -545,11 +545,7 @@ async def send_confirmation_email(booking_data: dict) -> bool:
             "error": str(e)
         }
 
-        try:
-            db = get_firestore_client()
-            db.collection("emails").add(error_email)
-        except:
-            pass
+        delivery_log.log("emails", error_email)
 
         return False
 
@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+from decouple import config
+import csv
+import io
+import logging
+import os
+import tempfile
+
+from services.rollup_service import event_figures
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Documentos por página de Firestore y filas por bloque de CSV
+EXPORT_PAGE_SIZE = config('EXPORT_PAGE_SIZE', default=500, cast=int)
+EXPORT_CSV_CHUNK_ROWS = config('EXPORT_CSV_CHUNK_ROWS', default=1000, cast=int)
+
+# Bytes por bloque al devolver el XLSX ya escrito
+EXPORT_FILE_CHUNK_BYTES = 64 * 1024
+
+EXPORT_COLUMNS = {
+    "bookings": [
+        "id", "client_name", "client_email", "client_phone", "service_type", "participants",
+        "event_date", "event_time", "location", "status", "estimated_price", "confirmed_price", "created_at"
+    ],
+    "events": [
+        "id", "booking_id", "title", "event_date", "participants", "income", "expenses", "profit",
+        "status", "created_at"
+    ]
+}
+
+# Campos de fecha por colección: los documentos del router guardan datetime y
+# los del panel guardan la fecha como texto YYYY-MM-DD, así que se recorren ambos
+EXPORT_DATE_FIELDS = {
+    "bookings": [("event_date", datetime), ("event_date", str)],
+    "events": [("start_time", datetime), ("event_date", str)]
+}
+
+
+def _range_bounds(kind, date_from, date_to) -> tuple:
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to, datetime.min.time()) + timedelta(days=1)
+    if kind is str:
+        return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+    return start, end
+
+
+def iter_documents(db, collection: str, date_from, date_to, page_size: int = None):
+    """
+    Recorrer los documentos de una colección en un rango de fechas, página a página
+
+    Cada página es una consulta ordenada con limit y start_after sobre el último
+    documento de la anterior, así que en memoria solo hay una página a la vez.
+
+    Args:
+        db: Cliente Firestore
+        collection: "bookings" o "events"
+        date_from: Primer día incluido (date)
+        date_to: Último día incluido (date)
+        page_size: Documentos por página
+
+    Yields:
+        DocumentSnapshot
+    """
+    page_size = page_size or EXPORT_PAGE_SIZE
+    for field, kind in EXPORT_DATE_FIELDS[collection]:
+        start, end = _range_bounds(kind, date_from, date_to)
+        last_doc = None
+        while True:
+            query = db.collection(collection).where(field, ">=", start).where(field, "<", end).order_by(field)
+            if last_doc is not None:
+                query = query.start_after(last_doc)
+            page = list(query.limit(page_size).stream())
+            yield from page
+            if len(page) < page_size:
+                break
+            last_doc = page[-1]
+
+
+def export_row(collection: str, doc) -> list:
+    """Fila de exportación de un booking o evento, en el orden de EXPORT_COLUMNS"""
+    data = doc.to_dict()
+    if collection == "events":
+        figures = event_figures(data)
+        data = {**data, **figures, "event_date": figures["date"]}
+    data["id"] = doc.id
+    return [_cell(data.get(column)) for column in EXPORT_COLUMNS[collection]]
+
+
+def _cell(value):
+    """Valor apto para CSV y XLSX: fechas sin zona horaria y estructuras como texto"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, (dict, list)):
+        return str(value)
+    return getattr(value, 'value', value)
+
+
+def csv_chunks(columns: list, rows, chunk_rows: int = None):
+    """
+    CSV en bloques de bytes de chunk_rows filas
+
+    Yields:
+        bytes: Cabecera (con BOM para Excel) y luego cada bloque de filas
+    """
+    chunk_rows = chunk_rows or EXPORT_CSV_CHUNK_ROWS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if pending:
+        yield buffer.getvalue().encode('utf-8')
+
+
+def xlsx_chunks(columns: list, rows, sheet_title: str = "Export"):
+    """
+    XLSX escrito con openpyxl en modo write-only y devuelto en bloques de bytes
+
+    En modo write-only cada fila se serializa a un archivo temporal al
+    agregarla, y el libro se arma en disco, así que la memoria no crece con
+    el número de filas.
+
+    Yields:
+        bytes: El archivo XLSX en bloques de EXPORT_FILE_CHUNK_BYTES
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as xlsx_file:
+            while True:
+                chunk = xlsx_file.read(EXPORT_FILE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_chunks(db, collection: str, date_from, date_to, format: str = "csv"):
+    """
+    Exportación por filas de bookings o eventos en un rango de fechas
+
+    Returns:
+        generator: Bloques de bytes del CSV o XLSX
+    """
+    logger.info(f"Exportando {collection} del {date_from} al {date_to} en {format}")
+    columns = EXPORT_COLUMNS[collection]
+    rows = (export_row(collection, doc) for doc in iter_documents(db, collection, date_from, date_to))
+    if format == "xlsx":
+        return xlsx_chunks(columns, rows, sheet_title=f"{collection} {date_from}"[:31])
+    return csv_chunks(columns, rows)
@@ -0,0 +1,205 @@
+from datetime import datetime
+from decouple import config
+from firebase_admin import firestore
+import json
+import logging
+import zlib
+
+from services.batch_read_service import get_documents
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PUBLIC_GALLERY_COLLECTION = "public_gallery"
+
+# Número mínimo de documentos en que se reparte la galería pública
+PUBLIC_GALLERY_SHARDS = config('PUBLIC_GALLERY_SHARDS', default=1, cast=int)
+
+# Bytes de eventos por shard al reconstruir. Deja margen bajo el límite de
+# 1 MiB por documento para lo que crezca con las actualizaciones incrementales
+PUBLIC_GALLERY_SHARD_BYTES = config('PUBLIC_GALLERY_SHARD_BYTES', default=256 * 1024, cast=int)
+
+
+def build_gallery_event(event_id: str, event: dict, images: list) -> dict:
+    """
+    Entrada de la galería pública para un evento completado con fotos publicadas
+
+    Args:
+        event_id: ID del evento
+        event: Datos del evento
+        images: URLs de las fotos publicadas del evento
+
+    Returns:
+        dict: Evento con el formato que consume la página de galería
+    """
+    # Determine title based on available fields
+    event_title = event.get('title', 'Evento Pablo\'s Pizza')
+    if not event_title or event_title == 'Evento Pablo\'s Pizza':
+        # Try to construct from other fields
+        service_type = 'Taller' if 'workshop' in event.get('category', '').lower() or 'taller' in event.get('title', '').lower() else 'Fiesta'
+        event_title = f"{service_type} Pablo's Pizza"
+
+    return {
+        'id': event_id,
+        'title': event_title,
+        'description': event.get('description', 'Una experiencia inolvidable con Pablo\'s Pizza'),
+        'category': event.get('category', 'party'),
+        'images': images,
+        'participants': event.get('participants', 15),
+        'date': event.get('event_date'),
+        'featured': len(images) >= 3,  # Featured if has 3+ images
+        'highlight': event.get('highlight', f"Evento para {event.get('participants', 15)} personas"),
+        'age_group': event.get('age_group', 'Todas las edades')
+    }
+
+
+def shard_id(index: int) -> str:
+    return f"shard-{index:02d}"
+
+
+def shard_for(event_id: str, shards: int) -> str:
+    """Documento de la galería que guarda un evento (estable entre procesos)"""
+    return shard_id(zlib.crc32(event_id.encode('utf-8')) % shards)
+
+
+def _payload_bytes(entry: dict) -> int:
+    return len(json.dumps(entry, default=str, ensure_ascii=False).encode('utf-8'))
+
+
+class PublicGallerySnapshot:
+    """
+    Galería pública materializada en public_gallery/shard-NN
+
+    Cada shard guarda {"events": {event_id: entrada}}, y shard-00 además el
+    número de shards vigente ("shards"). rebuild() regenera todo desde las
+    colecciones gallery y events, con tantos shards como hagan falta para que
+    cada uno quede cerca de PUBLIC_GALLERY_SHARD_BYTES (al menos `shards`), y
+    borra los shards que sobren. La página pública se sirve leyendo la colección
+    en una sola consulta; cada escritura de fotos o eventos recalcula solo la
+    entrada de su evento dentro de una transacción.
+    """
+
+    def __init__(self, db, shards: int = None):
+        self.db = db
+        self.shards = max(1, shards or PUBLIC_GALLERY_SHARDS)
+
+    def read(self):
+        """
+        Leer la galería materializada
+
+        Returns:
+            list: Eventos ordenados por fecha (más recientes primero), o None si
+            la galería aún no se ha construido
+        """
+        snapshots = {snapshot.id: snapshot.to_dict() for snapshot in self.db.collection(PUBLIC_GALLERY_COLLECTION).stream()}
+        head = snapshots.get(shard_id(0))
+        if head is None:
+            return None
+
+        events = []
+        for index in range(head.get("shards", 1)):
+            events.extend(((snapshots.get(shard_id(index)) or {}).get('events') or {}).values())
+        return sort_gallery_events(events)
+
+    def refresh_event(self, event_id: str):
+        """
+        Recalcular la entrada de un evento tras subir/publicar/despublicar una foto
+        o publicar/completar el evento
+
+        Returns:
+            dict: Nueva entrada, o None si el evento ya no debe aparecer
+        """
+        entry = _refresh_entry(self.db.transaction(), self.db, event_id)
+
+        logger.info(f"Galería pública: evento {event_id} {'actualizado' if entry else 'retirado'}")
+        return entry
+
+    def rebuild(self) -> list:
+        """
+        Regenerar la galería completa desde cero
+
+        Returns:
+            list: Eventos de la galería ya ordenados
+        """
+        events_dict = {}
+        for img_doc in self.db.collection("gallery").where("is_published", "==", True).stream():
+            img_data = img_doc.to_dict()
+            event_id = img_data.get('event_id')
+            if not event_id or not img_data.get('url'):
+                continue
+            events_dict.setdefault(event_id, []).append(img_data.get('url'))
+
+        event_docs = get_documents(self.db, "events", events_dict.keys())
+        gallery_events = []
+        for event_id, images in events_dict.items():
+            event_doc = event_docs.get(event_id)
+            if event_doc is None or event_doc.to_dict().get("status") != "completed":
+                continue
+            gallery_events.append(build_gallery_event(event_id, event_doc.to_dict(), images))
+
+        payload = sum(_payload_bytes(entry) for entry in gallery_events)
+        shard_count = max(self.shards, -(-payload // PUBLIC_GALLERY_SHARD_BYTES))
+        shards = {shard_id(index): {} for index in range(shard_count)}
+        for entry in gallery_events:
+            shards[shard_for(entry['id'], shard_count)][entry['id']] = entry
+
+        collection = self.db.collection(PUBLIC_GALLERY_COLLECTION)
+        orphans = [doc.id for doc in collection.select([]).stream() if doc.id not in shards]
+        now = datetime.now()
+        batch = self.db.batch()
+        for name, events in shards.items():
+            data = {"events": events, "updated_at": now}
+            if name == shard_id(0):
+                data["shards"] = shard_count
+            batch.set(collection.document(name), data)
+        for name in orphans:
+            batch.delete(collection.document(name))
+        batch.commit()
+
+        logger.info(
+            f"Galería pública reconstruida: {len(gallery_events)} eventos ({payload} bytes) en {shard_count} shards"
+            + (f", {len(orphans)} shards sobrantes eliminados" if orphans else "")
+        )
+        return sort_gallery_events(gallery_events)
+
+
+def sort_gallery_events(events: list) -> list:
+    """Más recientes primero; el ID desempata para que el orden sea estable"""
+    return sorted(events, key=lambda event: (str(event.get('date') or ''), event.get('id', '')), reverse=True)
+
+
+@firestore.transactional
+def _refresh_entry(transaction, db, event_id: str):
+    """Leer fotos, evento y shards dentro de la transacción para que reintente ante cambios concurrentes"""
+    collection = db.collection(PUBLIC_GALLERY_COLLECTION)
+    head = collection.document(shard_id(0)).get(transaction=transaction)
+    if not head.exists:
+        # La galería aún no se ha construido; la primera lectura la reconstruye completa
+        return None
+
+    shard_ref = collection.document(shard_for(event_id, head.to_dict().get("shards", 1)))
+    snapshot = head if shard_ref.id == head.id else shard_ref.get(transaction=transaction)
+
+    gallery_query = db.collection("gallery").where("event_id", "==", event_id).where("is_published", "==", True)
+    images = [
+        image_doc.to_dict().get('url')
+        for image_doc in gallery_query.stream(transaction=transaction)
+        if image_doc.to_dict().get('url')
+    ]
+
+    entry = None
+    if images:
+        event_doc = db.collection("events").document(event_id).get(transaction=transaction)
+        if event_doc.exists and event_doc.to_dict().get("status") == "completed":
+            entry = build_gallery_event(event_id, event_doc.to_dict(), images)
+
+    events = dict(snapshot.to_dict().get('events') or {})
+    if entry is None and event_id not in events:
+        return None
+    if entry is None:
+        events.pop(event_id)
+    else:
+        events[event_id] = entry
+
+    transaction.update(shard_ref, {"events": events, "updated_at": datetime.now()})
+    return entry
@@ -1,16 +1,20 @@
-from twilio.rest import Client
 from firebase_admin import firestore
 from decouple import config
 import logging
 from datetime import datetime
 from models.schemas import NotificationCreate
+from services.twilio_transport import TwilioSender
+from services.delivery_log_service import delivery_log
+from services.reminder_service import event_start
+from utils.phone import whatsapp_address
 
 # Configuración de Twilio para WhatsApp
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
 TWILIO_WHATSAPP_NUMBER = config('TWILIO_WHATSAPP_NUMBER', default='whatsapp:+14155238886')
 
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID else None
+# Transporte HTTP asíncrono con conexiones keep-alive (no bloquea el event loop)
+sender = TwilioSender(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_NUMBER) if TWILIO_ACCOUNT_SID else None
 
 def get_firestore_client():
     """Get Firestore client instance"""
@@ -31,27 +35,24 @@ async def send_whatsapp_notification(phone: str, message: str, notification_type
     Returns:
         bool: True si se envió exitosamente, False en caso contrario
     """
-    if not client:
+    if not sender:
         logger.error("Cliente de Twilio no configurado")
         return False
     
     try:
-        # Asegurar formato correcto del número
-        if not phone.startswith('whatsapp:'):
-            if not phone.startswith('+'):
-                phone = '+' + phone
-            phone = f'whatsapp:{phone}'
+        # Asegurar formato correcto del número (whatsapp:+E.164)
+        address = whatsapp_address(phone)
+        if address is None:
+            logger.error(f"Número de teléfono inválido: {phone}")
+            return False
+        phone = address
         
         # Enviar mensaje
-        message_instance = client.messages.create(
-            body=message,
-            from_=TWILIO_WHATSAPP_NUMBER,
-            to=phone
-        )
+        message_instance = await sender.send(phone, message)
         
-        # Guardar registro en base de datos
+        # Guardar registro (se escribe por lotes desde el buffer de registros)
         notification_data = {
-            "id": message_instance.sid,
+            "id": message_instance["sid"],
             "recipient_phone": phone,
             "message": message,
             "notification_type": notification_type,
@@ -59,8 +60,7 @@ async def send_whatsapp_notification(phone: str, message: str, notification_type
             "status": "sent"
         }
         
-        db = get_firestore_client()
-        db.collection("notifications").document(message_instance.sid).set(notification_data)
+        delivery_log.log("notifications", notification_data, message_instance["sid"])
         
         logger.info(f"WhatsApp enviado exitosamente a {phone}")
         return True
@@ -79,17 +79,19 @@ async def send_whatsapp_notification(phone: str, message: str, notification_type
             "error": str(e)
         }
         
-        try:
-            db = get_firestore_client()
-            db.collection("notifications").add(error_notification)
-        except:
-            pass
+        delivery_log.log("notifications", error_notification)
             
         return False
 
+async def close_whatsapp_transport():
+    """Cerrar la sesión de Twilio del event loop en curso, al final de un asyncio.run"""
+    if sender:
+        await sender.close_transport()
+
+
 async def send_booking_reminder(booking_id: str) -> bool:
     """
-    Enviar recordatorio de evento (24 horas antes)
+    Enviar recordatorio de evento (24 horas antes); lo llama el ReminderScheduler
     """
     try:
         db = get_firestore_client()
@@ -98,6 +100,8 @@ async def send_booking_reminder(booking_id: str) -> bool:
             return False
         
         booking_data = booking_doc.to_dict()
+        # Fecha y hora confirmadas si las hay (event_date puede venir como texto)
+        start = event_start(booking_data)
         
         message = f"""
 ⏰ RECORDATORIO - Pablo's Pizza
@@ -106,10 +110,10 @@ Hola {booking_data['client_name']},
 
 Te recordamos tu evento programado para MAÑANA:
 
-📅 Fecha: {booking_data['event_date'].strftime('%d/%m/%Y')}
-⏰ Hora: {booking_data['event_time']}
+📅 Fecha: {start.strftime('%d/%m/%Y')}
+⏰ Hora: {start.strftime('%H:%M')}
 👥 Participantes: {booking_data['participants']}
-📍 Ubicación: {booking_data['location']}
+📍 Ubicación: {booking_data.get('location', 'Por confirmar')}
 
 ¡Estamos emocionados por hacer de tu evento algo especial! 🍕✨
 
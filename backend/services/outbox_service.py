@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+from firebase_admin import firestore
+import logging
+import uuid
+
+from services.common import as_naive_utc, utc_now
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "notification_outbox"
+
+# Estados de un trabajo de notificación
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+def enqueue_notification(db, batch, channel: str, payload: dict, booking_id: str = None) -> dict:
+    """
+    Agregar un trabajo de notificación al mismo batch que la escritura principal
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch donde se registra el trabajo (se confirma junto al booking)
+        channel: Canal de envío (admin_email, whatsapp)
+        payload: Datos que necesita el handler del canal
+        booking_id: Agendamiento que originó la notificación
+
+    Returns:
+        dict: Documento del trabajo encolado
+    """
+    job_id = str(uuid.uuid4())
+    now = utc_now()
+    job = {
+        "id": job_id,
+        "channel": channel,
+        "payload": payload,
+        "booking_id": booking_id,
+        "status": STATUS_PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+        "updated_at": now
+    }
+    batch.set(db.collection(OUTBOX_COLLECTION).document(job_id), job)
+    return job
+
+
+class OutboxWorker:
+    """
+    Procesa los trabajos pendientes del outbox con reintentos
+
+    Un trabajo se toma en una transacción que adelanta su next_attempt_at por
+    lease_seconds, de modo que otra ejecución del worker (o el trigger de
+    creación) no lo vuelva a tomar mientras se envía. Si el envío falla se
+    reprograma con backoff exponencial hasta max_attempts.
+    """
+
+    def __init__(self, db, handlers: dict, max_attempts: int = 5,
+                 base_backoff_seconds: int = 30, lease_seconds: int = 300, clock=utc_now):
+        self.db = db
+        self.handlers = handlers
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+
+    def drain(self, limit: int = 50) -> dict:
+        """
+        Procesar hasta `limit` trabajos vencidos
+
+        Returns:
+            dict: Contadores de enviados, reintentos y fallidos definitivos
+        """
+        now = self.clock()
+        due_jobs = self.db.collection(OUTBOX_COLLECTION).where(
+            "status", "==", STATUS_PENDING
+        ).where(
+            "next_attempt_at", "<=", now
+        ).limit(limit).stream()
+
+        stats = {"processed": 0, "sent": 0, "retried": 0, "failed": 0}
+        for job_id in [job_doc.id for job_doc in due_jobs]:
+            result = self.process_job(job_id)
+            if result not in stats:
+                continue
+            stats["processed"] += 1
+            stats[result] += 1
+
+        if stats["processed"]:
+            logger.info(f"Outbox procesado: {stats}")
+        return stats
+
+    def process_job(self, job_id: str) -> str:
+        """Procesar un trabajo puntual (p. ej. desde un trigger de creación)"""
+        job_ref = self.db.collection(OUTBOX_COLLECTION).document(job_id)
+        now = self.clock()
+        claimed, job = _claim_job(
+            self.db.transaction(), job_ref, now, now + timedelta(seconds=self.lease_seconds)
+        )
+        if not claimed:
+            return job
+        return self._process(job_ref, job)
+
+    def _process(self, job_ref, job: dict) -> str:
+        attempts = job.get("attempts", 0) + 1
+        error = None
+        try:
+            handler = self.handlers[job["channel"]]
+            delivered = handler(job.get("payload", {}))
+            if not delivered:
+                error = "Handler reported failure"
+        except Exception as e:
+            error = str(e)
+
+        now = self.clock()
+        if error is None:
+            job_ref.update({
+                "status": STATUS_SENT,
+                "attempts": attempts,
+                "sent_at": now,
+                "updated_at": now
+            })
+            return "sent"
+
+        if attempts >= self.max_attempts:
+            logger.error(f"Notificación {job['id']} descartada tras {attempts} intentos: {error}")
+            job_ref.update({
+                "status": STATUS_FAILED,
+                "attempts": attempts,
+                "last_error": error,
+                "updated_at": now
+            })
+            return "failed"
+
+        backoff = self.base_backoff_seconds * (2 ** (attempts - 1))
+        logger.warning(f"Notificación {job['id']} falló (intento {attempts}), reintento en {backoff}s: {error}")
+        job_ref.update({
+            "attempts": attempts,
+            "last_error": error,
+            "next_attempt_at": now + timedelta(seconds=backoff),
+            "updated_at": now
+        })
+        return "retried"
+
+
+@firestore.transactional
+def _claim_job(transaction, job_ref, now: datetime, lease_until: datetime):
+    """
+    Lease: tomar el trabajo si sigue pendiente y vencido
+
+    Returns:
+        tuple: (True, trabajo) si se tomó, (False, "missing"/"skipped") si no
+    """
+    job_doc = job_ref.get(transaction=transaction)
+    if not job_doc.exists:
+        return False, "missing"
+    job = job_doc.to_dict()
+    if job.get("status") != STATUS_PENDING or as_naive_utc(job.get("next_attempt_at")) > now:
+        return False, "skipped"
+
+    transaction.update(job_ref, {"next_attempt_at": lease_until, "updated_at": now})
+    return True, job
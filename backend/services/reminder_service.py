@@ -0,0 +1,327 @@
+from datetime import date, datetime, time as day_time, timedelta
+from decouple import config
+from firebase_admin import firestore
+import asyncio
+import logging
+import zlib
+
+from services.common import BATCH_LIMIT, TokenBucket, as_naive_utc, status_name
+from services.delivery_log_service import delivery_log
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REMINDER_QUEUE_COLLECTION = "reminder_queue"
+
+# El recordatorio sale REMINDER_LEAD_HOURS antes del evento, adelantado hasta
+# REMINDER_SPREAD_MINUTES según el booking para que los eventos a la misma hora
+# no disparen todos sus recordatorios juntos
+REMINDER_LEAD_HOURS = config('REMINDER_LEAD_HOURS', default=24, cast=int)
+REMINDER_SPREAD_MINUTES = config('REMINDER_SPREAD_MINUTES', default=30, cast=int)
+
+# Hora del evento si el booking no la tiene
+REMINDER_DEFAULT_EVENT_TIME = config('REMINDER_DEFAULT_EVENT_TIME', default='12:00')
+
+# Recordatorios por ejecución, segundos entre envíos, lease del worker y reintentos
+REMINDER_BATCH_SIZE = config('REMINDER_BATCH_SIZE', default=25, cast=int)
+REMINDER_SEND_INTERVAL_SECONDS = config('REMINDER_SEND_INTERVAL_SECONDS', default=2.0, cast=float)
+REMINDER_LEASE_SECONDS = config('REMINDER_LEASE_SECONDS', default=300, cast=int)
+REMINDER_MAX_ATTEMPTS = config('REMINDER_MAX_ATTEMPTS', default=3, cast=int)
+REMINDER_RETRY_MINUTES = config('REMINDER_RETRY_MINUTES', default=15, cast=int)
+
+# Estados de una entrada de la cola
+STATUS_SCHEDULED = "scheduled"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+def _parse_time(value):
+    try:
+        return datetime.strptime(str(value).strip()[:5], '%H:%M').time()
+    except ValueError:
+        return None
+
+
+def event_start(booking: dict):
+    """
+    Inicio del evento de un booking (fecha y hora confirmadas si las hay)
+
+    Returns:
+        datetime: Inicio del evento, o None si el booking no tiene fecha
+    """
+    value = booking.get('confirmed_date') or booking.get('event_date')
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                value = datetime.strptime(value[:10], '%Y-%m-%d')
+            except ValueError:
+                return None
+    if isinstance(value, datetime):
+        value = as_naive_utc(value)
+    elif isinstance(value, date):
+        value = datetime.combine(value, day_time())
+    else:
+        return None
+
+    event_time = _parse_time(booking.get('confirmed_time') or booking.get('event_time') or '')
+    if event_time is None and value.time() == day_time():
+        event_time = _parse_time(REMINDER_DEFAULT_EVENT_TIME)
+    if event_time is not None:
+        value = datetime.combine(value.date(), event_time)
+    return value
+
+
+def reminder_due_at(booking_id: str, start: datetime) -> datetime:
+    """
+    Momento del recordatorio: REMINDER_LEAD_HOURS antes del evento, adelantado
+    un desfase fijo por booking dentro de REMINDER_SPREAD_MINUTES
+    """
+    spread_seconds = REMINDER_SPREAD_MINUTES * 60
+    offset = zlib.crc32(booking_id.encode()) % spread_seconds if spread_seconds else 0
+    return start - timedelta(hours=REMINDER_LEAD_HOURS, seconds=offset)
+
+
+def _reminder_for(booking_id: str, booking: dict):
+    """(inicio del evento, vencimiento) si el booking confirmado necesita recordatorio, si no None"""
+    if booking is None or status_name(booking.get('status')) != 'confirmed':
+        return None
+    start = event_start(booking)
+    if start is None:
+        return None
+    return start, reminder_due_at(booking_id, start)
+
+
+def record_booking_reminder(db, batch, booking_id: str, booking: dict, previous: dict = None, now: datetime = None):
+    """
+    Encolar, mover o quitar el recordatorio de un booking en el mismo batch que lo escribe
+
+    Confirmar un booking encola su recordatorio; cambiar la fecha u hora lo
+    mueve (y, si ya se envió, programa uno nuevo para la nueva fecha); dejar
+    de estar confirmado lo quita de la cola.
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch (o Transaction) donde se escribe el booking
+        booking_id: ID del booking
+        booking: Datos del booking después de la escritura
+        previous: Datos antes de la escritura (None si el booking es nuevo)
+    """
+    reminder = _reminder_for(booking_id, booking)
+    if reminder == _reminder_for(booking_id, previous):
+        return
+
+    queue = FirestoreReminderQueue(db)
+    now = now or datetime.now()
+    if reminder is None or reminder[0] <= now:
+        queue.cancel(booking_id, batch=batch)
+    else:
+        start, due_at = reminder
+        # Confirmado con menos de un día de anticipación: sale en la próxima ejecución
+        queue.schedule(booking_id, max(due_at, now), event_start=start, batch=batch)
+
+
+class FirestoreReminderQueue:
+    """
+    Cola de prioridad de recordatorios persistida en reminder_queue/{booking_id}
+
+    La prioridad es due_at: claim_due() toma las entradas vencidas en orden de
+    vencimiento y las marca "sending" con un lease dentro de una transacción,
+    así dos workers nunca toman la misma entrada. Una entrada cuyo worker dejó
+    vencer el lease vuelve a tomarse.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.collection(REMINDER_QUEUE_COLLECTION)
+
+    def schedule(self, booking_id: str, due_at: datetime, event_start: datetime = None, batch=None):
+        """Encolar (o mover) el recordatorio de un booking"""
+        entry = {
+            "booking_id": booking_id,
+            "due_at": due_at,
+            "event_start": event_start,
+            "status": STATUS_SCHEDULED,
+            "attempts": 0,
+            "lease_expires_at": None,
+            "updated_at": datetime.now()
+        }
+        entry_ref = self.collection.document(booking_id)
+        if batch is None:
+            entry_ref.set(entry)
+        else:
+            batch.set(entry_ref, entry)
+
+    def cancel(self, booking_id: str, batch=None):
+        """Quitar el recordatorio de un booking de la cola"""
+        entry_ref = self.collection.document(booking_id)
+        if batch is None:
+            entry_ref.delete()
+        else:
+            batch.delete(entry_ref)
+
+    def get(self, booking_id: str):
+        entry_doc = self.collection.document(booking_id).get()
+        return entry_doc.to_dict() if entry_doc.exists else None
+
+    def claim_due(self, now: datetime, limit: int, lease_seconds: int) -> list:
+        """
+        Tomar hasta `limit` entradas vencidas, las más antiguas primero
+
+        Returns:
+            list: Entradas tomadas (con su due_at, para completarlas)
+        """
+        candidates = [
+            entry_doc.id for entry_doc in self.collection.where(
+                "status", "==", STATUS_SCHEDULED
+            ).where("due_at", "<=", now).order_by("due_at").limit(limit).stream()
+        ]
+        if len(candidates) < limit:
+            candidates += [
+                entry_doc.id for entry_doc in self.collection.where(
+                    "status", "==", STATUS_SENDING
+                ).where("lease_expires_at", "<=", now).limit(limit - len(candidates)).stream()
+            ]
+
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+        claimed = []
+        for booking_id in candidates:
+            entry = _claim(self.db.transaction(), self.collection.document(booking_id), now, lease_expires_at)
+            if entry is not None:
+                claimed.append(entry)
+        claimed.sort(key=lambda entry: entry["due_at"])
+        return claimed
+
+    def complete(self, entry: dict, update: dict) -> bool:
+        """
+        Guardar el resultado de una entrada tomada
+
+        Si mientras se enviaba el booking se movió o se canceló, la entrada ya
+        no es la tomada y no se toca.
+        """
+        return _complete(self.db.transaction(), self.collection.document(entry["booking_id"]), entry["due_at"], update)
+
+
+@firestore.transactional
+def _claim(transaction, entry_ref, now: datetime, lease_expires_at: datetime):
+    entry_doc = entry_ref.get(transaction=transaction)
+    if not entry_doc.exists:
+        return None
+    entry = entry_doc.to_dict()
+    due_at = as_naive_utc(entry["due_at"])
+    lease = as_naive_utc(entry.get("lease_expires_at"))
+    if not ((entry["status"] == STATUS_SCHEDULED and due_at <= now) or
+            (entry["status"] == STATUS_SENDING and lease is not None and lease <= now)):
+        return None
+
+    transaction.update(entry_ref, {"status": STATUS_SENDING, "lease_expires_at": lease_expires_at, "updated_at": now})
+    return {**entry, "due_at": due_at, "status": STATUS_SENDING}
+
+
+@firestore.transactional
+def _complete(transaction, entry_ref, claimed_due_at: datetime, update: dict) -> bool:
+    entry_doc = entry_ref.get(transaction=transaction)
+    if not entry_doc.exists:
+        return False
+    entry = entry_doc.to_dict()
+    if entry["status"] != STATUS_SENDING or as_naive_utc(entry["due_at"]) != claimed_due_at:
+        return False
+    transaction.update(entry_ref, update)
+    return True
+
+
+class ReminderScheduler:
+    """
+    Envía los recordatorios vencidos de la cola, de a uno y espaciados
+
+    Cada ejecución (programada cada pocos minutos) toma hasta
+    REMINDER_BATCH_SIZE entradas y las envía a razón de una cada
+    REMINDER_SEND_INTERVAL_SECONDS segundos. Una entrada enviada queda "sent"
+    y no vuelve a salir; un envío fallido se reintenta REMINDER_RETRY_MINUTES
+    después, hasta REMINDER_MAX_ATTEMPTS intentos.
+    """
+
+    def __init__(self, queue, send, batch_size: int = None, send_interval: float = None,
+                 lease_seconds: int = None, clock=datetime.now, sleep=asyncio.sleep):
+        self.queue = queue
+        self.send = send
+        self.batch_size = batch_size or REMINDER_BATCH_SIZE
+        self.send_interval = send_interval if send_interval is not None else REMINDER_SEND_INTERVAL_SECONDS
+        self.lease_seconds = lease_seconds or REMINDER_LEASE_SECONDS
+        self.clock = clock
+        self.sleep = sleep
+
+    def _result(self, entry: dict, delivered: bool) -> dict:
+        now = self.clock()
+        if delivered:
+            return {"status": STATUS_SENT, "sent_at": now, "lease_expires_at": None, "updated_at": now}
+        attempts = entry.get("attempts", 0) + 1
+        if attempts >= REMINDER_MAX_ATTEMPTS:
+            return {"status": STATUS_FAILED, "attempts": attempts, "lease_expires_at": None, "updated_at": now}
+        return {
+            "status": STATUS_SCHEDULED,
+            "attempts": attempts,
+            "due_at": now + timedelta(minutes=REMINDER_RETRY_MINUTES),
+            "lease_expires_at": None,
+            "updated_at": now
+        }
+
+    async def run_due(self) -> dict:
+        """
+        Enviar los recordatorios vencidos
+
+        Returns:
+            dict: {"sent": n, "failed": n}
+        """
+        entries = self.queue.claim_due(self.clock(), self.batch_size, self.lease_seconds)
+        stats = {"sent": 0, "failed": 0}
+        # Un permiso por envío, sin ráfaga: los recordatorios salen espaciados
+        bucket = TokenBucket(1 / self.send_interval if self.send_interval else float('inf'), 1, sleep=self.sleep)
+        for entry in entries:
+            await bucket.acquire()
+            try:
+                delivered = await self.send(entry["booking_id"])
+            except Exception as e:
+                logger.error(f"Error enviando recordatorio del booking {entry['booking_id']}: {e}")
+                delivered = False
+            self.queue.complete(entry, self._result(entry, delivered))
+            stats["sent" if delivered else "failed"] += 1
+
+        # Los registros de envío se escriben antes de que termine la invocación
+        await asyncio.to_thread(delivery_log.flush)
+        if entries:
+            logger.info(f"Recordatorios: {stats['sent']} enviados, {stats['failed']} fallidos")
+        return stats
+
+
+def backfill_reminder_queue(db, now: datetime = None) -> int:
+    """
+    Encolar los recordatorios de los bookings confirmados con evento futuro
+    que aún no están en la cola (bookings confirmados antes de existir la cola)
+
+    Returns:
+        int: Recordatorios encolados
+    """
+    now = now or datetime.now()
+    queued = {entry_doc.id for entry_doc in db.collection(REMINDER_QUEUE_COLLECTION).select(["status"]).stream()}
+    queue = FirestoreReminderQueue(db)
+
+    batch, pending, scheduled = db.batch(), 0, 0
+    for booking_doc in db.collection("bookings").where("status", "==", "confirmed").stream():
+        reminder = _reminder_for(booking_doc.id, booking_doc.to_dict())
+        if booking_doc.id in queued or reminder is None or reminder[0] <= now:
+            continue
+        start, due_at = reminder
+        queue.schedule(booking_doc.id, max(due_at, now), event_start=start, batch=batch)
+        pending += 1
+        scheduled += 1
+        if pending == BATCH_LIMIT:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+
+    logger.info(f"Cola de recordatorios: {scheduled} recordatorios encolados")
+    return scheduled
@@ -0,0 +1,96 @@
+from datetime import datetime
+from decouple import config
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_COLLECTION = "report_cache"
+
+# TTL (segundos) del reporte del mes en curso; los meses cerrados no expiran
+REPORT_CACHE_CURRENT_TTL = config('REPORT_CACHE_CURRENT_TTL', default=60, cast=int)
+
+
+def report_cache_id(year: int, month: int) -> str:
+    """ID del reporte cacheado de un mes"""
+    return f"report-{year}{month:02d}"
+
+
+def month_is_closed(year: int, month: int, now: datetime = None) -> bool:
+    """True si el mes ya terminó"""
+    now = now or datetime.now()
+    return (year, month) < (now.year, now.month)
+
+
+def cache_entry(year: int, month: int, report: dict, rollup_updated_at, now: datetime = None) -> dict:
+    """
+    Documento de caché de un reporte mensual
+
+    Args:
+        year: Año del reporte
+        month: Mes del reporte
+        report: Campos de MonthlyReport (sin year ni month)
+        rollup_updated_at: updated_at del rollup mensual leído para calcularlo (None si no había rollup)
+        now: Momento del cálculo
+
+    Returns:
+        dict: Documento a guardar en report_cache
+    """
+    closed = month_is_closed(year, month, now)
+    return {
+        "year": year,
+        "month": month,
+        "report": report,
+        "rollup_updated_at": rollup_updated_at,
+        "closed": closed,
+        # Época Unix para no comparar fechas con y sin zona horaria
+        "expires_at": None if closed else time.time() + REPORT_CACHE_CURRENT_TTL,
+        "computed_at": datetime.now()
+    }
+
+
+def cached_report(entry: dict, rollup: dict):
+    """
+    Reporte guardado si sigue vigente
+
+    Una entrada vale mientras no expire (solo el mes en curso tiene TTL) y el
+    rollup mensual no haya cambiado desde que se calculó: toda escritura que
+    toca el mes actualiza el updated_at de su rollup.
+
+    Returns:
+        dict: Campos de MonthlyReport, o None si no hay entrada vigente
+    """
+    if entry is None:
+        return None
+    expires_at = entry.get("expires_at")
+    if expires_at is not None and expires_at <= time.time():
+        return None
+    if entry.get("rollup_updated_at") != (rollup or {}).get("updated_at"):
+        return None
+    return entry.get("report")
+
+
+def invalidate_reports_from(db, batch, day: int, now: datetime = None):
+    """
+    Borrar los reportes cacheados desde el mes de `day` (YYYYMMDD) hasta el mes en curso
+
+    Un booking con fecha en un mes cerrado puede cambiar el primer evento de su
+    cliente y con eso la retención de los meses siguientes, que no tocan su
+    rollup. Las escrituras con fecha en el mes en curso o futuro no borran nada.
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch o Transaction de la escritura
+        day: Día YYYYMMDD del booking
+        now: Momento actual
+    """
+    now = now or datetime.now()
+    year, month = day // 10000, day // 100 % 100
+    if not month_is_closed(year, month, now):
+        return
+
+    cache_ref = db.collection(REPORT_CACHE_COLLECTION)
+    while (year, month) <= (now.year, now.month):
+        batch.delete(cache_ref.document(report_cache_id(year, month)))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
@@ -0,0 +1,262 @@
+from datetime import datetime
+from firebase_admin import firestore
+import logging
+
+from services.common import BATCH_LIMIT, event_day, event_income, status_name
+from services.report_cache_service import (
+    REPORT_CACHE_COLLECTION, report_cache_id, cache_entry, cached_report, invalidate_reports_from
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROLLUPS_COLLECTION = "rollups"
+
+# Estados cuyo precio cuenta como ingreso comprometido
+BOOKED_STATUSES = ("confirmed", "completed")
+
+
+def day_rollup_id(day: int) -> str:
+    """ID del rollup diario de un día YYYYMMDD"""
+    return f"day-{day}"
+
+
+def month_rollup_id(year: int, month: int) -> str:
+    """ID del rollup mensual"""
+    return f"month-{year}{month:02d}"
+
+
+def event_figures(event: dict) -> dict:
+    """
+    Fecha y cifras de un evento en un formato común
+
+    Acepta los eventos del router (financials, start_time, actual_participants)
+    y los del panel (final_price, event_cost, event_date, participants).
+    """
+    financials = event.get('financials') or {}
+    income = event_income(event)
+    expenses = float(financials.get('total_expenses', event.get('event_cost')) or 0.0)
+    return {
+        "date": event.get('start_time') or event.get('event_date'),
+        "income": income,
+        "expenses": expenses,
+        "profit": income - expenses,
+        "participants": event.get('actual_participants', event.get('participants')) or 0
+    }
+
+
+def event_contribution(event: dict, booking: dict) -> tuple:
+    """
+    Aporte de un evento a los rollups
+
+    Returns:
+        tuple: (día YYYYMMDD, aporte) o (None, None) si el evento no tiene fecha
+    """
+    figures = event_figures(event)
+    day = event_day(figures.pop("date"))
+    if day is None:
+        return None, None
+
+    contribution = {"event_count": 1, **figures}
+    if booking is not None:
+        contribution["service_counts"] = {booking.get('service_type') or 'unknown': 1}
+    return day, contribution
+
+
+def booking_contribution(booking: dict) -> tuple:
+    """
+    Aporte de un booking a los rollups, por fecha del evento agendado
+
+    Returns:
+        tuple: (día YYYYMMDD, aporte) o (None, None) si el booking no tiene fecha
+    """
+    day = event_day(booking.get('event_date'))
+    if day is None:
+        return None, None
+
+    booking_status = status_name(booking.get('status'))
+    booked_value = 0.0
+    if booking_status in BOOKED_STATUSES:
+        booked_value = float(booking.get('confirmed_price') or booking.get('estimated_price') or 0.0)
+    return day, {
+        "bookings": {
+            "count": 1,
+            "status_counts": {booking_status: 1},
+            "booked_value": booked_value
+        }
+    }
+
+
+def _accumulate(target: dict, contribution: dict, sign: int):
+    for key, value in contribution.items():
+        if isinstance(value, dict):
+            _accumulate(target.setdefault(key, {}), value, sign)
+        else:
+            target[key] = target.get(key, 0) + sign * value
+
+
+def _increments(delta: dict) -> dict:
+    """Deltas distintos de cero como transforms Increment (None si no hay cambios)"""
+    result = {}
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            nested = _increments(value)
+            if nested:
+                result[key] = nested
+        elif value:
+            result[key] = firestore.Increment(value)
+    return result or None
+
+
+def _rollup_targets(day: int) -> list:
+    """Rollups (id, campos de periodo) a los que aporta un día YYYYMMDD"""
+    year, month = day // 10000, day // 100 % 100
+    return [
+        (day_rollup_id(day), {"period": "day", "year": year, "month": month, "day": day}),
+        (month_rollup_id(year, month), {"period": "month", "year": year, "month": month})
+    ]
+
+
+def _write_deltas(db, batch, deltas: dict):
+    """Aplicar {día: delta} a los rollups diario y mensual de cada día"""
+    rollups = {}
+    for day, delta in deltas.items():
+        for rollup_id, meta in _rollup_targets(day):
+            rollup = rollups.setdefault(rollup_id, {"meta": meta, "delta": {}})
+            _accumulate(rollup["delta"], delta, 1)
+
+    collection = db.collection(ROLLUPS_COLLECTION)
+    for rollup_id, rollup in rollups.items():
+        increments = _increments(rollup["delta"])
+        if increments is None:
+            continue
+        batch.set(collection.document(rollup_id), {
+            **rollup["meta"],
+            **increments,
+            "updated_at": datetime.now()
+        }, merge=True)
+
+
+def _record_change(db, batch, before: tuple, after: tuple):
+    deltas = {}
+    for (day, contribution), sign in ((before, -1), (after, 1)):
+        if day is not None:
+            _accumulate(deltas.setdefault(day, {}), contribution, sign)
+    _write_deltas(db, batch, deltas)
+
+
+def record_event_rollup(db, batch, event: dict, booking: dict, previous: dict = None):
+    """
+    Registrar un evento nuevo (o el cambio respecto a `previous`) en los rollups
+
+    Args:
+        db: Cliente Firestore
+        batch: WriteBatch o Transaction donde se escribe el evento
+        event: Datos actuales del evento
+        booking: Booking del evento (para el tipo de servicio), o None
+        previous: Datos del evento antes del cambio, o None si es nuevo
+    """
+    before = event_contribution(previous, booking) if previous is not None else (None, None)
+    _record_change(db, batch, before, event_contribution(event, booking))
+
+
+def record_booking_rollup(db, batch, booking: dict, previous: dict = None):
+    """Registrar un booking nuevo (o el cambio respecto a `previous`) en los rollups"""
+    before = booking_contribution(previous) if previous is not None else (None, None)
+    after = booking_contribution(booking)
+    _record_change(db, batch, before, after)
+
+    days = [day for day, _ in (before, after) if day is not None]
+    if days:
+        invalidate_reports_from(db, batch, min(days))
+
+
+def get_month_reports(db, year: int, months=range(1, 13)) -> tuple:
+    """
+    Rollups mensuales de un año junto con sus reportes cacheados, en un solo get_all
+
+    Returns:
+        tuple: ({mes: campos de MonthlyReport vigentes en caché}, {mes: datos del rollup})
+    """
+    months = list(months)
+    rollup_refs = [db.collection(ROLLUPS_COLLECTION).document(month_rollup_id(year, month)) for month in months]
+    cache_refs = [db.collection(REPORT_CACHE_COLLECTION).document(report_cache_id(year, month)) for month in months]
+    # Los IDs de rollup (month-) y de caché (report-) no se repiten entre colecciones
+    snapshots = {snapshot.id: snapshot.to_dict() for snapshot in db.get_all(rollup_refs + cache_refs) if snapshot.exists}
+
+    rollups, reports = {}, {}
+    for month in months:
+        rollup = snapshots.get(month_rollup_id(year, month))
+        if rollup is not None:
+            rollups[month] = rollup
+        report = cached_report(snapshots.get(report_cache_id(year, month)), rollup)
+        if report is not None:
+            reports[month] = report
+    return reports, rollups
+
+
+def save_month_reports(db, year: int, reports: dict, rollups: dict):
+    """
+    Guardar reportes mensuales en caché junto al updated_at del rollup con que se calcularon
+
+    Args:
+        db: Cliente Firestore
+        year: Año de los reportes
+        reports: {mes: campos de MonthlyReport}
+        rollups: {mes: datos del rollup} devueltos por get_month_reports
+    """
+    try:
+        batch = db.batch()
+        cache_ref = db.collection(REPORT_CACHE_COLLECTION)
+        for month, report in reports.items():
+            rollup_updated_at = rollups.get(month, {}).get("updated_at")
+            batch.set(cache_ref.document(report_cache_id(year, month)),
+                      cache_entry(year, month, report, rollup_updated_at))
+        batch.commit()
+    except Exception as e:
+        # El caché es opcional: un fallo al guardarlo no debe romper el reporte
+        logger.warning(f"No se pudieron cachear los reportes de {year}: {e}")
+
+
+def rebuild_rollups(db) -> int:
+    """
+    Reconstruir todos los rollups desde los bookings y eventos (backfill)
+
+    Returns:
+        int: Número de documentos de rollup escritos
+    """
+    bookings = {booking_doc.id: booking_doc.to_dict() for booking_doc in db.collection("bookings").stream()}
+
+    deltas = {}
+    contributions = [booking_contribution(booking) for booking in bookings.values()]
+    contributions += [
+        event_contribution(event_doc.to_dict(), bookings.get(event_doc.to_dict().get('booking_id')))
+        for event_doc in db.collection("events").stream()
+    ]
+    for day, contribution in contributions:
+        if day is not None:
+            _accumulate(deltas.setdefault(day, {}), contribution, 1)
+
+    rollups = {}
+    for day, delta in deltas.items():
+        for rollup_id, meta in _rollup_targets(day):
+            _accumulate(rollups.setdefault(rollup_id, meta), delta, 1)
+
+    rollups_ref = db.collection(ROLLUPS_COLLECTION)
+    stale = [rollup_doc.id for rollup_doc in rollups_ref.stream() if rollup_doc.id not in rollups]
+
+    now = datetime.now()
+    writes = [(rollups_ref.document(rollup_id), dict(rollup, updated_at=now)) for rollup_id, rollup in rollups.items()]
+    writes += [(rollups_ref.document(rollup_id), None) for rollup_id in stale]
+
+    for start in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        for rollup_ref, rollup in writes[start:start + BATCH_LIMIT]:
+            if rollup is None:
+                batch.delete(rollup_ref)
+            else:
+                batch.set(rollup_ref, rollup)
+        batch.commit()
+
+    logger.info(f"Rollups reconstruidos: {len(rollups)} documentos, {len(stale)} eliminados")
+    return len(rollups)
@@ -0,0 +1,161 @@
+from collections import deque
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _PooledSession:
+    """Sesión SMTP ya autenticada junto con el instante de su último uso"""
+
+    def __init__(self, smtp, clock):
+        self.smtp = smtp
+        self.last_used = clock()
+
+
+class SMTPConnectionPool:
+    """
+    Pool de sesiones SMTP persistentes (STARTTLS + login una sola vez)
+
+    Cada sesión se reutiliza para muchos mensajes. Antes de reutilizar una sesión
+    ociosa se sondea con NOOP; si el servidor la cerró (o lleva más de
+    idle_timeout segundos sin uso) se descarta y se abre otra de forma
+    transparente. Si el envío falla por desconexión se reintenta una vez con una
+    sesión nueva.
+    """
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 use_starttls: bool = True, max_connections: int = 2, idle_timeout: int = 240,
+                 timeout: int = 30, ssl_context=None, smtp_factory=None, clock=time.monotonic):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_starttls = use_starttls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.smtp_factory = smtp_factory
+        self.clock = clock
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._stats = {"connections_opened": 0, "messages_sent": 0, "reconnects": 0}
+
+    def send_message(self, msg, from_addr: str = None, to_addrs=None) -> dict:
+        """
+        Enviar un mensaje por una sesión del pool
+
+        Args:
+            msg: email.message.Message ya construido
+            from_addr: Remitente del sobre (por defecto el header From)
+            to_addrs: Destinatarios del sobre (por defecto To/Cc/Bcc)
+
+        Returns:
+            dict: Destinatarios rechazados, igual que smtplib.SMTP.send_message
+        """
+        import smtplib
+
+        with self._slots:
+            session = self._acquire()
+            try:
+                refused = session.smtp.send_message(msg, from_addr, to_addrs)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # Rechazo del mensaje, no de la sesión: smtplib ya hizo RSET y la sesión sigue sirviendo
+                self._release(session)
+                raise
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # La sesión murió entre el NOOP y el envío: una nueva y un reintento
+                logger.warning(f"Sesión SMTP perdida durante el envío, reconectando: {e}")
+                self._discard(session)
+                self._count("reconnects")
+                session = self._connect()
+                try:
+                    refused = session.smtp.send_message(msg, from_addr, to_addrs)
+                except Exception:
+                    self._discard(session)
+                    raise
+            except Exception:
+                self._discard(session)
+                raise
+
+            self._count("messages_sent")
+            self._release(session)
+            return refused
+
+    def close(self):
+        """Cerrar todas las sesiones ociosas con QUIT"""
+        with self._lock:
+            sessions = list(self._idle)
+            self._idle.clear()
+        for session in sessions:
+            self._quit(session)
+
+    def stats(self) -> dict:
+        """Contadores de conexiones abiertas, mensajes enviados y reconexiones"""
+        with self._lock:
+            return dict(self._stats, idle_sessions=len(self._idle))
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _acquire(self) -> _PooledSession:
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._connect()
+            if self.clock() - session.last_used > self.idle_timeout:
+                self._quit(session)
+                continue
+            if self._is_alive(session):
+                return session
+            self._discard(session)
+            self._count("reconnects")
+
+    def _release(self, session: _PooledSession):
+        session.last_used = self.clock()
+        with self._lock:
+            self._idle.append(session)
+
+    def _connect(self) -> _PooledSession:
+        import smtplib
+
+        factory = self.smtp_factory or smtplib.SMTP
+        smtp = factory(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_starttls:
+                smtp.starttls(context=self.ssl_context)
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+
+        self._count("connections_opened")
+        logger.info(f"Sesión SMTP abierta con {self.host}:{self.port}")
+        return _PooledSession(smtp, self.clock)
+
+    @staticmethod
+    def _is_alive(session: _PooledSession) -> bool:
+        try:
+            return session.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(session: _PooledSession):
+        try:
+            session.smtp.quit()
+        except Exception:
+            session.smtp.close()
+
+    @staticmethod
+    def _discard(session: _PooledSession):
+        try:
+            session.smtp.close()
+        except Exception:
+            pass
@@ -0,0 +1,178 @@
+from decouple import config
+import asyncio
+import base64
+import json
+import threading
+import weakref
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TWILIO_API_BASE_URL = config('TWILIO_API_BASE_URL', default='https://api.twilio.com')
+
+# Conexiones simultáneas a Twilio, segundos que una conexión ociosa sigue abierta
+# y tiempos máximos (segundos) por solicitud completa y por conexión
+TWILIO_MAX_CONNECTIONS = config('TWILIO_MAX_CONNECTIONS', default=10, cast=int)
+TWILIO_KEEPALIVE_TIMEOUT = config('TWILIO_KEEPALIVE_TIMEOUT', default=60, cast=float)
+TWILIO_REQUEST_TIMEOUT = config('TWILIO_REQUEST_TIMEOUT', default=15, cast=float)
+TWILIO_CONNECT_TIMEOUT = config('TWILIO_CONNECT_TIMEOUT', default=5, cast=float)
+
+
+class TwilioAPIError(Exception):
+    """Respuesta de error de la API de Twilio"""
+
+    def __init__(self, status: int, message: str, code=None):
+        super().__init__(f"Twilio {status}: {message}")
+        self.status = status
+        self.code = code
+
+
+class AsyncTwilioTransport:
+    """
+    Cliente HTTP asíncrono para la API de mensajes de Twilio
+
+    Usa una sola aiohttp.ClientSession con un pool de conexiones keep-alive, así
+    que los envíos no pagan un handshake TCP/TLS cada vez y varios envíos
+    concurrentes avanzan a la vez sin bloquear el event loop. La sesión queda
+    atada al event loop donde se abrió.
+    """
+
+    def __init__(self, account_sid: str, auth_token: str, base_url: str = None,
+                 max_connections: int = None, keepalive_timeout: float = None,
+                 timeout: float = None, connect_timeout: float = None):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.base_url = (base_url or TWILIO_API_BASE_URL).rstrip('/')
+        self.max_connections = max_connections or TWILIO_MAX_CONNECTIONS
+        self.keepalive_timeout = keepalive_timeout or TWILIO_KEEPALIVE_TIMEOUT
+        self.timeout = timeout or TWILIO_REQUEST_TIMEOUT
+        self.connect_timeout = connect_timeout or TWILIO_CONNECT_TIMEOUT
+        self._session = None
+        self._stats = {"requests": 0, "connections_opened": 0}
+
+    def _open_session(self):
+        import aiohttp
+
+        async def on_connection_create_end(session, context, params):
+            self._stats["connections_opened"] += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        # Basic auth como cabecera precalculada de la sesión (BasicAuth y auth= están
+        # obsoletos en aiohttp). aiohttp la quita si una respuesta redirige a otro origen
+        credentials = base64.b64encode(f"{self.account_sid}:{self.auth_token}".encode('utf-8')).decode('ascii')
+        return aiohttp.ClientSession(
+            headers={"Authorization": f"Basic {credentials}"},
+            connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive_timeout),
+            timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+            trace_configs=[trace_config]
+        )
+
+    async def send_message(self, to: str, body: str, from_: str) -> dict:
+        """
+        Crear un mensaje (POST /2010-04-01/Accounts/{sid}/Messages.json)
+
+        Returns:
+            dict: Recurso del mensaje devuelto por Twilio (sid, status, ...)
+
+        Raises:
+            TwilioAPIError: Si Twilio responde con un error
+            asyncio.TimeoutError / aiohttp.ClientError: Si la solicitud no se completa
+        """
+        if self._session is None or self._session.closed:
+            self._session = self._open_session()
+
+        url = f"{self.base_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+        self._stats["requests"] += 1
+        async with self._session.post(url, data={"To": to, "From": from_, "Body": body}) as response:
+            if response.status >= 400:
+                # Los errores de Twilio son JSON, pero un proxy o balanceador puede responder texto o HTML
+                text = await response.text()
+                try:
+                    error = json.loads(text)
+                except ValueError:
+                    error = None
+                if not isinstance(error, dict):
+                    error = {"message": text.strip()[:200] or response.reason}
+                raise TwilioAPIError(response.status, error.get("message", "error"), error.get("code"))
+            return await response.json(content_type=None)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> dict:
+        return dict(self._stats)
+
+
+class TwilioSender:
+    """
+    Envío de WhatsApp por Twilio para código asíncrono y síncrono
+
+    send() se usa desde corrutinas (FastAPI) y reutiliza un transporte por event
+    loop. send_sync() se usa desde código síncrono (Flask, handlers del outbox):
+    envía el mensaje en un event loop propio que corre en un hilo de fondo, de
+    modo que también ahí las conexiones se reutilizan entre llamadas en lugar
+    de crear un loop nuevo con asyncio.run en cada envío.
+    """
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, transport_factory=None):
+        self.from_number = from_number
+        self.transport_factory = transport_factory or (lambda: AsyncTwilioTransport(account_sid, auth_token))
+        self._transports = weakref.WeakKeyDictionary()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def transport(self) -> AsyncTwilioTransport:
+        """Transporte del event loop en curso"""
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = self.transport_factory()
+        return transport
+
+    async def send(self, to: str, body: str) -> dict:
+        """Enviar un mensaje sin bloquear el event loop"""
+        return await self.transport().send_message(to, body, self.from_number)
+
+    async def close_transport(self):
+        """
+        Cerrar el transporte del event loop en curso
+
+        Los loops de asyncio.run (tareas programadas) terminan con la ejecución:
+        sin esto su sesión y sus sockets quedan abiertos.
+        """
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.close()
+
+    def _background_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="twilio-sender", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def send_sync(self, to: str, body: str, timeout: float = None) -> dict:
+        """
+        Enviar un mensaje desde código síncrono y esperar el resultado
+
+        Args:
+            timeout: Segundos de espera (por defecto el timeout de la solicitud más un margen)
+        """
+        future = asyncio.run_coroutine_threadsafe(self.send(to, body), self._background_loop())
+        return future.result(timeout=timeout or TWILIO_REQUEST_TIMEOUT + TWILIO_CONNECT_TIMEOUT)
+
+    def close(self):
+        """Cerrar los transportes del hilo de fondo y detener su event loop"""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        transport = self._transports.get(loop)
+        if transport is not None:
+            asyncio.run_coroutine_threadsafe(transport.close(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
@@ -1,15 +1,17 @@
-from twilio.rest import Client
 from decouple import config
 import logging
 from datetime import datetime
 from typing import Optional
+from services.twilio_transport import TwilioSender
+from utils.phone import whatsapp_address
 
 # Configuración de Twilio
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
 TWILIO_WHATSAPP_FROM = config('TWILIO_WHATSAPP_FROM', default='whatsapp:+14155238886')
 
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN else None
+sender = TwilioSender(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_FROM) \
+    if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN else None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,16 +19,15 @@ logger = logging.getLogger(__name__)
 def format_phone_number(phone: str) -> str:
     """
     Formatear número de teléfono para WhatsApp
-    Convierte +56912345678 a whatsapp:+56912345678
-    """
-    phone = phone.strip()
-    if not phone.startswith('+'):
-        if phone.startswith('9'):
-            phone = '+56' + phone
-        else:
-            phone = '+56' + phone
+    Convierte +56912345678 (o 912345678, 56 9 1234 5678) a whatsapp:+56912345678
 
-    return f"whatsapp:{phone}"
+    Raises:
+        ValueError: Si el número no se puede llevar a formato E.164
+    """
+    address = whatsapp_address(phone)
+    if address is None:
+        raise ValueError(f"Número de teléfono inválido: {phone}")
+    return address
 
 async def send_whatsapp_confirmation(booking_data: dict) -> bool:
     """
@@ -38,7 +39,7 @@ async def send_whatsapp_confirmation(booking_data: dict) -> bool:
     Returns:
         bool: True si se envió exitosamente, False en caso contrario
     """
-    if not client:
+    if not sender:
         logger.error("Servicio de WhatsApp no configurado")
         return False
 
@@ -73,14 +74,10 @@ async def send_whatsapp_confirmation(booking_data: dict) -> bool:
         to_whatsapp = format_phone_number(booking_data['client_phone'])
 
         # Enviar mensaje
-        message = client.messages.create(
-            body=message_content,
-            from_=TWILIO_WHATSAPP_FROM,
-            to=to_whatsapp
-        )
+        message = await sender.send(to_whatsapp, message_content)
 
         logger.info(f"WhatsApp de confirmación enviado exitosamente a {booking_data['client_phone']}")
-        logger.info(f"Message SID: {message.sid}")
+        logger.info(f"Message SID: {message['sid']}")
 
         return True
 
@@ -92,7 +89,7 @@ async def send_whatsapp_reminder(booking_data: dict) -> bool:
     """
     Enviar recordatorio por WhatsApp 24 horas antes del evento
     """
-    if not client:
+    if not sender:
         return False
 
     try:
@@ -122,11 +119,7 @@ async def send_whatsapp_reminder(booking_data: dict) -> bool:
 
         to_whatsapp = format_phone_number(booking_data['client_phone'])
 
-        message = client.messages.create(
-            body=message_content,
-            from_=TWILIO_WHATSAPP_FROM,
-            to=to_whatsapp
-        )
+        message = await sender.send(to_whatsapp, message_content)
 
         logger.info(f"WhatsApp recordatorio enviado a {booking_data['client_phone']}")
         return True
@@ -139,7 +132,7 @@ async def send_welcome_whatsapp(client_phone: str, client_name: str) -> bool:
     """
     Enviar WhatsApp de bienvenida a nuevos clientes
     """
-    if not client:
+    if not sender:
         return False
 
     try:
@@ -160,11 +153,7 @@ Gracias por confiar en nosotros para tu evento. Hemos recibido tu solicitud y pr
 
         to_whatsapp = format_phone_number(client_phone)
 
-        message = client.messages.create(
-            body=message_content,
-            from_=TWILIO_WHATSAPP_FROM,
-            to=to_whatsapp
-        )
+        message = await sender.send(to_whatsapp, message_content)
 
         logger.info(f"WhatsApp de bienvenida enviado a {client_phone}")
         return True
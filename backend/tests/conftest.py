@@ -44,6 +44,12 @@ def mock_firestore():
         'chat_messages': mock_chat_messages
     }
 
+@pytest.fixture
+def in_memory_db():
+    """In-memory Firestore stand-in (mock-firestore based) for write-path tests"""
+    from tests.in_memory_firestore import InMemoryFirestore
+    return InMemoryFirestore()
+
 @pytest.fixture
 def sample_booking_data():
     """Sample booking data for testing"""
@@ -167,6 +173,14 @@ def flask_app():
 
         return app
 
+@pytest.fixture(autouse=True)
+def clear_public_cache():
+    """Start every test with an empty public read cache"""
+    from services.cache_service import public_cache
+    public_cache.clear()
+    yield
+    public_cache.clear()
+
 @pytest.fixture
 def client(flask_app):
     """Create test client"""
@@ -0,0 +1,264 @@
+"""
+In-memory Firestore stand-in for tests
+Builds on mock-firestore and adds the pieces of the client API the backend uses
+that mock-firestore lacks (write batches, select() projections, count()
+aggregations, merge writes with Increment/Minimum/Maximum transforms,
+transactions that abort when a document they read changed before commit), plus
+a count of read round trips with optional simulated latency for benchmarks
+"""
+from mockfirestore import MockFirestore
+from mockfirestore._helpers import get_by_path, set_by_path
+from mockfirestore.collection import CollectionReference
+from mockfirestore.document import DocumentReference, DocumentSnapshot
+from mockfirestore.query import Query
+from mockfirestore.transaction import Transaction
+from google.api_core.exceptions import Aborted
+from google.cloud.firestore_v1.aggregation import AggregationResult
+from copy import deepcopy
+import threading
+import time
+
+
+class InMemoryWriteBatch(Transaction):
+    """WriteBatch: buffered set/update/delete applied on commit()"""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._begin()
+
+
+class InMemoryTransaction(Transaction):
+    """
+    Transaction with optimistic concurrency: commit() raises Aborted when a
+    document read through the transaction was written since, so
+    @firestore.transactional retries the function like the real client does
+    """
+
+    def __init__(self, client, **kwargs):
+        super().__init__(client, **kwargs)
+        self._read_versions = {}
+
+    def _clean_up(self):
+        super()._clean_up()
+        self._read_versions = {}
+
+    def record_read(self, path):
+        self._read_versions.setdefault(path, self._client.version(path))
+
+    def _commit(self):
+        with self._client.commit_lock:
+            for path, version in self._read_versions.items():
+                if self._client.version(path) != version:
+                    raise Aborted(f"Document {'/'.join(path)} changed during the transaction")
+            return super()._commit()
+
+
+class InMemoryAggregationQuery:
+    """count() aggregation: one round trip, no documents returned"""
+
+    def __init__(self, query, alias=None):
+        self._query = query
+        self._alias = alias or "count"
+
+    def get(self, transaction=None):
+        count = sum(1 for _ in self._query.stream())
+        return [[AggregationResult(self._alias, count)]]
+
+
+class InMemoryQuery(Query):
+    """Query with select() and count(): snapshots only carry the projected fields"""
+
+    def select(self, field_paths) -> 'InMemoryQuery':
+        self.projection = list(field_paths)
+        return self
+
+    def count(self, alias=None) -> InMemoryAggregationQuery:
+        return InMemoryAggregationQuery(self, alias)
+
+    def _compare_func(self, op):
+        # Firestore range filters only match values of the same type (a
+        # datetime bound skips text dates and missing fields instead of failing)
+        compare = super()._compare_func(op)
+
+        def typed_compare(value, bound):
+            try:
+                return compare(value, bound)
+            except TypeError:
+                return False
+        return typed_compare
+
+    def stream(self, transaction=None):
+        for doc_snapshot in super().stream(transaction):
+            if self.projection is None:
+                yield doc_snapshot
+            else:
+                data = doc_snapshot.to_dict()
+                yield DocumentSnapshot(doc_snapshot.reference, {
+                    field: data[field] for field in self.projection if field in data
+                })
+
+
+def _transform_name(value):
+    if type(value).__module__.startswith('google.cloud.firestore'):
+        return type(value).__name__
+    return None
+
+
+def _apply_transform(existing, value):
+    """Resolve a Firestore field transform against the stored value"""
+    name = _transform_name(value)
+    is_number = isinstance(existing, (int, float)) and not isinstance(existing, bool)
+    if name == 'Increment':
+        return (existing if is_number else 0) + value.value
+    if name == 'Maximum':
+        return max(existing, value.value) if is_number else value.value
+    if name == 'Minimum':
+        return min(existing, value.value) if is_number else value.value
+    if name == 'ArrayUnion':
+        current = list(existing or [])
+        return current + [item for item in value.values if item not in current]
+    return value
+
+
+def _merge(current, data):
+    """set(merge=True) semantics: nested maps are merged, transforms resolved"""
+    result = dict(current) if isinstance(current, dict) else {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            result[key] = _merge(result.get(key), value)
+        elif _transform_name(value) == 'Sentinel':
+            result.pop(key, None)
+        else:
+            result[key] = _apply_transform(result.get(key), value)
+    return result
+
+
+class InMemoryDocumentReference(DocumentReference):
+    """DocumentReference whose get() counts as one round trip and whose writes apply transforms"""
+
+    def __init__(self, client, data, path, parent):
+        super().__init__(data, path, parent=parent)
+        self._client = client
+
+    def get(self, transaction=None) -> DocumentSnapshot:
+        self._client.round_trip()
+        with self._client.commit_lock:
+            if isinstance(transaction, InMemoryTransaction):
+                transaction.record_read(tuple(self._path))
+            return super().get()
+
+    def set(self, data, merge=False):
+        with self._client.commit_lock:
+            current = get_by_path(self._data, self._path) if merge else {}
+            set_by_path(self._data, self._path, deepcopy(_merge(current, data)))
+            self._client.bump_version(tuple(self._path))
+
+    def delete(self):
+        with self._client.commit_lock:
+            super().delete()
+            self._client.bump_version(tuple(self._path))
+
+    def update(self, data):
+        # mock-firestore handles Increment itself; resolve Minimum/Maximum first
+        document = get_by_path(self._data, self._path)
+        resolved = {}
+        for key, value in data.items():
+            if _transform_name(value) in ('Minimum', 'Maximum'):
+                try:
+                    existing = get_by_path(document, key.split('.'))
+                except (KeyError, TypeError):
+                    existing = None
+                value = _apply_transform(existing, value)
+            resolved[key] = value
+        with self._client.commit_lock:
+            super().update(resolved)
+            self._client.bump_version(tuple(self._path))
+
+
+class InMemoryCollection(CollectionReference):
+    """CollectionReference whose queries are InMemoryQuery and whose reads are counted"""
+
+    def __init__(self, client, data, path, parent=None):
+        super().__init__(data, path, parent=parent)
+        self._client = client
+
+    def document(self, document_id=None) -> InMemoryDocumentReference:
+        doc_ref = super().document(document_id)
+        return InMemoryDocumentReference(self._client, doc_ref._data, doc_ref._path, parent=self)
+
+    def stream(self, transaction=None):
+        # A query is a single round trip however many documents it returns
+        self._client.round_trip()
+        for key in sorted(get_by_path(self._data, self._path)):
+            yield DocumentReference(self._data, self._path + [key], parent=self).get()
+
+    def select(self, field_paths) -> InMemoryQuery:
+        return InMemoryQuery(self).select(field_paths)
+
+    def count(self, alias=None) -> InMemoryAggregationQuery:
+        return InMemoryAggregationQuery(self, alias)
+
+    def where(self, field, op, value) -> InMemoryQuery:
+        return InMemoryQuery(self, field_filters=[(field, op, value)])
+
+    def order_by(self, key, direction=None) -> InMemoryQuery:
+        return InMemoryQuery(self, orders=[(key, direction)])
+
+    def limit(self, limit_amount) -> InMemoryQuery:
+        return InMemoryQuery(self, limit=limit_amount)
+
+    def start_after(self, document_fields_or_snapshot) -> InMemoryQuery:
+        return InMemoryQuery(self, start_at=(document_fields_or_snapshot, False))
+
+
+class InMemoryFirestore(MockFirestore):
+    """
+    MockFirestore with batch(), select() and count() support
+
+    Every document get(), query stream() or count() and get_all() call counts as one read
+    round trip and sleeps for `latency` seconds, so tests can assert on the number
+    of round trips and benchmarks can show the effect of batching. Document writes
+    bump a per-document version that transactions check on commit
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.round_trips = 0
+        self._round_trip_lock = threading.Lock()
+        self.commit_lock = threading.RLock()
+        self._versions = {}
+
+    def version(self, path) -> int:
+        return self._versions.get(path, 0)
+
+    def bump_version(self, path):
+        self._versions[path] = self.version(path) + 1
+
+    def round_trip(self):
+        with self._round_trip_lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def collection(self, path: str) -> InMemoryCollection:
+        collection = super().collection(path)
+        return InMemoryCollection(self, collection._data, collection._path, parent=collection.parent)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self.round_trip()
+        snapshots = [DocumentReference.get(doc_ref) for doc_ref in references]
+        if field_paths is not None:
+            snapshots = [
+                DocumentSnapshot(snapshot.reference, {
+                    field: value for field, value in snapshot.to_dict().items() if field in field_paths
+                })
+                for snapshot in snapshots
+            ]
+        return iter(snapshots)
+
+    def batch(self) -> InMemoryWriteBatch:
+        return InMemoryWriteBatch(self)
+
+    def transaction(self, **kwargs) -> InMemoryTransaction:
+        return InMemoryTransaction(self, **kwargs)
@@ -0,0 +1,68 @@
+"""
+In-memory stand-in for the Firestore reminder queue
+Same interface as services.reminder_service.FirestoreReminderQueue, backed by
+a heap ordered by due_at with lazy removal of moved and cancelled entries
+"""
+from datetime import timedelta
+import heapq
+import itertools
+
+from services.reminder_service import STATUS_SCHEDULED, STATUS_SENDING
+
+
+class InMemoryReminderQueue:
+    """Priority queue of reminder entries keyed by booking id"""
+
+    def __init__(self):
+        self.entries = {}
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def _push(self, entry):
+        heapq.heappush(self._heap, (entry["due_at"], next(self._sequence), entry["booking_id"]))
+
+    def schedule(self, booking_id, due_at, event_start=None, batch=None):
+        self.entries[booking_id] = {
+            "booking_id": booking_id,
+            "due_at": due_at,
+            "event_start": event_start,
+            "status": STATUS_SCHEDULED,
+            "attempts": 0,
+            "lease_expires_at": None
+        }
+        self._push(self.entries[booking_id])
+
+    def cancel(self, booking_id, batch=None):
+        self.entries.pop(booking_id, None)
+
+    def get(self, booking_id):
+        entry = self.entries.get(booking_id)
+        return dict(entry) if entry is not None else None
+
+    def claim_due(self, now, limit, lease_seconds):
+        claimed = []
+        while self._heap and self._heap[0][0] <= now and len(claimed) < limit:
+            due_at, _, booking_id = heapq.heappop(self._heap)
+            entry = self.entries.get(booking_id)
+            # Stale heap item: the entry was moved, cancelled or already claimed
+            if entry is None or entry["due_at"] != due_at or entry["status"] != STATUS_SCHEDULED:
+                continue
+            entry.update(status=STATUS_SENDING, lease_expires_at=now + timedelta(seconds=lease_seconds))
+            claimed.append(dict(entry))
+
+        for entry in self.entries.values():
+            if len(claimed) >= limit:
+                break
+            if entry["status"] == STATUS_SENDING and entry["lease_expires_at"] <= now:
+                entry["lease_expires_at"] = now + timedelta(seconds=lease_seconds)
+                claimed.append(dict(entry))
+        return claimed
+
+    def complete(self, entry, update):
+        current = self.entries.get(entry["booking_id"])
+        if current is None or current["status"] != STATUS_SENDING or current["due_at"] != entry["due_at"]:
+            return False
+        current.update(update)
+        if current["status"] == STATUS_SCHEDULED:
+            self._push(current)
+        return True
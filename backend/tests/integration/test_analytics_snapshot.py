@@ -0,0 +1,218 @@
+"""
+Integration tests for the analytics snapshot
+Tests that the Parquet snapshot copies bookings, events, reviews and
+notifications with typed columns, appends only changed documents on refresh
+(re-reading an overlap window so late writes are not lost) and that the analytics report endpoints honour the freshness bound
+"""
+import pytest
+from unittest.mock import patch
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException
+import asyncio
+import threading
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+pytest.importorskip("pyarrow")
+
+from services.analytics_snapshot_service import AnalyticsSnapshot
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock(datetime(2025, 11, 1, 12, 0))
+
+
+@pytest.fixture
+def snapshot(tmp_path, clock):
+    return AnalyticsSnapshot(directory=str(tmp_path / "snapshot"), clock=clock)
+
+
+@pytest.fixture
+def seeded_db(in_memory_db):
+    """Two bookings with their events (router and panel shapes), a review and a notification"""
+    created = datetime(2025, 10, 1, 9, 0)
+    in_memory_db.collection("bookings").document("booking-1").set({
+        "client_email": "ana@example.com", "service_type": "workshop", "status": "completed",
+        "participants": 12, "estimated_price": 150000, "event_date": datetime(2025, 10, 4, 15, 0),
+        "created_at": created, "updated_at": created
+    })
+    in_memory_db.collection("bookings").document("booking-2").set({
+        "client_email": "luis@example.com", "service_type": "pizza_party", "status": "confirmed",
+        "participants": 20, "estimated_price": 200000, "event_date": "2025-10-20", "created_at": created
+    })
+    in_memory_db.collection("events").document("event-1").set({
+        "booking_id": "booking-1", "start_time": datetime(2025, 10, 4, 15, 0), "actual_participants": 12,
+        "financials": {"income": 150000.0, "total_expenses": 50000.0}, "created_at": created
+    })
+    in_memory_db.collection("events").document("event-2").set({
+        "booking_id": "booking-2", "event_date": "2025-10-20", "participants": 20,
+        "final_price": 200000, "event_cost": 80000, "created_at": created, "updated_at": created
+    })
+    in_memory_db.collection("reviews").document("review-1").set({
+        "event_id": "event-1", "rating": 5, "is_approved": False, "created_at": created
+    })
+    in_memory_db.collection("notifications").document("SM1").set({
+        "notification_type": "booking_confirmation", "status": "sent", "recipient_phone": "whatsapp:+56912345678",
+        "sent_at": created
+    })
+    return in_memory_db
+
+
+@pytest.fixture
+def reports(seeded_db, snapshot):
+    """routers.reports bound to the in-memory Firestore stand-in and a temporary snapshot"""
+    with patch('firebase_admin.firestore.client', return_value=seeded_db):
+        import routers.reports as reports
+        with patch.object(reports, 'db', seeded_db), patch.object(reports, 'analytics_snapshot', snapshot):
+            yield reports
+
+
+class TestAnalyticsSnapshot:
+    """Incremental Parquet snapshot"""
+
+    @pytest.mark.integration
+    def test_full_copy_has_typed_columns(self, seeded_db, snapshot):
+        """Datetime and text dates both load as datetime64 and amounts as floats"""
+        assert snapshot.refresh(seeded_db) == {"bookings": 2, "events": 2, "reviews": 1, "notifications": 1}
+
+        bookings = snapshot.load("bookings").set_index("id")
+        events = snapshot.load("events").set_index("id")
+        assert str(bookings["event_date"].dtype).startswith("datetime64")
+        assert bookings.loc["booking-2", "event_date"] == datetime(2025, 10, 20)
+        assert events["profit"].to_dict() == {"event-1": 100000.0, "event-2": 120000.0}
+        assert events["income"].dtype == "float64"
+
+    @pytest.mark.integration
+    def test_refresh_appends_only_changes(self, seeded_db, snapshot):
+        """A refresh reads the documents written since the last one and keeps their latest version"""
+        snapshot.refresh(seeded_db)
+
+        later = datetime(2025, 11, 1, 10, 0)
+        seeded_db.collection("bookings").document("booking-2").update({"status": "cancelled", "updated_at": later})
+        seeded_db.collection("reviews").document("review-2").set({
+            "event_id": "event-2", "rating": 4, "is_approved": True, "created_at": later
+        })
+
+        appended = snapshot.refresh(seeded_db)
+
+        assert appended == {"bookings": 1, "events": 0, "reviews": 1, "notifications": 0}
+        bookings = snapshot.load("bookings").set_index("id")
+        assert len(bookings) == 2
+        assert bookings.loc["booking-2", "status"] == "cancelled"
+        assert len(snapshot.load("reviews")) == 2
+
+        # Nothing changed since: no new rows
+        assert sum(snapshot.refresh(seeded_db).values()) == 0
+
+    @pytest.mark.integration
+    def test_late_write_inside_the_overlap_is_picked_up(self, seeded_db, snapshot):
+        """A write stamped just before the watermark but committed after the refresh is not lost"""
+        snapshot.refresh(seeded_db)
+        seeded_db.collection("bookings").document("booking-3").set({
+            "status": "pending", "event_date": "2025-10-25", "created_at": datetime(2025, 11, 1, 11, 0)
+        })
+        assert snapshot.refresh(seeded_db)["bookings"] == 1
+
+        # Stamped 30 seconds before the watermark the last refresh stored
+        seeded_db.collection("bookings").document("booking-4").set({
+            "status": "pending", "event_date": "2025-10-26", "created_at": datetime(2025, 11, 1, 10, 59, 30)
+        })
+
+        # booking-3 is re-read inside the overlap but not appended again
+        assert snapshot.refresh(seeded_db)["bookings"] == 1
+        assert sorted(snapshot.load("bookings")["id"]) == ["booking-1", "booking-2", "booking-3", "booking-4"]
+        assert snapshot.refresh(seeded_db)["bookings"] == 0
+
+    @pytest.mark.integration
+    def test_compaction_keeps_latest_rows(self, seeded_db, snapshot):
+        """Past SNAPSHOT_MAX_PARTS the parts are merged into one without losing updates"""
+        with patch('services.analytics_snapshot_service.SNAPSHOT_MAX_PARTS', 2):
+            snapshot.refresh(seeded_db)
+            for hour in range(3):
+                seeded_db.collection("bookings").document("booking-1").update({
+                    "participants": 13 + hour, "updated_at": datetime(2025, 11, 1, hour)
+                })
+                snapshot.refresh(seeded_db)
+
+        parts = os.listdir(os.path.join(snapshot.directory, "bookings"))
+        assert len(parts) <= 2
+        assert snapshot.load("bookings").set_index("id").loc["booking-1", "participants"] == 15
+
+
+class TestAnalyticsReports:
+    """Report endpoints over the snapshot"""
+
+    @pytest.mark.integration
+    def test_revenue_by_month(self, reports):
+        """Both event shapes land in October, with the service of their booking"""
+        result = asyncio.run(reports.get_analytics_revenue(date(2025, 10, 1), date(2025, 10, 31)))
+
+        assert result["periods"] == [{
+            "period": "2025-10",
+            "events": 2,
+            "income": 350000.0,
+            "expenses": 130000.0,
+            "profit": 220000.0,
+            "avg_participants": 16.0,
+            "service_counts": {"pizza_party": 1, "workshop": 1}
+        }]
+
+    @pytest.mark.integration
+    def test_freshness_bound(self, reports, seeded_db, snapshot, clock):
+        """Within max_age_seconds the snapshot is served as is; past it, it refreshes first"""
+        asyncio.run(reports.get_analytics_overview(date(2025, 10, 1), date(2025, 10, 31)))
+        seeded_db.collection("bookings").document("booking-3").set({
+            "status": "pending", "event_date": "2025-10-25", "created_at": datetime(2025, 11, 1, 11, 0)
+        })
+
+        clock.now += timedelta(seconds=30)
+        cached = asyncio.run(reports.get_analytics_overview(date(2025, 10, 1), date(2025, 10, 31), max_age_seconds=60))
+        assert cached["bookings"]["total"] == 2
+        assert cached["snapshot_at"] == "2025-11-01T12:00:00"
+
+        clock.now += timedelta(seconds=60)
+        fresh = asyncio.run(reports.get_analytics_overview(date(2025, 10, 1), date(2025, 10, 31), max_age_seconds=60))
+        assert fresh["bookings"]["total"] == 3
+        assert fresh["bookings"]["by_status"] == {"completed": 1, "confirmed": 1, "pending": 1}
+        assert fresh["reviews"] == {"total": 1, "approved": 0, "avg_rating": 5.0}
+        assert fresh["notifications"]["by_type_status"] == {"booking_confirmation:sent": 1}
+
+    @pytest.mark.integration
+    def test_refresh_runs_off_the_event_loop(self, reports, snapshot):
+        """The Firestore reads and Parquet writes of a refresh happen in a worker thread"""
+        refresh_threads = []
+        original_refresh = snapshot.refresh
+
+        def recording_refresh(db):
+            refresh_threads.append(threading.get_ident())
+            return original_refresh(db)
+
+        async def overview():
+            loop_thread = threading.get_ident()
+            await reports.get_analytics_overview(date(2025, 10, 1), date(2025, 10, 31))
+            return loop_thread
+
+        with patch.object(snapshot, 'refresh', recording_refresh):
+            loop_thread = asyncio.run(overview())
+
+        assert len(refresh_threads) == 1
+        assert refresh_threads[0] != loop_thread
+
+    @pytest.mark.integration
+    def test_invalid_frequency(self, reports):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(reports.get_analytics_revenue(date(2025, 10, 1), date(2025, 10, 31), freq="year"))
+
+        assert error.value.status_code == 400
@@ -0,0 +1,184 @@
+"""
+Integration tests for the bulk send audience index
+Tests that booking writes keep the sharded audiences/{clients,active_bookings}-NN
+index current with normalized E.164 phones, and that each segment resolves
+with a single read and no duplicates
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from fastapi import BackgroundTasks, HTTPException
+import asyncio
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.audience_service import AUDIENCE_SHARDS, AUDIENCES_COLLECTION, rebuild_audiences, resolve_audience
+from services.booking_write_service import apply_booking_update
+from utils.phone import normalize_phone, whatsapp_address
+
+
+@pytest.fixture
+def booking_client(client, in_memory_db, mock_environment_variables):
+    with patch('main.get_db', return_value=in_memory_db), \
+         patch('main.send_confirmation_email', return_value=True):
+        yield client
+
+
+def post_booking(client, phone, event_date):
+    response = client.post('/api/bookings/', json={
+        "service_type": "workshop",
+        "participants": 10,
+        "client_name": "Test Client",
+        "client_email": "ana@example.com",
+        "client_phone": phone,
+        "event_date": event_date
+    })
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+
+def update(client, booking, **data):
+    response = client.put(f"/api/bookings/{booking['id']}", json=data)
+    assert response.status_code == 200
+
+
+def days_from_now(days):
+    return (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+class TestAudienceIndex:
+    """audiences/clients and audiences/active_bookings"""
+
+    @pytest.mark.integration
+    def test_repeat_client_in_any_format_is_one_recipient(self, booking_client, in_memory_db):
+        """Three bookings from the same phone written three ways resolve to one E.164 number"""
+        for phone in ["+56 9 1234 5678", "912345678", "56912345678"]:
+            booking = post_booking(booking_client, phone, days_from_now(10))
+            update(booking_client, booking, status="confirmed")
+        post_booking(booking_client, "+56987654321", days_from_now(20))
+
+        assert resolve_audience(in_memory_db, "recent_clients") == ["+56912345678", "+56987654321"]
+        assert resolve_audience(in_memory_db, "active_bookings") == ["+56912345678"]
+
+    @pytest.mark.integration
+    def test_resolving_a_segment_is_one_read(self, booking_client, in_memory_db):
+        for i in range(5):
+            update(booking_client, post_booking(booking_client, f"+5691111000{i}", days_from_now(7)), status="confirmed")
+
+        in_memory_db.round_trips = 0
+        recipients = resolve_audience(in_memory_db, "active_bookings")
+
+        assert len(recipients) == 5
+        assert in_memory_db.round_trips == 1
+
+    @pytest.mark.integration
+    def test_members_are_spread_over_shards(self, booking_client, in_memory_db):
+        """Each phone lives in exactly one shard, so booking writes don't all land on one document"""
+        phones = [f"+5691111{i:04d}" for i in range(20)]
+        for phone in phones:
+            update(booking_client, post_booking(booking_client, phone, days_from_now(7)), status="confirmed")
+
+        for index in ("clients", "active_bookings"):
+            shards = [doc.to_dict()["members"] for doc in in_memory_db.collection(AUDIENCES_COLLECTION).stream()
+                      if doc.id.startswith(f"{index}-")]
+            assert 1 < len(shards) <= AUDIENCE_SHARDS
+            assert sorted(phone for members in shards for phone in members) == phones
+
+        in_memory_db.round_trips = 0
+        assert resolve_audience(in_memory_db, "active_bookings") == phones
+        assert in_memory_db.round_trips == 1
+
+    @pytest.mark.integration
+    def test_status_and_date_changes_move_the_booking(self, booking_client, in_memory_db):
+        """Cancelling or moving a confirmed booking into the past drops its phone from active_bookings"""
+        kept = post_booking(booking_client, "+56911111111", days_from_now(5))
+        cancelled = post_booking(booking_client, "+56922222222", days_from_now(5))
+        moved = post_booking(booking_client, "+56933333333", days_from_now(5))
+        for booking in (kept, cancelled, moved):
+            update(booking_client, booking, status="confirmed")
+
+        update(booking_client, cancelled, status="cancelled")
+        apply_booking_update(
+            in_memory_db, in_memory_db.collection("bookings").document(moved["id"]), {"event_date": days_from_now(-3)}
+        )
+
+        assert resolve_audience(in_memory_db, "active_bookings") == ["+56911111111"]
+
+    @pytest.mark.integration
+    def test_recent_clients_window(self, in_memory_db):
+        """Only phones with a booking created in the last RECENT_CLIENT_DAYS days are recent"""
+        now = datetime.now()
+        for booking_id, phone, age in [("a", "+56911111111", 3), ("b", "+56922222222", 45), ("c", "+56922222222", 60)]:
+            in_memory_db.collection("bookings").document(booking_id).set({
+                "client_phone": phone, "status": "completed", "created_at": now - timedelta(days=age)
+            })
+        rebuild_audiences(in_memory_db)
+
+        assert resolve_audience(in_memory_db, "recent_clients") == ["+56911111111"]
+
+    @pytest.mark.integration
+    def test_rebuild_matches_incremental_index(self, booking_client, in_memory_db):
+        update(booking_client, post_booking(booking_client, "912345678", days_from_now(3)), status="confirmed")
+        post_booking(booking_client, "+56987654321", days_from_now(4))
+        incremental = {segment: resolve_audience(in_memory_db, segment)
+                       for segment in ("recent_clients", "active_bookings")}
+
+        rebuild_audiences(in_memory_db)
+
+        assert {segment: resolve_audience(in_memory_db, segment) for segment in incremental} == incremental
+
+    @pytest.mark.integration
+    def test_bulk_send_uses_the_index(self, in_memory_db):
+        """Recipients come from the index, once per client; the default "all" filter still sends to nobody"""
+        with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+            import routers.notifications as notifications
+        for booking_id, phone in [("a", "+56911111111"), ("b", "911111111"), ("c", "+56922222222")]:
+            in_memory_db.collection("bookings").document(booking_id).set({
+                "client_phone": phone, "status": "pending", "created_at": datetime.now()
+            })
+        rebuild_audiences(in_memory_db)
+
+        with patch.object(notifications, 'db', in_memory_db):
+            response = asyncio.run(notifications.send_bulk_notification(
+                "Hola", "promo", BackgroundTasks(), recipient_filter="recent_clients"
+            ))
+            assert response["total_recipients"] == 2
+
+            response = asyncio.run(notifications.send_bulk_notification("Hola", "promo", BackgroundTasks()))
+            assert response["total_recipients"] == 0
+
+            with pytest.raises(HTTPException) as error:
+                asyncio.run(notifications.send_bulk_notification(
+                    "Hola", "promo", BackgroundTasks(), recipient_filter="everyone"
+                ))
+            assert error.value.status_code == 400
+
+
+class TestNormalizePhone:
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("phone", [
+        "+56912345678", "+56 9 1234 5678", "56912345678", "912345678",
+        "0912345678", "0056912345678", "whatsapp:+56912345678", " (+56) 9-1234-5678 "
+    ])
+    def test_formats_normalize_to_e164(self, phone):
+        assert normalize_phone(phone) == "+56912345678"
+
+    @pytest.mark.unit
+    def test_foreign_numbers_keep_their_country_code(self):
+        assert normalize_phone("+1 415 523 8886") == "+14155238886"
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("phone", [None, "", "   ", "abc", "+12", "+1234567890123456"])
+    def test_invalid(self, phone):
+        assert normalize_phone(phone) is None
+        assert whatsapp_address(phone) is None
+
+    @pytest.mark.unit
+    def test_whatsapp_address_matches_senders(self):
+        from services.whatsapp_service import format_phone_number
+        assert format_phone_number("912345678") == whatsapp_address("+56912345678") == "whatsapp:+56912345678"
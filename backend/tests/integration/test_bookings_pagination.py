@@ -0,0 +1,92 @@
+"""
+Integration tests for GET /api/bookings/ pagination
+Tests cursor pages, server-side filters and field projection against the
+in-memory Firestore stand-in
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+
+@pytest.fixture
+def seeded_db(in_memory_db):
+    """25 bookings alternating status/service type across October and November 2025"""
+    created = datetime(2025, 9, 1, 9, 0)
+    for i in range(25):
+        in_memory_db.collection("bookings").document(f"booking-{i:02d}").set({
+            "id": f"booking-{i:02d}",
+            "client_name": f"Cliente {i}",
+            "client_email": f"cliente{i}@example.com",
+            "service_type": "workshop" if i % 2 else "pizza_party",
+            "status": "confirmed" if i % 3 == 0 else "pending",
+            "event_date": f"2025-{10 + i // 15}-{(i % 15) + 1:02d}",
+            "estimated_price": 100000 + i,
+            "created_at": created + timedelta(hours=i)
+        })
+    return in_memory_db
+
+
+def get_json(client, query_string):
+    response = client.get('/api/bookings/', query_string=query_string)
+    return response.status_code, json.loads(response.data)
+
+
+class TestBookingsPagination:
+    """Cursor pages, filters and projection for the bookings list"""
+
+    @pytest.mark.integration
+    def test_cursor_walks_every_booking_once(self, client, seeded_db):
+        """Pages come newest first and the cursor chain covers the collection exactly once"""
+        seen = []
+        with patch('main.get_db', return_value=seeded_db):
+            status, page = get_json(client, {'limit': 10})
+            while True:
+                assert status == 200
+                seen.extend(booking["id"] for booking in page["bookings"])
+                if page["next_cursor"] is None:
+                    break
+                status, page = get_json(client, {'limit': 10, 'start_after': page["next_cursor"]})
+
+        assert seen == [f"booking-{i:02d}" for i in reversed(range(25))]
+
+    @pytest.mark.integration
+    def test_filters_are_applied_in_the_query(self, client, seeded_db):
+        """status, service_type and the event_date range narrow the page"""
+        with patch('main.get_db', return_value=seeded_db):
+            status, page = get_json(client, {
+                'limit': 50,
+                'status': 'confirmed',
+                'service_type': 'workshop',
+                'event_date_from': '2025-10-01',
+                'event_date_to': '2025-10-15'
+            })
+
+        assert status == 200
+        assert page["next_cursor"] is None
+        bookings = page["bookings"]
+        assert [booking["id"] for booking in bookings] == ["booking-03", "booking-09"]
+        assert all(booking["status"] == "confirmed" and booking["service_type"] == "workshop" for booking in bookings)
+
+    @pytest.mark.integration
+    def test_fields_projection(self, client, seeded_db):
+        """fields= returns only the projected fields plus the document id"""
+        with patch('main.get_db', return_value=seeded_db):
+            status, bookings = get_json(client, {'fields': 'client_name,status'})
+
+        assert status == 200
+        assert len(bookings) == 25
+        assert all(set(booking) == {"id", "client_name", "status"} for booking in bookings)
+
+    @pytest.mark.integration
+    def test_invalid_parameters(self, client, seeded_db):
+        """Bad limits and unknown cursors are rejected"""
+        with patch('main.get_db', return_value=seeded_db):
+            assert get_json(client, {'limit': 'ten'})[0] == 400
+            assert get_json(client, {'limit': 0})[0] == 400
+            assert get_json(client, {'limit': 5, 'start_after': 'missing'})[0] == 400
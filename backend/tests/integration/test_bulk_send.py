@@ -0,0 +1,293 @@
+"""
+Integration tests for the bulk send jobs
+Tests that /notifications/bulk-send runs as a background job with a
+concurrency cap and a token bucket, is claimed by one worker at a time,
+persists its progress in chunked documents without blocking the event loop,
+stops every send before releasing the job and can be resumed after an
+interruption without resending
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from fastapi import BackgroundTasks, HTTPException
+import asyncio
+import threading
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.audience_service import rebuild_audiences
+from services.bulk_send_service import BULK_JOB_CHUNKS_COLLECTION, BULK_JOBS_COLLECTION, BulkSendRunner, create_bulk_job
+from services.common import TokenBucket
+from tests.in_memory_firestore import InMemoryDocumentReference, InMemoryFirestore, InMemoryWriteBatch
+
+
+class RecordingSender:
+    """Async send stand-in that takes `delay` seconds and tracks overlapping sends"""
+
+    def __init__(self, delay: float = 0.0, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, phone, message, notification_type):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            self.calls.append((phone, notification_type))
+            return phone not in self.failing
+        finally:
+            self.in_flight -= 1
+
+
+def phones(count):
+    return [f"+5691234{i:04d}" for i in range(count)]
+
+
+def job_doc(db, job_id):
+    return db.collection(BULK_JOBS_COLLECTION).document(job_id).get().to_dict()
+
+
+@pytest.fixture
+def notifications(in_memory_db):
+    """routers.notifications bound to the in-memory Firestore stand-in"""
+    with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+        import routers.notifications as notifications
+        with patch.object(notifications, 'db', in_memory_db):
+            yield notifications
+
+
+class TestBulkSendJobs:
+    """bulk_send_jobs/{job_id}"""
+
+    @pytest.mark.integration
+    def test_endpoint_queues_a_background_job(self, notifications, in_memory_db):
+        """The request returns the job id at once; the background task sends and records the counters"""
+        now = datetime.now()
+        for i, phone in enumerate(["+56911111111", "+56922222222", "+56911111111"]):
+            in_memory_db.collection("bookings").document(f"booking-{i}").set({
+                "client_phone": phone, "created_at": now - timedelta(days=i)
+            })
+        rebuild_audiences(in_memory_db)
+        sender = RecordingSender(failing={"+56922222222"})
+        tasks = BackgroundTasks()
+
+        with patch.object(notifications, 'send_whatsapp_notification', sender):
+            response = asyncio.run(notifications.send_bulk_notification(
+                "Promo de invierno", "promo", tasks, recipient_filter="recent_clients"
+            ))
+            assert sender.calls == []
+            asyncio.run(tasks())
+
+        progress = asyncio.run(notifications.get_bulk_send_job(response["job_id"]))
+        assert response["total_recipients"] == 2
+        assert sorted(sender.calls) == [("+56911111111", "bulk_promo"), ("+56922222222", "bulk_promo")]
+        assert progress["status"] == "completed"
+        assert (progress["sent"], progress["failed"], progress["pending"]) == (1, 1, 0)
+
+    @pytest.mark.integration
+    def test_concurrency_cap(self, in_memory_db):
+        """Sends overlap, but never more than `concurrency` at a time"""
+        job = create_bulk_job(in_memory_db, "Hola", "promo", phones(12))
+        sender = RecordingSender(delay=0.05)
+        runner = BulkSendRunner(in_memory_db, sender, concurrency=3, rate=1000, burst=1000)
+
+        start = time.perf_counter()
+        asyncio.run(runner.run(job["id"]))
+        elapsed = time.perf_counter() - start
+
+        assert sender.max_in_flight == 3
+        assert len(sender.calls) == 12
+        assert elapsed < 12 * 0.05 / 2
+
+    @pytest.mark.integration
+    def test_rate_limit(self, in_memory_db):
+        """With 20 sends/s and a burst of 1, ten sends take about half a second"""
+        job = create_bulk_job(in_memory_db, "Hola", "promo", phones(10))
+        runner = BulkSendRunner(in_memory_db, RecordingSender(), concurrency=10, rate=20, burst=1)
+
+        start = time.perf_counter()
+        asyncio.run(runner.run(job["id"]))
+
+        assert time.perf_counter() - start >= 9 / 20 * 0.9
+
+    @pytest.mark.integration
+    def test_interrupted_job_resumes_without_resending(self, in_memory_db):
+        """Progress saved at cancellation lets the next run send only to the rest"""
+        recipients = phones(20)
+        job = create_bulk_job(in_memory_db, "Hola", "promo", recipients)
+        first = RecordingSender(delay=0.01)
+        runner = BulkSendRunner(in_memory_db, first, concurrency=2, rate=1000, burst=1000, checkpoint_every=100)
+
+        async def interrupt_after(sends):
+            task = asyncio.create_task(runner.run(job["id"]))
+            while len(first.calls) < sends:
+                await asyncio.sleep(0.005)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(interrupt_after(6))
+        interrupted = job_doc(in_memory_db, job["id"])
+        assert interrupted["status"] == "interrupted"
+        assert interrupted["sent"] == len(first.calls)
+
+        second = RecordingSender()
+        progress = asyncio.run(BulkSendRunner(in_memory_db, second, rate=1000, burst=1000).run(job["id"]))
+
+        assert sorted(phone for phone, _ in first.calls + second.calls) == recipients
+        assert progress["status"] == "completed"
+        assert progress["sent"] == 20
+
+    @pytest.mark.integration
+    def test_failed_checkpoint_stops_the_other_sends_first(self, in_memory_db):
+        """A failing checkpoint cancels the sends in flight before the lease is released"""
+        job = create_bulk_job(in_memory_db, "Hola", "promo", phones(20))
+        sender = RecordingSender(delay=0.02)
+        runner = BulkSendRunner(in_memory_db, sender, concurrency=4, rate=1000, burst=1000, checkpoint_every=1)
+        original_save = BulkSendRunner._save
+        saves = []
+
+        def failing_save(self, job_ref, job, outcomes, final_status=None):
+            saves.append(final_status)
+            if len(saves) == 1:
+                raise RuntimeError("Firestore unavailable")
+            return original_save(self, job_ref, job, outcomes, final_status)
+
+        async def run_and_wait():
+            with pytest.raises(RuntimeError):
+                await runner.run(job["id"])
+            in_flight, calls = sender.in_flight, len(sender.calls)
+            await asyncio.sleep(0.1)
+            return in_flight, calls
+
+        with patch.object(BulkSendRunner, '_save', failing_save):
+            in_flight, calls = asyncio.run(run_and_wait())
+
+        assert in_flight == 0
+        assert len(sender.calls) == calls < 20
+        assert saves[-1] == "interrupted"
+        interrupted = job_doc(in_memory_db, job["id"])
+        assert interrupted["status"] == "interrupted"
+        assert interrupted["sent"] == calls
+
+    @pytest.mark.integration
+    def test_running_job_with_live_lease_is_not_resumed(self, notifications, in_memory_db):
+        """A job another worker holds is rejected until its lease expires"""
+        job = create_bulk_job(in_memory_db, "Hola", "promo", phones(3))
+        in_memory_db.collection(BULK_JOBS_COLLECTION).document(job["id"]).update({
+            "status": "running", "lease_expires_at": datetime.now() + timedelta(minutes=2)
+        })
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(notifications.resume_bulk_send_job(job["id"], BackgroundTasks()))
+        assert error.value.status_code == 409
+
+        in_memory_db.collection(BULK_JOBS_COLLECTION).document(job["id"]).update({
+            "lease_expires_at": datetime.now() - timedelta(seconds=1)
+        })
+        sender = RecordingSender()
+        resumed = asyncio.run(BulkSendRunner(in_memory_db, sender).resume_stale())
+        assert [progress["status"] for progress in resumed] == ["completed"]
+        assert len(sender.calls) == 3
+
+    @pytest.mark.integration
+    def test_racing_runners_claim_the_job_once(self, in_memory_db):
+        """Two runners read the pending job before either writes; only one claim commits"""
+        job = create_bulk_job(in_memory_db, "Hola", "promo", phones(4))
+        sender = RecordingSender()
+
+        # Hold the first two reads of the job until both have happened
+        both_read = threading.Barrier(2)
+        first_reads = iter(range(2))
+        original_get = InMemoryDocumentReference.get
+
+        def get_together(self, transaction=None):
+            snapshot = original_get(self, transaction=transaction)
+            if next(first_reads, None) is not None:
+                both_read.wait(timeout=5)
+            return snapshot
+
+        results = []
+
+        def run():
+            runner = BulkSendRunner(in_memory_db, sender, rate=1000, burst=1000)
+            results.append(asyncio.run(runner.run(job["id"]))["status"])
+
+        with patch.object(InMemoryDocumentReference, 'get', get_together):
+            threads = [threading.Thread(target=run) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=10)
+
+        assert sorted(results) == ["completed", "skipped"]
+        assert sorted(phone for phone, _ in sender.calls) == phones(4)
+
+    @pytest.mark.integration
+    def test_recipients_and_outcomes_live_in_chunks(self, in_memory_db):
+        """The job document keeps only counters; each chunk holds its recipients and their outcomes"""
+        job = create_bulk_job(in_memory_db, "Hola", "promo", phones(10), chunk_size=4)
+        sender = RecordingSender(failing={phones(10)[5]})
+        asyncio.run(BulkSendRunner(in_memory_db, sender, rate=1000, burst=1000, checkpoint_every=3).run(job["id"]))
+
+        stored = job_doc(in_memory_db, job["id"])
+        assert "recipients" not in stored and "outcomes" not in stored
+        assert (stored["sent"], stored["failed"], stored["chunks"]) == (9, 1, 3)
+
+        chunks = [in_memory_db.collection(BULK_JOB_CHUNKS_COLLECTION).document(f"{job['id']}-{chunk:04d}").get().to_dict()
+                  for chunk in range(3)]
+        assert [chunk["recipients"] for chunk in chunks] == [phones(10)[0:4], phones(10)[4:8], phones(10)[8:10]]
+        assert chunks[1]["outcomes"] == {"4": "sent", "5": "failed", "6": "sent", "7": "sent"}
+        assert sorted(chunks[2]["outcomes"]) == ["8", "9"]
+
+    @pytest.mark.integration
+    def test_checkpoints_do_not_block_the_event_loop(self):
+        """Firestore writes run in a worker thread while the other sends keep going"""
+        db = InMemoryFirestore()
+        job = create_bulk_job(db, "Hola", "promo", phones(6))
+        loop_threads = set()
+        write_threads = set()
+        original_commit = InMemoryWriteBatch.commit
+
+        def slow_commit(batch):
+            write_threads.add(threading.get_ident())
+            time.sleep(0.05)
+            return original_commit(batch)
+
+        async def send(phone, message, notification_type):
+            loop_threads.add(threading.get_ident())
+            return True
+
+        with patch.object(InMemoryWriteBatch, 'commit', slow_commit):
+            progress = asyncio.run(BulkSendRunner(db, send, rate=1000, burst=1000, checkpoint_every=2).run(job["id"]))
+
+        assert progress["sent"] == 6
+        assert write_threads and not write_threads & loop_threads
+
+
+class TestTokenBucket:
+
+    @pytest.mark.unit
+    def test_refills_at_rate(self):
+        """After the burst each permit waits 1/rate seconds"""
+        now = [0.0]
+        waits = []
+
+        async def fake_sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        async def take(count):
+            bucket = TokenBucket(rate=5, capacity=2, clock=lambda: now[0], sleep=fake_sleep)
+            for _ in range(count):
+                await bucket.acquire()
+
+        asyncio.run(take(4))
+        assert waits == pytest.approx([0.2, 0.2])
@@ -0,0 +1,205 @@
+"""
+Integration tests for the clients index
+Tests that booking writes keep the per-client counters and first/last event days
+up to date (also when a booking's date is edited), that the backfill rebuilds the same index and that retention is read
+from it
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime
+import asyncio
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.client_index_service import CLIENTS_COLLECTION, rebuild_client_index
+
+
+def client_entry(db, email):
+    return db.collection(CLIENTS_COLLECTION).document(email).get().to_dict()
+
+
+def post_booking(client, email, event_date):
+    response = client.post('/api/bookings/', json={
+        "service_type": "workshop",
+        "participants": 10,
+        "client_name": "Test Client",
+        "client_email": email,
+        "client_phone": "+56912345678",
+        "event_date": event_date
+    })
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+
+@pytest.fixture
+def booking_client(client, in_memory_db, mock_environment_variables):
+    with patch('main.get_db', return_value=in_memory_db), \
+         patch('main.send_confirmation_email', return_value=True):
+        yield client
+
+
+class TestClientIndex:
+    """clients/{email} kept up to date by the booking write paths"""
+
+    @pytest.mark.integration
+    def test_create_booking_updates_the_index(self, booking_client, in_memory_db):
+        """Emails are normalized; counts and first/last event days accumulate"""
+        post_booking(booking_client, "Ana@Example.com ", "2025-10-15")
+        post_booking(booking_client, "ana@example.com", "2025-03-02")
+
+        entry = client_entry(in_memory_db, "ana@example.com")
+        assert entry["booking_count"] == 2
+        assert entry["status_counts"] == {"pending": 2}
+        assert entry["first_event_day"] == 20250302
+        assert entry["last_event_day"] == 20251015
+
+    @pytest.mark.integration
+    def test_status_change_moves_the_counters(self, booking_client, in_memory_db):
+        """Changing the status moves one booking between status counters"""
+        booking = post_booking(booking_client, "ana@example.com", "2025-10-15")
+
+        booking_client.put(f"/api/bookings/{booking['id']}", json={"status": "confirmed"})
+        booking_client.put(f"/api/bookings/{booking['id']}", json={"notes": "Sin cambio de estado"})
+
+        assert client_entry(in_memory_db, "ana@example.com")["status_counts"] == {"pending": 0, "confirmed": 1}
+
+    @pytest.mark.integration
+    def test_event_date_edit_recomputes_the_range(self, booking_client, in_memory_db):
+        """Moving a booking's date can shrink the first/last event days, not only widen them"""
+        from services.booking_write_service import apply_booking_update
+
+        earliest = post_booking(booking_client, "ana@example.com", "2025-03-02")
+        latest = post_booking(booking_client, "Ana@Example.com", "2025-10-15")
+        bookings = in_memory_db.collection("bookings")
+
+        apply_booking_update(in_memory_db, bookings.document(earliest["id"]), {"event_date": "2025-06-10"})
+        entry = client_entry(in_memory_db, "ana@example.com")
+        assert (entry["first_event_day"], entry["last_event_day"]) == (20250610, 20251015)
+
+        apply_booking_update(in_memory_db, bookings.document(latest["id"]), {"event_date": "2025-05-01"})
+        entry = client_entry(in_memory_db, "ana@example.com")
+        assert (entry["first_event_day"], entry["last_event_day"]) == (20250501, 20250610)
+
+        rebuild_client_index(in_memory_db)
+        rebuilt = client_entry(in_memory_db, "ana@example.com")
+        assert {field: rebuilt[field] for field in ("event_days", "first_event_day", "last_event_day")} == \
+            {field: entry[field] for field in ("event_days", "first_event_day", "last_event_day")}
+
+    @pytest.mark.integration
+    def test_backfill_matches_incremental_updates(self, booking_client, in_memory_db):
+        """Rebuilding from the bookings gives the same counters as the write paths"""
+        first = post_booking(booking_client, "ana@example.com", "2025-10-15")
+        post_booking(booking_client, "ana@example.com", "2025-11-20")
+        post_booking(booking_client, "bruno@example.com", "2025-09-01")
+        booking_client.put(f"/api/bookings/{first['id']}", json={"status": "cancelled"})
+        fields = ("booking_count", "status_counts", "first_event_day", "last_event_day")
+        incremental = {
+            email: {field: client_entry(in_memory_db, email)[field] for field in fields}
+            for email in ("ana@example.com", "bruno@example.com")
+        }
+
+        assert rebuild_client_index(in_memory_db) == 2
+
+        for email, expected in incremental.items():
+            entry = client_entry(in_memory_db, email)
+            expected["status_counts"] = {status: n for status, n in expected["status_counts"].items() if n}
+            assert {field: entry[field] for field in fields} == expected
+
+    @pytest.mark.integration
+    def test_backfill_command(self, flask_app, in_memory_db):
+        """flask backfill-client-index rebuilds the index from existing bookings"""
+        in_memory_db.collection("bookings").document("booking-1").set({
+            "client_email": "ana@example.com",
+            "status": "completed",
+            "event_date": "2025-01-10"
+        })
+        in_memory_db.collection(CLIENTS_COLLECTION).document("stale@example.com").set({"booking_count": 1})
+
+        with patch('main.get_db', return_value=in_memory_db):
+            result = flask_app.test_cli_runner().invoke(args=['backfill-client-index'])
+
+        assert result.exit_code == 0
+        assert "1 clients" in result.output
+        assert [doc.id for doc in in_memory_db.collection(CLIENTS_COLLECTION).stream()] == ["ana@example.com"]
+
+    @pytest.mark.integration
+    def test_retention_reads_only_the_month_clients(self, in_memory_db):
+        """Retention is the share of the month's clients whose first event is earlier"""
+        bookings = [
+            ("ana@example.com", datetime(2024, 12, 5)),
+            ("ana@example.com", datetime(2025, 10, 3)),
+            ("bruno@example.com", datetime(2025, 10, 8)),
+            ("carla@example.com", datetime(2025, 10, 12)),
+            ("carla@example.com", datetime(2025, 11, 1))
+        ]
+        for i, (email, event_date) in enumerate(bookings):
+            in_memory_db.collection("bookings").document(f"booking-{i}").set({
+                "client_email": email,
+                "event_date": event_date
+            })
+        rebuild_client_index(in_memory_db)
+        in_memory_db.round_trips = 0
+
+        with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+            import routers.reports as reports
+            with patch.object(reports, 'db', in_memory_db):
+                retention = asyncio.run(reports.calculate_client_retention_rate(2025, 10))
+
+        assert retention == pytest.approx(100 / 3)
+        assert in_memory_db.round_trips == 2
+
+
+class TestClientLedger:
+    """Booking count, total spent and last visit served from the clients index"""
+
+    @pytest.mark.integration
+    def test_event_writes_update_the_ledger(self, booking_client, in_memory_db):
+        """Auto-created events add their price; editing it moves the total by the difference"""
+        booking = post_booking(booking_client, "ana@example.com", "2025-10-15")
+        booking_client.put(f"/api/bookings/{booking['id']}", json={"status": "completed", "event_cost": 30000})
+        event_id = next(doc.id for doc in in_memory_db.collection("events").stream())
+
+        entry = client_entry(in_memory_db, "ana@example.com")
+        assert entry["total_spent"] == booking["estimated_price"]
+        assert entry["last_visit_day"] == 20251015
+
+        booking_client.put(f"/api/events/{event_id}", json={"final_price": 150000})
+        assert client_entry(in_memory_db, "ana@example.com")["total_spent"] == 150000
+
+    @pytest.mark.integration
+    def test_top_clients_single_query(self, in_memory_db):
+        """The top-K is one ordered query over the ledger, whatever the number of bookings"""
+        for i in range(30):
+            in_memory_db.collection("bookings").document(f"booking-{i:02d}").set({
+                "client_email": f"cliente{i % 6}@example.com",
+                "client_name": f"Cliente {i % 6}",
+                "event_date": datetime(2025, 1 + i % 12, 10)
+            })
+            in_memory_db.collection("events").document(f"event-{i:02d}").set({
+                "booking_id": f"booking-{i:02d}",
+                "start_time": datetime(2025, 1 + i % 12, 10, 15, 0),
+                "financials": {"income": 1000.0 * (i % 6 + 1)}
+            })
+        for i in range(6):
+            in_memory_db.collection("bookings").document(f"extra-{i}").set({
+                "client_email": "cliente5@example.com",
+                "event_date": datetime(2026, 1, 1 + i)
+            })
+        rebuild_client_index(in_memory_db)
+        in_memory_db.round_trips = 0
+
+        with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+            import routers.reports as reports
+            with patch.object(reports, 'db', in_memory_db):
+                result = asyncio.run(reports.get_top_clients(limit=2))
+
+        assert in_memory_db.round_trips == 1
+        assert [client["email"] for client in result["clients"]] == ["cliente5@example.com", "cliente0@example.com"]
+        top = result["clients"][0]
+        assert top["total_bookings"] == 11
+        assert top["total_spent"] == 5 * 6000.0
+        assert top["last_visit"] == "2025-12-10"
@@ -0,0 +1,92 @@
+"""
+Integration tests for conditional GET on list endpoints
+Tests ETag headers and 304 responses for polling clients, and that a deleted
+document changes the validator
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+from datetime import datetime
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+
+def make_docs(items):
+    """Wrap dicts as Firestore document snapshots"""
+    docs = []
+    for item in items:
+        doc = MagicMock()
+        doc.id = item["id"]
+        doc.to_dict.return_value = dict(item)
+        docs.append(doc)
+    return docs
+
+
+class TestConditionalGet:
+    """ETag support on list endpoints"""
+
+    @pytest.mark.integration
+    def test_bookings_if_none_match_returns_304(self, client, mock_firestore):
+        """A matching If-None-Match gets an empty 304; changed data gets a new ETag"""
+        bookings = [
+            {"id": "booking-1", "status": "pending", "created_at": datetime(2025, 9, 1, 10, 0)},
+            {"id": "booking-2", "status": "confirmed", "created_at": datetime(2025, 9, 2, 10, 0),
+             "updated_at": datetime(2025, 9, 5, 18, 30)}
+        ]
+        mock_firestore['bookings'].stream.return_value = make_docs(bookings)
+
+        with patch('main.get_db', return_value=mock_firestore['db']):
+            first = client.get('/api/bookings/')
+            assert first.status_code == 200
+            etag = first.headers['ETag']
+            assert not etag.startswith('W/'), "ETag should be strong"
+            assert 'Last-Modified' not in first.headers
+
+            mock_firestore['bookings'].stream.return_value = make_docs(bookings)
+            second = client.get('/api/bookings/', headers={'If-None-Match': etag})
+            assert second.status_code == 304
+            assert second.data == b''
+
+            bookings[0]["status"] = "confirmed"
+            mock_firestore['bookings'].stream.return_value = make_docs(bookings)
+            third = client.get('/api/bookings/', headers={'If-None-Match': etag})
+            assert third.status_code == 200
+            assert third.headers['ETag'] != etag
+
+    @pytest.mark.integration
+    def test_contacts_deletion_changes_the_validator(self, client):
+        """A deleted contact invalidates the client's copy even though no timestamp moved"""
+        contacts = [
+            {"id": "contact-1", "status": "pending",
+             "created_at": datetime(2025, 9, 1, 9, 0), "updated_at": datetime(2025, 9, 3, 12, 0)},
+            {"id": "contact-2", "status": "pending", "created_at": datetime(2025, 8, 30, 9, 0)}
+        ]
+        mock_db = MagicMock()
+        contacts_query = mock_db.collection.return_value.order_by.return_value.limit.return_value
+        contacts_query.stream.return_value = make_docs(contacts)
+
+        with patch('main.get_db', return_value=mock_db):
+            first = client.get('/api/contacts')
+            etag = first.headers['ETag']
+
+            contacts_query.stream.return_value = make_docs(contacts)
+            response = client.get('/api/contacts', headers={
+                'If-None-Match': etag,
+                'Origin': 'https://pablospizza.web.app'
+            })
+            assert response.status_code == 304
+            assert response.headers['Access-Control-Allow-Origin'] == 'https://pablospizza.web.app'
+
+            # contact-2 was deleted; the newest timestamp is still contact-1's
+            contacts_query.stream.return_value = make_docs(contacts[:1])
+            response = client.get('/api/contacts', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+
+            contacts_query.stream.return_value = make_docs(contacts[:1])
+            response = client.get('/api/contacts', headers={'If-Modified-Since': 'Wed, 03 Sep 2025 12:00:00 GMT'})
+            assert response.status_code == 200
+            assert [contact["id"] for contact in response.get_json()] == ["contact-1"]
+            assert response.headers['Cache-Control'] in ('no-cache, private', 'private, no-cache')
@@ -0,0 +1,97 @@
+"""
+Integration tests for the CORS layer
+Tests that preflights are answered without running a route and carry a long max-age,
+and that only the public gallery reads answer any origin
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+ALLOWED_ORIGIN = 'https://pablospizza.web.app'
+
+
+def preflight_headers(origin, method='PUT'):
+    return {
+        'Origin': origin,
+        'Access-Control-Request-Method': method,
+        'Access-Control-Request-Headers': 'Content-Type'
+    }
+
+
+class TestCORSPreflight:
+    """CORS preflight and actual response headers"""
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize('path,method', [
+        ('/api/events/event-1/publish', 'PUT'),
+        ('/api/gallery/photo-1/publish', 'PUT'),
+        ('/api/gallery/upload', 'POST'),
+        ('/api/contacts/contact-1/respond', 'POST'),
+        ('/api/bookings/booking-1', 'PUT'),
+    ])
+    def test_preflight_short_circuits_route(self, client, path, method):
+        """Preflights get a 204 with cacheable CORS headers and never touch the database"""
+        with patch('main.get_db') as mock_get_db:
+            response = client.options(path, headers=preflight_headers(ALLOWED_ORIGIN, method))
+
+            assert response.status_code == 204
+            assert response.data == b''
+            assert response.headers['Access-Control-Allow-Origin'] == ALLOWED_ORIGIN
+            assert method in response.headers['Access-Control-Allow-Methods']
+            assert response.headers['Access-Control-Allow-Headers'] == 'Content-Type,Authorization'
+            assert int(response.headers['Access-Control-Max-Age']) >= 3600
+            mock_get_db.assert_not_called()
+
+    @pytest.mark.integration
+    def test_preflight_from_unknown_origin_is_not_allowed(self, client):
+        """Origins outside the allow-list get no Access-Control-Allow-Origin"""
+        response = client.options('/api/events/event-1/publish', headers=preflight_headers('https://evil.example'))
+
+        assert response.status_code == 204
+        assert 'Access-Control-Allow-Origin' not in response.headers
+
+    @pytest.mark.integration
+    def test_actual_response_reflects_allowed_origin(self, client):
+        """Actual responses (including errors) carry a single reflected origin"""
+        mock_db = MagicMock()
+        mock_db.collection.return_value.document.return_value.get.return_value.exists = False
+
+        with patch('main.get_db', return_value=mock_db):
+            response = client.put(
+                '/api/events/missing/publish',
+                json={"is_published": True},
+                headers={'Origin': ALLOWED_ORIGIN}
+            )
+
+        assert response.status_code == 404
+        assert response.headers.getlist('Access-Control-Allow-Origin') == [ALLOWED_ORIGIN]
+        assert 'Origin' in response.headers['Vary']
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize('path', ['/api/gallery/public', '/api/gallery/event/event-1'])
+    def test_public_gallery_answers_any_origin(self, client, in_memory_db, path):
+        """The public gallery reads keep Access-Control-Allow-Origin: * for sites outside the allow-list"""
+        preflight = client.options(path, headers=preflight_headers('https://blog.example', 'GET'))
+        assert preflight.headers['Access-Control-Allow-Origin'] == '*'
+
+        with patch('main.get_db', return_value=in_memory_db):
+            response = client.get(path, headers={'Origin': 'https://blog.example'})
+
+        assert response.status_code == 200
+        assert response.headers.getlist('Access-Control-Allow-Origin') == ['*']
+
+    @pytest.mark.integration
+    def test_admin_routes_do_not_answer_unknown_origins(self, client):
+        """Routes that used to add * themselves now follow the allow-list"""
+        mock_db = MagicMock()
+        mock_db.collection.return_value.order_by.return_value.limit.return_value.stream.return_value = []
+
+        with patch('main.get_db', return_value=mock_db):
+            response = client.get('/api/contacts', headers={'Origin': 'https://blog.example'})
+
+        assert response.status_code == 200
+        assert 'Access-Control-Allow-Origin' not in response.headers
@@ -0,0 +1,167 @@
+"""
+Integration tests for the reports dashboard
+Tests that the counters come from count() aggregations and that the dashboard
+snapshot is cached until a booking, inventory or review write invalidates it
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+import asyncio
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+
+@pytest.fixture
+def routers(in_memory_db):
+    """reports, reviews and inventory routers bound to the in-memory Firestore stand-in"""
+    with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+        import routers.reports as reports
+        import routers.reviews as reviews
+        import routers.inventory as inventory
+        with patch.object(reports, 'db', in_memory_db), \
+             patch.object(reviews, 'db', in_memory_db), \
+             patch.object(inventory, 'db', in_memory_db):
+            yield reports, reviews, inventory
+
+
+@pytest.fixture
+def dashboard_db(in_memory_db):
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    bookings = [
+        ("today-1", today + timedelta(hours=9), today + timedelta(days=3, hours=15), "confirmed"),
+        ("today-2", today + timedelta(hours=10), today + timedelta(days=2, hours=15), "pending"),
+        ("old-1", today - timedelta(days=20), today + timedelta(days=7, hours=12), "confirmed"),
+        ("old-2", today - timedelta(days=30), today + timedelta(days=10), "confirmed")
+    ]
+    for booking_id, created_at, event_date, booking_status in bookings:
+        in_memory_db.collection("bookings").document(booking_id).set({
+            "id": booking_id,
+            "client_email": f"{booking_id}@example.com",
+            "created_at": created_at,
+            "event_date": event_date,
+            "status": booking_status
+        })
+    for item_id, stock in (("harina", 2), ("queso", 1), ("salsa", 40)):
+        in_memory_db.collection("inventory").document(item_id).set({
+            "id": item_id,
+            "name": item_id,
+            "current_stock": stock,
+            "min_stock": 5,
+            "needs_restock": stock <= 5
+        })
+    for review_id, approved in (("review-1", True), ("review-2", False), ("review-3", False)):
+        in_memory_db.collection("reviews").document(review_id).set({
+            "id": review_id,
+            "rating": 5,
+            "is_approved": approved
+        })
+    return in_memory_db
+
+
+class TestDashboardStats:
+    """Dashboard counters and snapshot cache"""
+
+    @pytest.mark.integration
+    def test_counters(self, routers, dashboard_db):
+        """Today's bookings, confirmed events in the next week, low stock and pending reviews"""
+        reports, _, _ = routers
+
+        stats = asyncio.run(reports.get_dashboard_stats())
+
+        assert stats["today"]["new_bookings"] == 2
+        assert stats["upcoming_events"] == 2
+        assert stats["alerts"] == {"low_stock_items": 2, "pending_reviews": 2}
+
+    @pytest.mark.integration
+    def test_snapshot_is_cached(self, routers, dashboard_db):
+        """A second load within the TTL does not touch Firestore"""
+        reports, _, _ = routers
+
+        first = asyncio.run(reports.get_dashboard_stats())
+        dashboard_db.round_trips = 0
+        second = asyncio.run(reports.get_dashboard_stats())
+
+        assert second == first
+        assert dashboard_db.round_trips == 0
+
+    @pytest.mark.integration
+    def test_writes_invalidate_the_snapshot(self, routers, dashboard_db):
+        """Approving a review and restocking an item are visible on the next load"""
+        reports, reviews, inventory = routers
+        asyncio.run(reports.get_dashboard_stats())
+
+        asyncio.run(reviews.approve_review("review-2"))
+        assert asyncio.run(reports.get_dashboard_stats())["alerts"]["pending_reviews"] == 1
+
+        asyncio.run(inventory.update_stock("queso", 30))
+        assert asyncio.run(reports.get_dashboard_stats())["alerts"]["low_stock_items"] == 1
+
+    @pytest.mark.integration
+    def test_booking_write_invalidates_the_snapshot(self, routers, dashboard_db, client, mock_environment_variables):
+        """Confirming a booking through the Flask API refreshes the upcoming events count"""
+        reports, _, _ = routers
+        asyncio.run(reports.get_dashboard_stats())
+
+        with patch('main.get_db', return_value=dashboard_db), \
+             patch('main.send_confirmation_email', return_value=True):
+            response = client.put('/api/bookings/today-2', json={"status": "confirmed"})
+
+        assert response.status_code == 200
+        assert asyncio.run(reports.get_dashboard_stats())["upcoming_events"] == 3
+
+
+class TestDashboardFanOut:
+    """Dashboard sub-queries run concurrently with a timeout each"""
+
+    @pytest.mark.integration
+    def test_queries_overlap(self, routers, dashboard_db):
+        """With 100 ms per round trip the five queries take about one round trip, not five"""
+        reports, _, _ = routers
+        dashboard_db.latency = 0.1
+
+        start = time.perf_counter()
+        stats = asyncio.run(reports.get_dashboard_stats())
+        elapsed = time.perf_counter() - start
+
+        assert "errors" not in stats
+        assert dashboard_db.round_trips >= 5
+        assert elapsed < 0.3
+
+    @pytest.mark.integration
+    def test_slow_query_returns_partial_result(self, routers, dashboard_db):
+        """A sub-query over the timeout is marked and the rest of the dashboard is served uncached"""
+        reports, _, _ = routers
+
+        async def slow_report(year, month):
+            time.sleep(0.5)
+
+        with patch.object(reports, 'get_monthly_report', slow_report), \
+             patch('services.batch_read_service.FANOUT_TIMEOUT_SECONDS', 0.1):
+            stats = asyncio.run(reports.get_dashboard_stats())
+
+        assert stats["errors"] == {"current_month": "timeout after 0.1s"}
+        assert stats["current_month"]["income"] is None
+        assert stats["alerts"] == {"low_stock_items": 2, "pending_reviews": 2}
+        assert reports.public_cache.get("dashboard") is None
+
+    @pytest.mark.integration
+    def test_failed_query_is_marked(self, routers, dashboard_db):
+        """An exception in one sub-query becomes its error marker"""
+        reports, _, _ = routers
+        collection = dashboard_db.collection
+
+        def unavailable_inventory(path):
+            if path == "inventory":
+                raise RuntimeError("inventory unavailable")
+            return collection(path)
+
+        with patch.object(dashboard_db, 'collection', side_effect=unavailable_inventory):
+            stats = asyncio.run(reports.get_dashboard_stats())
+
+        assert stats["errors"] == {"low_stock_items": "inventory unavailable"}
+        assert stats["alerts"]["low_stock_items"] is None
+        assert stats["upcoming_events"] == 2
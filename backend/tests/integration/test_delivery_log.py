@@ -0,0 +1,297 @@
+"""
+Integration tests for the delivery log buffer
+Tests that notification and email log records are written in WriteBatch
+commits of at most 500, flushed on a size or time threshold, at the end of
+each unit of work (HTTP request, bulk send checkpoint, scheduler run), at
+close and on SIGTERM, kept for the next flush when a commit fails, and
+dropped when they keep failing or the buffer is full
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime
+import asyncio
+import signal
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.delivery_log_service import DeliveryLogBuffer
+from tests.in_memory_reminder_queue import InMemoryReminderQueue
+
+
+class RecordingBatch:
+    """WriteBatch wrapper that reports its size on commit and can fail"""
+
+    def __init__(self, db, batch):
+        self.db = db
+        self.batch = batch
+        self.size = 0
+        self.document_ids = []
+
+    def set(self, reference, data):
+        self.size += 1
+        self.document_ids.append(reference.id)
+        self.batch.set(reference, data)
+
+    def commit(self):
+        self.db.attempts += 1
+        if self.db.attempts in self.db.failing_attempts or self.db.failing_all:
+            raise RuntimeError("Firestore unavailable")
+        if self.db.rejected.intersection(self.document_ids):
+            raise ValueError("Invalid document")
+        self.batch.commit()
+        self.db.commits.append(self.size)
+        self.db.committed += self.document_ids
+
+
+class RecordingDB:
+    """In-memory Firestore whose write batches are counted; the listed commit attempts fail,
+    and so does every batch with a rejected document"""
+
+    def __init__(self, db, failing_attempts=(), rejected=(), failing_all=False):
+        self.db = db
+        self.failing_attempts = set(failing_attempts)
+        self.rejected = set(rejected)
+        self.failing_all = failing_all
+        self.attempts = 0
+        self.commits = []
+        self.committed = []
+
+    def collection(self, path):
+        return self.db.collection(path)
+
+    def batch(self):
+        return RecordingBatch(self, self.db.batch())
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def log_count(db, collection):
+    return sum(1 for _ in db.collection(collection).stream())
+
+
+class TestDeliveryLogBuffer:
+    """DeliveryLogBuffer against the in-memory Firestore stand-in"""
+
+    @pytest.mark.integration
+    def test_flush_commits_in_batches_of_500(self, in_memory_db):
+        db = RecordingDB(in_memory_db)
+        buffer = DeliveryLogBuffer(lambda: db, max_records=10000, flush_seconds=60)
+        for i in range(1200):
+            buffer.log("notifications", {"n": i})
+
+        assert buffer.flush() == 1200
+        assert db.commits == [500, 500, 200]
+        assert log_count(in_memory_db, "notifications") == 1200
+        buffer.close()
+
+    @pytest.mark.integration
+    def test_size_threshold_flushes_in_background(self, in_memory_db):
+        db = RecordingDB(in_memory_db)
+        buffer = DeliveryLogBuffer(lambda: db, max_records=10, flush_seconds=60)
+        for i in range(10):
+            buffer.log("emails", {"n": i})
+
+        assert wait_until(lambda: buffer.pending() == 0)
+        assert db.commits == [10]
+        buffer.close()
+
+    @pytest.mark.integration
+    def test_time_threshold_flushes_in_background(self, in_memory_db):
+        db = RecordingDB(in_memory_db)
+        buffer = DeliveryLogBuffer(lambda: db, max_records=1000, flush_seconds=0.1)
+        start = time.monotonic()
+        buffer.log("emails", {"n": 1})
+        buffer.log("emails", {"n": 2})
+
+        assert wait_until(lambda: buffer.pending() == 0)
+        assert time.monotonic() - start >= 0.1
+        assert db.commits == [2]
+        buffer.close()
+
+    @pytest.mark.integration
+    def test_failed_commit_keeps_records_for_the_next_flush(self, in_memory_db):
+        """A failing commit loses nothing and the retry does not duplicate the committed chunk"""
+        db = RecordingDB(in_memory_db, failing_attempts={2})
+        buffer = DeliveryLogBuffer(lambda: db, max_records=10000, flush_seconds=60)
+        for i in range(700):
+            buffer.log("notifications", {"n": i}, document_id=f"SM{i}")
+
+        assert buffer.flush() == 500
+        assert buffer.pending() == 200
+
+        assert buffer.flush() == 200
+        assert buffer.pending() == 0
+        assert db.commits == [500, 200]
+        assert log_count(in_memory_db, "notifications") == 700
+        buffer.close()
+
+    @pytest.mark.integration
+    def test_record_that_cannot_be_written_is_dropped_without_blocking_the_rest(self, in_memory_db):
+        """After two failed batches the records go one by one; the bad one is dropped after max_attempts"""
+        db = RecordingDB(in_memory_db, rejected={"SM2"})
+        buffer = DeliveryLogBuffer(lambda: db, max_records=1000, flush_seconds=60, max_attempts=3)
+        for i in range(5):
+            buffer.log("notifications", {"n": i}, document_id=f"SM{i}")
+
+        assert [buffer.flush() for _ in range(4)] == [0, 0, 2, 2]
+        assert db.commits == [1, 1, 1, 1]
+        assert buffer.pending() == 0
+        assert buffer.dropped() == 1
+        assert db.committed == ["SM0", "SM1", "SM3", "SM4"]
+        buffer.close()
+
+    @pytest.mark.integration
+    def test_buffer_is_capped_while_firestore_is_down(self, in_memory_db):
+        """The oldest records are dropped once the buffer is full, also when a failed flush puts them back"""
+        db = RecordingDB(in_memory_db, failing_all=True)
+        buffer = DeliveryLogBuffer(lambda: db, max_records=1000, flush_seconds=60, max_buffered=3)
+        for i in range(5):
+            buffer.log("emails", {"n": i})
+        assert (buffer.pending(), buffer.dropped()) == (3, 2)
+
+        assert buffer.flush() == 0
+        buffer.log("emails", {"n": 5})
+        assert (buffer.pending(), buffer.dropped()) == (3, 3)
+        assert [data["n"] for _, _, data, _ in buffer._records] == [3, 4, 5]
+
+        db.failing_all = False
+        assert buffer.close() == 3
+
+    @pytest.mark.integration
+    def test_close_writes_what_is_left(self, in_memory_db):
+        db = RecordingDB(in_memory_db)
+        buffer = DeliveryLogBuffer(lambda: db, max_records=1000, flush_seconds=60)
+        buffer.log("emails", {"n": 1})
+
+        assert buffer.close() == 1
+        buffer.log("emails", {"n": 2})
+
+        assert log_count(in_memory_db, "emails") == 2
+        assert buffer.pending() == 0
+
+
+class TestNotificationLogging:
+
+    @pytest.mark.integration
+    def test_whatsapp_send_logs_through_the_buffer(self, in_memory_db):
+        """The send itself does not write to Firestore; the record appears once the buffer flushes"""
+        import services.notification_service as notification_service
+
+        class Sender:
+            async def send(self, to, body):
+                return {"sid": "SM123", "status": "queued"}
+
+        buffer = DeliveryLogBuffer(lambda: in_memory_db, max_records=1000, flush_seconds=60)
+        with patch.object(notification_service, 'sender', Sender()), \
+             patch.object(notification_service, 'delivery_log', buffer):
+            assert asyncio.run(notification_service.send_whatsapp_notification("912345678", "Hola", "test"))
+
+        assert log_count(in_memory_db, "notifications") == 0
+        buffer.close()
+        record = in_memory_db.collection("notifications").document("SM123").get().to_dict()
+        assert record["recipient_phone"] == "whatsapp:+56912345678"
+        assert record["status"] == "sent"
+
+
+class TestUnitOfWorkFlush:
+    """Records are written before the invocation ends, without waiting for the background thread"""
+
+    @pytest.fixture
+    def buffer(self, in_memory_db):
+        # A long flush interval: only the unit-of-work flushes can write in time
+        buffer = DeliveryLogBuffer(lambda: in_memory_db, max_records=1000, flush_seconds=60)
+        yield buffer
+        buffer.close()
+
+    @pytest.mark.integration
+    def test_flask_request_flushes(self, client, buffer, in_memory_db):
+        with patch('main.delivery_log', buffer):
+            buffer.log("emails", {"n": 1})
+            client.get('/api/unknown')
+
+        assert buffer.pending() == 0
+        assert log_count(in_memory_db, "emails") == 1
+
+    @pytest.mark.integration
+    def test_fastapi_request_flushes(self, buffer, in_memory_db):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        import services.notification_service as notification_service
+
+        with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+            import routers.notifications as notifications
+
+        class Sender:
+            async def send(self, to, body):
+                return {"sid": "SM1", "status": "queued"}
+
+        app = FastAPI()
+        app.include_router(notifications.router, prefix="/notifications")
+        with patch.object(notification_service, 'sender', Sender()), \
+             patch.object(notification_service, 'delivery_log', buffer), \
+             patch('services.delivery_log_service.delivery_log', buffer):
+            response = TestClient(app).post('/notifications/send', json={
+                "recipient_phone": "912345678", "message": "Hola", "notification_type": "test"
+            })
+
+        assert response.status_code == 200
+        assert buffer.pending() == 0
+        assert in_memory_db.collection("notifications").document("SM1").get().exists
+
+    @pytest.mark.integration
+    def test_bulk_send_checkpoints_flush(self, buffer, in_memory_db):
+        import services.bulk_send_service as bulk_send_service
+
+        job = bulk_send_service.create_bulk_job(in_memory_db, "Hola", "promo", ["+56911111111", "+56922222222"])
+
+        async def send(phone, message, notification_type):
+            buffer.log("notifications", {"recipient_phone": phone})
+            return True
+
+        with patch.object(bulk_send_service, 'delivery_log', buffer):
+            asyncio.run(bulk_send_service.BulkSendRunner(in_memory_db, send, rate=1000, burst=1000).run(job["id"]))
+
+        assert buffer.pending() == 0
+        assert log_count(in_memory_db, "notifications") == 2
+
+    @pytest.mark.integration
+    def test_reminder_run_flushes(self, buffer, in_memory_db):
+        import services.reminder_service as reminder_service
+
+        now = datetime(2025, 10, 14, 15, 0)
+        queue = InMemoryReminderQueue()
+        queue.schedule("booking-1", now)
+
+        async def send(booking_id):
+            buffer.log("notifications", {"booking_id": booking_id})
+            return True
+
+        with patch.object(reminder_service, 'delivery_log', buffer):
+            asyncio.run(reminder_service.ReminderScheduler(queue, send, send_interval=0, clock=lambda: now).run_due())
+
+        assert buffer.pending() == 0
+        assert log_count(in_memory_db, "notifications") == 1
+
+    @pytest.mark.integration
+    def test_sigterm_closes_the_buffer_then_runs_the_previous_handler(self, buffer, in_memory_db):
+        received = []
+        original = signal.signal(signal.SIGTERM, lambda signum, frame: received.append(signum))
+        try:
+            assert buffer.install_sigterm_handler()
+            buffer.log("emails", {"n": 1})
+            os.kill(os.getpid(), signal.SIGTERM)
+            assert wait_until(lambda: received)
+        finally:
+            signal.signal(signal.SIGTERM, original)
+
+        assert received == [signal.SIGTERM]
+        assert log_count(in_memory_db, "emails") == 1
@@ -0,0 +1,150 @@
+"""
+Integration tests for the monthly report
+Tests that the reports are read from the monthly rollups so the number of
+Firestore round trips does not grow with the number of events in the month
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime
+import asyncio
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.client_index_service import rebuild_client_index
+from services.rollup_service import rebuild_rollups
+
+
+@pytest.fixture
+def reports(in_memory_db):
+    """routers.reports bound to the in-memory Firestore stand-in"""
+    with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+        import routers.reports as reports
+        with patch.object(reports, 'db', in_memory_db):
+            yield reports
+
+
+def seed_month(db, events, year=2025, month=10):
+    """`events` completed events in the month, two thirds of them workshops"""
+    for i in range(events):
+        booking_id = f"booking-{i:03d}"
+        db.collection("bookings").document(booking_id).set({
+            "id": booking_id,
+            "client_email": f"cliente{i}@example.com",
+            "service_type": "workshop" if i % 3 else "pizza_party",
+            "event_date": datetime(year, month, 1 + i % 28, 15, 0)
+        })
+        db.collection("events").document(f"event-{i:03d}").set({
+            "id": f"event-{i:03d}",
+            "booking_id": booking_id,
+            "start_time": datetime(year, month, 1 + i % 28, 15, 0),
+            "actual_participants": 10,
+            "financials": {"income": 100000.0, "total_expenses": 40000.0}
+        })
+    rebuild_client_index(db)
+    rebuild_rollups(db)
+
+
+class TestMonthlyReport:
+    """Monthly report aggregation and Firestore round trips"""
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize("events", [3, 90])
+    def test_round_trips_do_not_grow_with_events(self, reports, in_memory_db, events):
+        """Month rollup read + month bookings and client index reads"""
+        seed_month(in_memory_db, events)
+        in_memory_db.round_trips = 0
+
+        report = asyncio.run(reports.get_monthly_report(2025, 10))
+
+        assert in_memory_db.round_trips == 3
+        assert report.total_events == events
+        assert report.total_income == 100000.0 * events
+        assert report.total_profit == 60000.0 * events
+        assert report.avg_participants == 10.0
+
+    @pytest.mark.integration
+    def test_service_counts_join_bookings(self, reports, in_memory_db):
+        """The most popular service comes from the joined bookings"""
+        seed_month(in_memory_db, 9)
+        in_memory_db.collection("events").document("event-orphan").set({
+            "id": "event-orphan",
+            "booking_id": "missing-booking",
+            "start_time": datetime(2025, 10, 30, 12, 0),
+            "actual_participants": 10,
+            "financials": {"income": 0.0, "total_expenses": 0.0}
+        })
+        rebuild_rollups(in_memory_db)
+
+        report = asyncio.run(reports.get_monthly_report(2025, 10))
+
+        assert report.total_events == 10
+        assert report.most_popular_service == "workshop"
+
+
+def seed_year(db, year=2025):
+    """Events across the year, repeat clients and a client from the previous year"""
+    clients = [f"cliente{n}@example.com" for n in range(9)]
+    db.collection("bookings").document("booking-old").set({
+        "id": "booking-old",
+        "client_email": "cliente8@example.com",
+        "service_type": "pizza_party",
+        "event_date": datetime(year - 1, 12, 10, 15, 0)
+    })
+    for i in range(40):
+        month = 1 + (i * 7) % 12
+        booking_id = f"booking-{i:03d}"
+        db.collection("bookings").document(booking_id).set({
+            "id": booking_id,
+            "client_email": clients[i % len(clients)],
+            "service_type": "workshop" if i % 4 else "pizza_party",
+            "event_date": datetime(year, month, 1 + i % 28, 15, 0)
+        })
+        db.collection("events").document(f"event-{i:03d}").set({
+            "id": f"event-{i:03d}",
+            "booking_id": booking_id,
+            "start_time": datetime(year, month, 1 + i % 28, 15, 0),
+            "actual_participants": 8 + i % 5,
+            "financials": {"income": 90000.0 + i * 1000, "total_expenses": 30000.0 + i * 250}
+        })
+    rebuild_client_index(db)
+    rebuild_rollups(db)
+
+
+class TestAnnualSummary:
+    """Annual summary from the monthly rollups"""
+
+    @pytest.mark.integration
+    def test_matches_twelve_monthly_reports(self, reports, in_memory_db):
+        """Same output as building the year from get_monthly_report month by month"""
+        seed_year(in_memory_db)
+
+        summary = asyncio.run(reports.get_annual_summary(2025))
+        expected = [asyncio.run(reports.get_monthly_report(2025, month)).model_dump() for month in range(1, 13)]
+
+        assert summary["monthly_reports"] == expected
+        assert summary["annual_totals"]["total_events"] == 40
+        assert summary["annual_totals"]["total_profit"] == pytest.approx(
+            sum(report["total_profit"] for report in expected)
+        )
+
+    @pytest.mark.integration
+    def test_one_query_per_collection(self, reports, in_memory_db):
+        """Month rollups, bookings of the year and their client index entries: three round trips"""
+        seed_year(in_memory_db)
+        in_memory_db.round_trips = 0
+
+        asyncio.run(reports.get_annual_summary(2025))
+
+        assert in_memory_db.round_trips == 3
+
+    @pytest.mark.integration
+    def test_empty_year(self, reports, in_memory_db):
+        """A year without events keeps the twelve empty months"""
+        summary = asyncio.run(reports.get_annual_summary(2030))
+
+        assert len(summary["monthly_reports"]) == 12
+        assert all(report["most_popular_service"] == "N/A" for report in summary["monthly_reports"])
+        assert summary["annual_totals"]["total_events"] == 0
@@ -0,0 +1,154 @@
+"""
+Integration tests for the notification outbox
+Tests that booking creation only writes to Firestore and that the worker delivers
+queued notifications with retries
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+from datetime import datetime, timedelta
+import threading
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.common import utc_now
+from services.outbox_service import OutboxWorker, enqueue_notification, OUTBOX_COLLECTION
+from tests.in_memory_firestore import InMemoryDocumentReference
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = utc_now()
+
+    def __call__(self):
+        return self.now
+
+
+def outbox_jobs(db):
+    return [doc.to_dict() for doc in db.collection(OUTBOX_COLLECTION).stream()]
+
+
+class TestNotificationOutbox:
+    """Booking POST + outbox worker"""
+
+    @pytest.mark.integration
+    def test_create_booking_enqueues_without_sending(self, client, in_memory_db, mock_environment_variables):
+        """The booking and its three notification jobs are written together; nothing is sent inline"""
+        with patch('main.get_db', return_value=in_memory_db), \
+             patch('main.send_admin_email_notification') as mock_email, \
+             patch('main.send_whatsapp_notification') as mock_whatsapp:
+            response = client.post('/api/bookings/', json={
+                "service_type": "workshop",
+                "participants": 10,
+                "client_name": "Test Client",
+                "client_phone": "+56912345678",
+                "event_date": "2025-10-15"
+            })
+
+        assert response.status_code == 201
+        booking = json.loads(response.data)
+        mock_email.assert_not_called()
+        mock_whatsapp.assert_not_called()
+
+        assert in_memory_db.collection("bookings").document(booking["id"]).get().exists
+        jobs = outbox_jobs(in_memory_db)
+        assert sorted(job["channel"] for job in jobs) == ["admin_email", "whatsapp", "whatsapp"]
+        assert all(job["booking_id"] == booking["id"] and job["status"] == "pending" for job in jobs)
+        phones = {job["payload"].get("phone") for job in jobs if job["channel"] == "whatsapp"}
+        assert phones == {"+56989424566", "+56961093818"}
+
+    @pytest.mark.integration
+    def test_worker_retries_with_backoff_then_delivers(self, in_memory_db):
+        """A failing provider is retried after the backoff; success marks the job sent"""
+        clock = FakeClock()
+        attempts = []
+
+        def flaky_whatsapp(payload):
+            attempts.append(payload["phone"])
+            return len(attempts) > 1
+
+        batch = in_memory_db.batch()
+        job = enqueue_notification(in_memory_db, batch, "whatsapp", {"phone": "+56911111111"}, "booking-1")
+        batch.commit()
+        clock.now = utc_now()
+
+        worker = OutboxWorker(in_memory_db, {"whatsapp": flaky_whatsapp}, base_backoff_seconds=30, clock=clock)
+
+        assert worker.drain() == {"processed": 1, "sent": 0, "retried": 1, "failed": 0}
+        assert worker.drain()["processed"] == 0, "Job must wait for its backoff"
+
+        clock.now += timedelta(seconds=31)
+        assert worker.drain() == {"processed": 1, "sent": 1, "retried": 0, "failed": 0}
+
+        stored = in_memory_db.collection(OUTBOX_COLLECTION).document(job["id"]).get().to_dict()
+        assert stored["status"] == "sent"
+        assert stored["attempts"] == 2
+        assert attempts == ["+56911111111", "+56911111111"]
+
+    @pytest.mark.integration
+    def test_worker_gives_up_after_max_attempts(self, in_memory_db):
+        """Jobs that keep failing are marked failed and no longer picked up"""
+        clock = FakeClock()
+        failing = MagicMock(side_effect=RuntimeError("SMTP down"))
+
+        in_memory_db.collection(OUTBOX_COLLECTION).document("job-1").set({
+            "id": "job-1", "channel": "admin_email", "payload": {}, "status": "pending",
+            "attempts": 0, "next_attempt_at": clock.now
+        })
+        worker = OutboxWorker(in_memory_db, {"admin_email": failing}, max_attempts=2,
+                              base_backoff_seconds=10, clock=clock)
+
+        worker.drain()
+        clock.now += timedelta(seconds=11)
+        assert worker.drain()["failed"] == 1
+
+        clock.now += timedelta(days=1)
+        assert worker.drain()["processed"] == 0
+        stored = in_memory_db.collection(OUTBOX_COLLECTION).document("job-1").get().to_dict()
+        assert stored["status"] == "failed"
+        assert stored["last_error"] == "SMTP down"
+        assert failing.call_count == 2
+
+    @pytest.mark.integration
+    def test_racing_workers_send_a_job_once(self, in_memory_db):
+        """Two deliveries of the creation trigger both read the pending job; only one claim commits"""
+        delivered = []
+        batch = in_memory_db.batch()
+        job = enqueue_notification(in_memory_db, batch, "whatsapp", {"phone": "+56911111111"}, "booking-1")
+        batch.commit()
+
+        # Hold the first two reads of the job until both have happened
+        both_read = threading.Barrier(2)
+        first_reads = iter(range(2))
+        original_get = InMemoryDocumentReference.get
+
+        def get_together(self, transaction=None):
+            snapshot = original_get(self, transaction=transaction)
+            if next(first_reads, None) is not None:
+                both_read.wait(timeout=5)
+            return snapshot
+
+        def whatsapp(payload):
+            delivered.append(payload["phone"])
+            return True
+
+        results = []
+        workers = [OutboxWorker(in_memory_db, {"whatsapp": whatsapp}) for _ in range(2)]
+        with patch.object(InMemoryDocumentReference, 'get', get_together):
+            threads = [threading.Thread(target=lambda w=worker: results.append(w.process_job(job["id"])))
+                       for worker in workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=10)
+
+        assert delivered == ["+56911111111"]
+        assert sorted(results) == ["sent", "skipped"]
+        stored = in_memory_db.collection(OUTBOX_COLLECTION).document(job["id"]).get().to_dict()
+        assert stored["status"] == "sent"
+        assert stored["attempts"] == 1
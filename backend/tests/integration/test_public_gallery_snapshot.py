@@ -0,0 +1,147 @@
+"""
+Integration tests for the materialized public gallery
+Tests that /api/gallery/public is served from the public_gallery snapshot,
+that photo and event writes keep it up to date incrementally and that a
+rebuild sizes its shards by payload and removes the ones left over
+"""
+import pytest
+from unittest.mock import patch
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.gallery_snapshot_service import PublicGallerySnapshot, PUBLIC_GALLERY_COLLECTION
+
+
+@pytest.fixture
+def gallery_db(in_memory_db):
+    """Two completed events with published photos and one still unpublished"""
+    for event_id, title in (("event-a", "Cumpleaños Sofía"), ("event-b", "Taller Colegio")):
+        in_memory_db.collection("events").document(event_id).set({
+            "id": event_id,
+            "title": title,
+            "status": "completed",
+            "participants": 20,
+            "event_date": "2025-10-15" if event_id == "event-a" else "2025-10-20"
+        })
+    photos = [
+        ("photo-a1", "event-a", True),
+        ("photo-a2", "event-a", True),
+        ("photo-b1", "event-b", True),
+        ("photo-b2", "event-b", False)
+    ]
+    for photo_id, event_id, published in photos:
+        in_memory_db.collection("gallery").document(photo_id).set({
+            "id": photo_id,
+            "event_id": event_id,
+            "url": f"https://storage.example.com/{photo_id}.jpg",
+            "is_published": published
+        })
+    return in_memory_db
+
+
+def public_gallery(client):
+    from services.cache_service import public_cache
+    public_cache.clear()
+    response = client.get('/api/gallery/public')
+    assert response.status_code == 200
+    return {event["id"]: event for event in json.loads(response.data)}
+
+
+class TestPublicGallerySnapshot:
+    """Materialized public gallery kept up to date by the write paths"""
+
+    @pytest.mark.integration
+    def test_served_from_a_single_read(self, client, gallery_db):
+        """The first request builds the snapshot; later ones read one document"""
+        with patch('main.get_db', return_value=gallery_db):
+            first = public_gallery(client)
+            gallery_db.round_trips = 0
+            second = public_gallery(client)
+
+        assert first == second
+        assert list(second) == ["event-b", "event-a"]
+        assert len(second["event-a"]["images"]) == 2
+        assert gallery_db.round_trips == 1
+
+    @pytest.mark.integration
+    def test_photo_publish_and_unpublish_update_the_snapshot(self, client, gallery_db):
+        """Publishing adds the photo to its event; unpublishing the last one drops the event"""
+        with patch('main.get_db', return_value=gallery_db):
+            public_gallery(client)
+
+            client.put('/api/gallery/photo-b2/publish', json={"is_published": True})
+            assert len(public_gallery(client)["event-b"]["images"]) == 2
+
+            client.put('/api/gallery/photo-b1/publish', json={"is_published": False})
+            client.put('/api/gallery/photo-b2/publish', json={"is_published": False})
+            assert "event-b" not in public_gallery(client)
+
+    @pytest.mark.integration
+    def test_event_update_refreshes_its_entry(self, client, gallery_db):
+        """Editing an event's title is reflected without a rebuild"""
+        with patch('main.get_db', return_value=gallery_db):
+            public_gallery(client)
+            client.put('/api/events/event-a', json={"title": "Cumpleaños Sofía (8 años)"})
+            client.put('/api/events/event-a/publish', json={"is_published": True})
+
+            assert public_gallery(client)["event-a"]["title"] == "Cumpleaños Sofía (8 años)"
+
+    @pytest.mark.integration
+    def test_sharded_incremental_matches_rebuild(self, gallery_db):
+        """With several shards, incremental updates end in the same state as a rebuild"""
+        snapshot = PublicGallerySnapshot(gallery_db, shards=4)
+        snapshot.rebuild()
+
+        gallery_db.collection("gallery").document("photo-b2").update({"is_published": True})
+        snapshot.refresh_event("event-b")
+        incremental = snapshot.read()
+
+        assert snapshot.rebuild() == incremental
+        assert len(list(gallery_db.collection(PUBLIC_GALLERY_COLLECTION).stream())) == 4
+
+    @pytest.mark.integration
+    def test_rebuild_command(self, flask_app, gallery_db):
+        """flask rebuild-public-gallery regenerates the snapshot"""
+        with patch('main.get_db', return_value=gallery_db):
+            result = flask_app.test_cli_runner().invoke(args=['rebuild-public-gallery'])
+
+        assert result.exit_code == 0
+        assert "2 events" in result.output
+        assert PublicGallerySnapshot(gallery_db).read() is not None
+
+    @pytest.mark.integration
+    def test_shard_count_follows_the_payload(self, gallery_db):
+        """A payload over PUBLIC_GALLERY_SHARD_BYTES is spread over more shards, and they all stay readable"""
+        with patch('services.gallery_snapshot_service.PUBLIC_GALLERY_SHARD_BYTES', 400):
+            gallery = PublicGallerySnapshot(gallery_db).rebuild()
+
+        shards = {doc.id: doc.to_dict() for doc in gallery_db.collection(PUBLIC_GALLERY_COLLECTION).stream()}
+        assert len(shards) == shards["shard-00"]["shards"] > 1
+        assert PublicGallerySnapshot(gallery_db).read() == gallery
+
+        gallery_db.collection("gallery").document("photo-b2").update({"is_published": True})
+        PublicGallerySnapshot(gallery_db).refresh_event("event-b")
+        assert len(next(e for e in PublicGallerySnapshot(gallery_db).read() if e["id"] == "event-b")["images"]) == 2
+
+    @pytest.mark.integration
+    def test_rebuild_deletes_leftover_shards(self, gallery_db):
+        """Shrinking from four shards to one removes shard-01..03 instead of leaving stale copies"""
+        PublicGallerySnapshot(gallery_db, shards=4).rebuild()
+        gallery_db.collection("events").document("event-b").update({"status": "cancelled"})
+
+        PublicGallerySnapshot(gallery_db, shards=1).rebuild()
+
+        assert [doc.id for doc in gallery_db.collection(PUBLIC_GALLERY_COLLECTION).stream()] == ["shard-00"]
+        assert [event["id"] for event in PublicGallerySnapshot(gallery_db, shards=4).read()] == ["event-a"]
+
+    @pytest.mark.integration
+    def test_rebuild_is_not_exposed_over_http(self, client, gallery_db):
+        with patch('main.get_db', return_value=gallery_db):
+            response = client.post('/api/gallery/public/rebuild')
+
+        assert response.status_code in (404, 405)
+        assert PublicGallerySnapshot(gallery_db).read() is None
@@ -0,0 +1,240 @@
+"""
+Integration tests for the booking reminder scheduler
+Tests that confirming a booking enqueues a reminder about 24 hours before the
+event, that date and status changes move or drop it, and that the scheduler
+sends each due reminder exactly once, spaced out
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+import asyncio
+import json
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.reminder_service import (
+    REMINDER_LEAD_HOURS, REMINDER_MAX_ATTEMPTS, REMINDER_RETRY_MINUTES, REMINDER_SPREAD_MINUTES,
+    FirestoreReminderQueue, ReminderScheduler, backfill_reminder_queue, event_start, record_booking_reminder
+)
+from tests.in_memory_reminder_queue import InMemoryReminderQueue
+
+
+class RecordingReminderSender:
+    """Async send_booking_reminder stand-in that records the booking ids and send times"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+        self.times = []
+
+    async def __call__(self, booking_id):
+        self.calls.append(booking_id)
+        self.times.append(time.perf_counter())
+        return booking_id not in self.failing
+
+
+@pytest.fixture
+def booking_client(client, in_memory_db, mock_environment_variables):
+    with patch('main.get_db', return_value=in_memory_db), \
+         patch('main.send_confirmation_email', return_value=True):
+        yield client
+
+
+def post_booking(client, event_date, event_time="15:00"):
+    response = client.post('/api/bookings/', json={
+        "service_type": "workshop",
+        "participants": 10,
+        "client_name": "Test Client",
+        "client_email": "ana@example.com",
+        "client_phone": "+56912345678",
+        "event_date": event_date,
+        "event_time": event_time
+    })
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+
+def update(client, booking, **data):
+    response = client.put(f"/api/bookings/{booking['id']}", json=data)
+    assert response.status_code == 200
+
+
+def day(days):
+    return (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def assert_around_lead_time(entry, start):
+    lead = start - entry["due_at"]
+    assert timedelta(hours=REMINDER_LEAD_HOURS) <= lead <= timedelta(hours=REMINDER_LEAD_HOURS, minutes=REMINDER_SPREAD_MINUTES)
+
+
+class TestReminderQueueOnBookingWrites:
+    """reminder_queue/{booking_id}"""
+
+    @pytest.mark.integration
+    def test_confirming_enqueues_about_a_day_before(self, booking_client, in_memory_db):
+        booking = post_booking(booking_client, day(10))
+        queue = FirestoreReminderQueue(in_memory_db)
+        assert queue.get(booking["id"]) is None
+
+        update(booking_client, booking, status="confirmed")
+
+        entry = queue.get(booking["id"])
+        start = datetime.strptime(f"{day(10)} 15:00", '%Y-%m-%d %H:%M')
+        assert entry["status"] == "scheduled"
+        assert entry["event_start"] == start
+        assert_around_lead_time(entry, start)
+
+    @pytest.mark.integration
+    def test_date_change_moves_the_entry(self, booking_client, in_memory_db):
+        booking = post_booking(booking_client, day(10))
+        update(booking_client, booking, status="confirmed")
+
+        update(booking_client, booking, confirmed_date=day(12), confirmed_time="11:30")
+
+        entry = FirestoreReminderQueue(in_memory_db).get(booking["id"])
+        start = datetime.strptime(f"{day(12)} 11:30", '%Y-%m-%d %H:%M')
+        assert entry["event_start"] == start
+        assert_around_lead_time(entry, start)
+
+    @pytest.mark.integration
+    def test_cancelling_drops_the_entry(self, booking_client, in_memory_db):
+        booking = post_booking(booking_client, day(10))
+        update(booking_client, booking, status="confirmed")
+
+        update(booking_client, booking, status="cancelled")
+
+        assert FirestoreReminderQueue(in_memory_db).get(booking["id"]) is None
+
+    @pytest.mark.integration
+    def test_unrelated_update_keeps_a_sent_reminder(self, booking_client, in_memory_db):
+        """Editing notes after the reminder went out does not schedule it again"""
+        booking = post_booking(booking_client, day(10))
+        update(booking_client, booking, status="confirmed")
+        in_memory_db.collection("reminder_queue").document(booking["id"]).update({"status": "sent"})
+
+        update(booking_client, booking, notes="Traer delantales")
+
+        assert FirestoreReminderQueue(in_memory_db).get(booking["id"])["status"] == "sent"
+
+    @pytest.mark.integration
+    def test_late_confirmation_is_due_now(self, in_memory_db):
+        """Confirmed less than a day ahead: the reminder goes out on the next run"""
+        now = datetime(2025, 10, 14, 18, 0)
+        booking = {"status": "confirmed", "event_date": "2025-10-15", "event_time": "12:00"}
+        batch = in_memory_db.batch()
+        record_booking_reminder(in_memory_db, batch, "late", booking, previous={**booking, "status": "pending"}, now=now)
+        batch.commit()
+
+        assert FirestoreReminderQueue(in_memory_db).get("late")["due_at"] == now
+
+    @pytest.mark.integration
+    def test_backfill_enqueues_confirmed_bookings(self, in_memory_db):
+        in_memory_db.collection("bookings").document("old").set({
+            "status": "confirmed", "event_date": datetime.now() + timedelta(days=5), "event_time": "15:00"
+        })
+        in_memory_db.collection("bookings").document("past").set({
+            "status": "confirmed", "event_date": datetime.now() - timedelta(days=5), "event_time": "15:00"
+        })
+
+        assert backfill_reminder_queue(in_memory_db) == 1
+        assert backfill_reminder_queue(in_memory_db) == 0
+        assert FirestoreReminderQueue(in_memory_db).get("old")["status"] == "scheduled"
+
+
+class TestReminderScheduler:
+    """ReminderScheduler against the Firestore queue and the in-memory stand-in"""
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize("queue_kind", ["firestore", "in_memory"])
+    def test_fires_once_when_due(self, in_memory_db, queue_kind):
+        queue = FirestoreReminderQueue(in_memory_db) if queue_kind == "firestore" else InMemoryReminderQueue()
+        due_at = datetime(2025, 10, 14, 15, 0)
+        queue.schedule("booking-1", due_at)
+        sender = RecordingReminderSender()
+
+        def run_at(now):
+            return asyncio.run(ReminderScheduler(queue, sender, send_interval=0, clock=lambda: now).run_due())
+
+        assert run_at(due_at - timedelta(minutes=1)) == {"sent": 0, "failed": 0}
+        assert run_at(due_at + timedelta(minutes=2)) == {"sent": 1, "failed": 0}
+        assert run_at(due_at + timedelta(minutes=7)) == {"sent": 0, "failed": 0}
+        assert sender.calls == ["booking-1"]
+        assert queue.get("booking-1")["status"] == "sent"
+
+    @pytest.mark.integration
+    def test_due_entries_go_out_in_order_and_spaced(self):
+        queue = InMemoryReminderQueue()
+        now = datetime(2025, 10, 14, 15, 0)
+        for minutes in (5, 1, 3, 2, 4):
+            queue.schedule(f"booking-{minutes}", now - timedelta(minutes=minutes))
+        sender = RecordingReminderSender()
+
+        asyncio.run(ReminderScheduler(queue, sender, send_interval=0.05, clock=lambda: now).run_due())
+
+        assert sender.calls == [f"booking-{minutes}" for minutes in (5, 4, 3, 2, 1)]
+        gaps = [later - earlier for earlier, later in zip(sender.times, sender.times[1:])]
+        assert min(gaps) >= 0.05 * 0.9
+
+    @pytest.mark.integration
+    def test_a_claimed_entry_is_not_claimed_twice(self, in_memory_db):
+        """Two overlapping runs: only the first takes the entry until its lease expires"""
+        queue = FirestoreReminderQueue(in_memory_db)
+        now = datetime(2025, 10, 14, 15, 0)
+        queue.schedule("booking-1", now)
+
+        assert [entry["booking_id"] for entry in queue.claim_due(now, 10, 300)] == ["booking-1"]
+        assert queue.claim_due(now, 10, 300) == []
+        assert [entry["booking_id"] for entry in queue.claim_due(now + timedelta(seconds=301), 10, 300)] == ["booking-1"]
+
+    @pytest.mark.integration
+    def test_failed_send_is_retried_then_given_up(self):
+        queue = InMemoryReminderQueue()
+        now = [datetime(2025, 10, 14, 15, 0)]
+        queue.schedule("booking-1", now[0])
+        sender = RecordingReminderSender(failing={"booking-1"})
+        scheduler = ReminderScheduler(queue, sender, send_interval=0, clock=lambda: now[0])
+
+        for attempt in range(1, REMINDER_MAX_ATTEMPTS + 1):
+            asyncio.run(scheduler.run_due())
+            now[0] += timedelta(minutes=REMINDER_RETRY_MINUTES)
+
+        assert len(sender.calls) == REMINDER_MAX_ATTEMPTS
+        assert queue.get("booking-1")["status"] == "failed"
+
+    @pytest.mark.integration
+    def test_booking_moved_while_sending_keeps_the_new_entry(self, in_memory_db):
+        queue = FirestoreReminderQueue(in_memory_db)
+        now = datetime(2025, 10, 14, 15, 0)
+        queue.schedule("booking-1", now)
+        new_due = now + timedelta(days=3)
+
+        async def send_and_move(booking_id):
+            queue.schedule(booking_id, new_due)
+            return True
+
+        asyncio.run(ReminderScheduler(queue, send_and_move, send_interval=0, clock=lambda: now).run_due())
+
+        entry = queue.get("booking-1")
+        assert entry["status"] == "scheduled"
+        assert entry["due_at"] == new_due
+
+
+class TestEventStart:
+
+    @pytest.mark.unit
+    def test_confirmed_date_and_time_win(self):
+        booking = {"event_date": "2025-10-15", "event_time": "15:00", "confirmed_date": "2025-10-16", "confirmed_time": "11:30"}
+        assert event_start(booking) == datetime(2025, 10, 16, 11, 30)
+
+    @pytest.mark.unit
+    def test_datetime_event_date_without_time_uses_default(self):
+        assert event_start({"event_date": datetime(2025, 10, 15)}) == datetime(2025, 10, 15, 12, 0)
+
+    @pytest.mark.unit
+    def test_no_date(self):
+        assert event_start({"event_time": "15:00"}) is None
@@ -0,0 +1,150 @@
+"""
+Integration tests for the monthly report cache
+Tests that reports of closed months are served from report_cache until a
+back-dated write touches them, and that the current month uses a short TTL
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime
+import asyncio
+import json
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.client_index_service import rebuild_client_index
+from services.report_cache_service import REPORT_CACHE_COLLECTION, REPORT_CACHE_CURRENT_TTL
+from services.rollup_service import rebuild_rollups
+
+
+@pytest.fixture
+def reports(in_memory_db):
+    """routers.reports bound to the in-memory Firestore stand-in"""
+    with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+        import routers.reports as reports
+        with patch.object(reports, 'db', in_memory_db):
+            yield reports
+
+
+@pytest.fixture
+def booking_client(client, in_memory_db, mock_environment_variables):
+    with patch('main.get_db', return_value=in_memory_db), \
+         patch('main.send_confirmation_email', return_value=True):
+        yield client
+
+
+def post_booking(client, event_date, email="ana@example.com"):
+    response = client.post('/api/bookings/', json={
+        "service_type": "workshop",
+        "participants": 10,
+        "client_name": "Test Client",
+        "client_email": email,
+        "client_phone": "+56912345678",
+        "event_date": event_date
+    })
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+
+def complete(client, booking, event_cost=30000):
+    response = client.put(f"/api/bookings/{booking['id']}", json={"status": "completed", "event_cost": event_cost})
+    assert response.status_code == 200
+
+
+def monthly_report(reports, year, month):
+    return asyncio.run(reports.get_monthly_report(year, month))
+
+
+class TestReportCache:
+    """report_cache/report-YYYYMM"""
+
+    @pytest.mark.integration
+    def test_closed_month_is_served_from_cache(self, booking_client, reports, in_memory_db):
+        """The second request for a closed month is a single read"""
+        complete(booking_client, post_booking(booking_client, "2025-10-15"))
+
+        first = monthly_report(reports, 2025, 10)
+        cached = in_memory_db.collection(REPORT_CACHE_COLLECTION).document("report-202510").get().to_dict()
+        in_memory_db.round_trips = 0
+        second = monthly_report(reports, 2025, 10)
+
+        assert second == first
+        assert cached["closed"] is True
+        assert cached["expires_at"] is None
+        assert in_memory_db.round_trips == 1
+
+    @pytest.mark.integration
+    def test_back_dated_event_write_invalidates_its_month(self, booking_client, reports, in_memory_db):
+        """Editing an event of a closed month recomputes that month's report"""
+        complete(booking_client, post_booking(booking_client, "2025-10-15"))
+        monthly_report(reports, 2025, 10)
+
+        event_id = next(doc.id for doc in in_memory_db.collection("events").stream())
+        booking_client.put(f"/api/events/{event_id}", json={"final_price": 150000, "event_cost": 45000})
+
+        report = monthly_report(reports, 2025, 10)
+        assert report.total_income == 150000
+        assert report.total_profit == 105000
+
+    @pytest.mark.integration
+    def test_back_dated_booking_invalidates_following_months(self, booking_client, reports, in_memory_db):
+        """A new earlier booking makes the client a returning one in the cached later month"""
+        in_memory_db.collection("bookings").document("booking-oct").set({
+            "client_email": "ana@example.com",
+            "service_type": "workshop",
+            "status": "completed",
+            "event_date": datetime(2025, 10, 15, 15, 0)
+        })
+        in_memory_db.collection("events").document("event-oct").set({
+            "booking_id": "booking-oct",
+            "start_time": datetime(2025, 10, 15, 15, 0),
+            "actual_participants": 10,
+            "financials": {"income": 100000.0, "total_expenses": 40000.0}
+        })
+        rebuild_client_index(in_memory_db)
+        rebuild_rollups(in_memory_db)
+        assert monthly_report(reports, 2025, 10).client_retention_rate == 0.0
+
+        post_booking(booking_client, "2025-09-01")
+
+        assert in_memory_db.collection(REPORT_CACHE_COLLECTION).document("report-202510").get().exists is False
+        assert monthly_report(reports, 2025, 10).client_retention_rate == 100.0
+
+    @pytest.mark.integration
+    def test_annual_summary_reuses_cached_months(self, booking_client, reports, in_memory_db):
+        """Once the year is cached the summary is one read, and it agrees with the monthly reports"""
+        complete(booking_client, post_booking(booking_client, "2025-03-10"))
+        complete(booking_client, post_booking(booking_client, "2025-10-15", email="luis@example.com"))
+
+        first = asyncio.run(reports.get_annual_summary(2025))
+        in_memory_db.round_trips = 0
+        second = asyncio.run(reports.get_annual_summary(2025))
+
+        assert second == first
+        assert in_memory_db.round_trips == 1
+        assert first["monthly_reports"][9] == monthly_report(reports, 2025, 10).model_dump()
+
+    @pytest.mark.integration
+    def test_current_month_expires(self, booking_client, reports, in_memory_db):
+        """The current month is cached for REPORT_CACHE_CURRENT_TTL seconds only"""
+        now = datetime.now()
+        complete(booking_client, post_booking(booking_client, now.strftime('%Y-%m-%d')))
+        monthly_report(reports, now.year, now.month)
+        entry = in_memory_db.collection(REPORT_CACHE_COLLECTION).document(
+            f"report-{now.year}{now.month:02d}"
+        ).get().to_dict()
+        assert entry["closed"] is False
+
+        in_memory_db.round_trips = 0
+        monthly_report(reports, now.year, now.month)
+        assert in_memory_db.round_trips == 1
+
+        later = time.time() + REPORT_CACHE_CURRENT_TTL + 1
+        with patch('services.report_cache_service.time.time', return_value=later):
+            in_memory_db.round_trips = 0
+            monthly_report(reports, now.year, now.month)
+
+        assert in_memory_db.round_trips > 1
@@ -0,0 +1,151 @@
+"""
+Integration tests for the revenue rollups
+Tests that booking and event writes keep the per-day and per-month rollups up
+to date and that the incremental updates end in the same state as a backfill
+"""
+import pytest
+from unittest.mock import patch
+from datetime import datetime
+import asyncio
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.rollup_service import ROLLUPS_COLLECTION, rebuild_rollups
+
+
+def rollups(db):
+    """Rollup documents without timestamps or counters that dropped back to zero"""
+    def strip(data):
+        result = {}
+        for key, value in data.items():
+            if isinstance(value, dict):
+                value = strip(value)
+            if key != "updated_at" and value not in (0, {}):
+                result[key] = value
+        return result
+    return {doc.id: strip(doc.to_dict()) for doc in db.collection(ROLLUPS_COLLECTION).stream()}
+
+
+@pytest.fixture
+def events_router(in_memory_db):
+    with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+        import routers.events as events
+        with patch.object(events, 'db', in_memory_db):
+            yield events
+
+
+@pytest.fixture
+def booking_client(client, in_memory_db, mock_environment_variables):
+    with patch('main.get_db', return_value=in_memory_db), \
+         patch('main.send_confirmation_email', return_value=True):
+        yield client
+
+
+def post_booking(client, event_date, service_type="workshop"):
+    response = client.post('/api/bookings/', json={
+        "service_type": service_type,
+        "participants": 10,
+        "client_name": "Test Client",
+        "client_email": "ana@example.com",
+        "client_phone": "+56912345678",
+        "event_date": event_date
+    })
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+
+class TestRollups:
+    """rollups/day-YYYYMMDD and rollups/month-YYYYMM maintained on write"""
+
+    @pytest.mark.integration
+    def test_booking_lifecycle(self, booking_client, in_memory_db):
+        """Status changes move the booking counters; completing with costs adds the event"""
+        booking = post_booking(booking_client, "2025-10-15")
+        booking_client.put(f"/api/bookings/{booking['id']}", json={"status": "confirmed"})
+
+        month = rollups(in_memory_db)["month-202510"]
+        assert month["bookings"] == {
+            "count": 1,
+            "status_counts": {"confirmed": 1},
+            "booked_value": booking["estimated_price"]
+        }
+        assert "event_count" not in month
+
+        booking_client.put(f"/api/bookings/{booking['id']}", json={"status": "completed", "event_cost": 30000})
+        day = rollups(in_memory_db)["day-20251015"]
+        assert day["event_count"] == 1
+        assert day["income"] == booking["estimated_price"]
+        assert day["expenses"] == 30000
+        assert day["profit"] == booking["estimated_price"] - 30000
+        assert day["participants"] == 10
+        assert day["service_counts"] == {"workshop": 1}
+        assert day["bookings"]["status_counts"] == {"completed": 1}
+
+    @pytest.mark.integration
+    def test_incremental_matches_backfill(self, booking_client, in_memory_db, events_router):
+        """Flask and router writes, including edits, end in the same rollups as a rebuild"""
+        from models.schemas import EventCreate, EventFinancials
+
+        first = post_booking(booking_client, "2025-10-15")
+        booking_client.put(f"/api/bookings/{first['id']}", json={"status": "completed", "event_cost": 30000})
+        event_id = next(doc.id for doc in in_memory_db.collection("events").stream())
+        booking_client.put(f"/api/events/{event_id}", json={"final_price": 150000, "event_cost": 45000})
+
+        second = post_booking(booking_client, "2025-11-02", service_type="pizza_party")
+        event = asyncio.run(events_router.create_event(EventCreate(
+            booking_id=second["id"],
+            actual_participants=18,
+            start_time=datetime(2025, 11, 2, 15, 0),
+            end_time=datetime(2025, 11, 2, 18, 0),
+            financials=EventFinancials(income=90000.0, expenses=[], total_expenses=20000.0, profit=70000.0)
+        )))
+        asyncio.run(events_router.update_event_financials(
+            event.id, EventFinancials(income=95000.0, expenses=[], total_expenses=25000.0, profit=70000.0)
+        ))
+
+        incremental = rollups(in_memory_db)
+        assert incremental["month-202510"]["income"] == 150000
+        assert incremental["month-202511"]["income"] == 95000
+        assert incremental["month-202511"]["service_counts"] == {"pizza_party": 1}
+
+        rebuild_rollups(in_memory_db)
+        assert rollups(in_memory_db) == incremental
+
+    @pytest.mark.integration
+    def test_monthly_report_reads_the_rollup(self, booking_client, in_memory_db):
+        """The report of a month with events is built from its rollup document"""
+        booking = post_booking(booking_client, "2025-10-15")
+        booking_client.put(f"/api/bookings/{booking['id']}", json={"status": "completed", "event_cost": 30000})
+        in_memory_db.round_trips = 0
+
+        with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+            import routers.reports as reports
+            with patch.object(reports, 'db', in_memory_db):
+                report = asyncio.run(reports.get_monthly_report(2025, 10))
+
+        assert report.total_events == 1
+        assert report.total_income == booking["estimated_price"]
+        assert report.total_profit == booking["estimated_price"] - 30000
+        assert report.most_popular_service == "workshop"
+
+    @pytest.mark.integration
+    def test_backfill_command(self, flask_app, in_memory_db):
+        """flask backfill-rollups rebuilds the rollups and drops stale documents"""
+        in_memory_db.collection("events").document("event-1").set({
+            "booking_id": None,
+            "start_time": datetime(2025, 3, 4, 15, 0),
+            "actual_participants": 12,
+            "financials": {"income": 50000.0, "total_expenses": 10000.0}
+        })
+        in_memory_db.collection(ROLLUPS_COLLECTION).document("month-202001").set({"event_count": 3})
+
+        with patch('main.get_db', return_value=in_memory_db):
+            result = flask_app.test_cli_runner().invoke(args=['backfill-rollups'])
+
+        assert result.exit_code == 0
+        assert "2 documents" in result.output
+        assert sorted(rollups(in_memory_db)) == ["day-20250304", "month-202503"]
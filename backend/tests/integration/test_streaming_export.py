@@ -0,0 +1,121 @@
+"""
+Integration tests for the row-level export
+Tests that GET /reports/export/{collection} pages through Firestore and streams
+every booking or event of the date range as CSV or XLSX
+"""
+import pytest
+from unittest.mock import patch
+from datetime import date, datetime
+from fastapi import HTTPException
+from io import BytesIO
+import asyncio
+import csv
+import io
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+
+@pytest.fixture
+def reports(in_memory_db):
+    """routers.reports bound to the in-memory Firestore stand-in"""
+    with patch('firebase_admin.firestore.client', return_value=in_memory_db):
+        import routers.reports as reports
+        with patch.object(reports, 'db', in_memory_db):
+            yield reports
+
+
+@pytest.fixture
+def export_db(in_memory_db):
+    """Bookings from Jan to Apr 2025, half with datetime dates (router) and half with text dates (panel)"""
+    for i in range(40):
+        event_date = datetime(2025, 1 + i % 4, 1 + i % 28, 15, 0)
+        in_memory_db.collection("bookings").document(f"booking-{i:02d}").set({
+            "client_name": f"Cliente {i}",
+            "client_email": f"cliente{i}@example.com",
+            "service_type": "workshop",
+            "participants": 10 + i,
+            "event_date": event_date if i % 2 else event_date.strftime('%Y-%m-%d'),
+            "status": "confirmed",
+            "estimated_price": 150000
+        })
+    in_memory_db.collection("events").document("event-router").set({
+        "booking_id": "booking-01",
+        "start_time": datetime(2025, 2, 2, 15, 0),
+        "actual_participants": 12,
+        "financials": {"income": 90000.0, "total_expenses": 30000.0}
+    })
+    in_memory_db.collection("events").document("event-panel").set({
+        "booking_id": "booking-02",
+        "title": "Pizza Party - Cliente 2",
+        "event_date": "2025-03-03",
+        "participants": 15,
+        "final_price": 120000,
+        "event_cost": 50000
+    })
+    return in_memory_db
+
+
+def download(reports, collection, date_from, date_to, format="csv"):
+    response = asyncio.run(reports.export_rows(collection, date_from, date_to, format))
+
+    async def collect():
+        return [chunk async for chunk in response.body_iterator]
+
+    return response, b"".join(asyncio.run(collect()))
+
+
+class TestStreamingExport:
+    """Paged, streamed CSV/XLSX export"""
+
+    @pytest.mark.integration
+    def test_csv_covers_both_date_types_in_pages(self, reports, export_db):
+        """Every booking in the range comes back once, whatever the page size"""
+        with patch('services.export_service.EXPORT_PAGE_SIZE', 3):
+            response, body = download(reports, "bookings", date(2025, 2, 1), date(2025, 3, 31))
+
+        rows = list(csv.DictReader(io.StringIO(body.decode('utf-8-sig'))))
+        expected = {f"booking-{i:02d}" for i in range(40) if (i % 4) in (1, 2)}
+        assert response.media_type.startswith("text/csv")
+        assert "bookings_2025-02-01_2025-03-31.csv" in response.headers["content-disposition"]
+        assert {row["id"] for row in rows} == expected
+        assert len(rows) == len(expected)
+
+    @pytest.mark.integration
+    def test_event_rows_normalize_both_shapes(self, reports, export_db):
+        """Router and panel events export the same income/expenses/profit columns"""
+        _, body = download(reports, "events", date(2025, 1, 1), date(2025, 12, 31))
+
+        rows = {row["id"]: row for row in csv.DictReader(io.StringIO(body.decode('utf-8-sig')))}
+        assert rows["event-router"]["profit"] == "60000.0"
+        assert rows["event-router"]["participants"] == "12"
+        assert rows["event-panel"]["income"] == "120000.0"
+        assert rows["event-panel"]["event_date"] == "2025-03-03"
+
+    @pytest.mark.integration
+    def test_xlsx(self, reports, export_db):
+        """The XLSX export opens with openpyxl and has a header plus one row per booking"""
+        from openpyxl import load_workbook
+
+        response, body = download(reports, "bookings", date(2025, 1, 1), date(2025, 4, 30), format="xlsx")
+
+        sheet = load_workbook(BytesIO(body), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        assert response.media_type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        assert rows[0][0] == "id"
+        assert len(rows) == 41
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize("collection, date_to, format", [
+        ("clients", date(2025, 1, 31), "csv"),
+        ("bookings", date(2024, 12, 31), "csv"),
+        ("bookings", date(2025, 1, 31), "pdf")
+    ])
+    def test_invalid_requests(self, reports, export_db, collection, date_to, format):
+        """Unknown collections, inverted ranges and unknown formats are rejected"""
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(reports.export_rows(collection, date(2025, 1, 1), date_to, format))
+
+        assert error.value.status_code == 400
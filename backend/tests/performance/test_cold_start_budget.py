@@ -0,0 +1,86 @@
+"""
+Cold-start benchmark for the Cloud Function module
+Imports main.py in a fresh interpreter with -X importtime and fails when the
+cumulative import time goes over the configured budget
+"""
+import pytest
+import json
+import subprocess
+import sys
+import os
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '../..')
+
+# Budget in milliseconds, override with COLD_START_BUDGET_MS for slower CI machines
+COLD_START_BUDGET_MS = float(os.getenv('COLD_START_BUDGET_MS', 1500))
+
+# Modules that must only be loaded the first time they are used
+LAZY_MODULES = ['twilio', 'twilio.rest', 'aiohttp', 'smtplib', 'email.mime.text', 'email.mime.multipart', 'firebase_admin.storage']
+
+
+def run_fresh_interpreter(*args):
+    """Run python in a clean process from the backend directory"""
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+
+
+def parse_importtime(stderr: str) -> list:
+    """(depth, module, cumulative us) entries from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line.split('|')
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        entries.append((depth, module.strip(), int(cumulative_us.strip())))
+    return entries
+
+
+class TestColdStartBudget:
+    """Import cost of the Cloud Function entry module"""
+
+    @pytest.mark.slow
+    def test_main_import_within_budget(self):
+        """Cold import of main stays under COLD_START_BUDGET_MS"""
+        # Compile once so the measured run doesn't include bytecode generation
+        run_fresh_interpreter('-c', 'import main')
+
+        result = run_fresh_interpreter('-X', 'importtime', '-c', 'import main')
+        assert result.returncode == 0, result.stderr[-2000:]
+
+        entries = parse_importtime(result.stderr)
+        main_ms = next(us for depth, name, us in entries if depth == 0 and name == 'main') / 1000
+
+        # Direct imports of main are reported one level deep
+        slowest = sorted(
+            ((name, us) for depth, name, us in entries if depth == 1),
+            key=lambda item: item[1],
+            reverse=True
+        )[:5]
+
+        assert main_ms <= COLD_START_BUDGET_MS, (
+            f"Cold-start import took {main_ms:.1f} ms, over the {COLD_START_BUDGET_MS:.0f} ms budget; slowest imports: "
+            + ", ".join(f"{name} {us / 1000:.1f} ms" for name, us in slowest)
+        )
+
+    @pytest.mark.slow
+    def test_optional_dependencies_not_imported_at_startup(self):
+        """Twilio, SMTP/MIME and Storage are not loaded just by importing main"""
+        script = (
+            'import json, sys, main; '
+            f'print(json.dumps({{m: m in sys.modules for m in {LAZY_MODULES!r}}}))'
+        )
+        result = run_fresh_interpreter('-c', script)
+        assert result.returncode == 0, result.stderr[-2000:]
+
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+        eager = [module for module, is_loaded in loaded.items() if is_loaded]
+        assert eager == [], f"Loaded eagerly at import: {eager}"
@@ -0,0 +1,68 @@
+"""
+Memory benchmark for the streaming export
+Feeds synthetic booking rows through the CSV and XLSX writers and measures the
+peak traced allocation with tracemalloc, for a small and a 100k-row export
+"""
+import pytest
+from datetime import datetime
+import tracemalloc
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.export_service import EXPORT_COLUMNS, csv_chunks, xlsx_chunks
+
+COLUMNS = EXPORT_COLUMNS["bookings"]
+MAX_PEAK_BYTES = 3 * 1024 * 1024
+
+# openpyxl under tracemalloc takes a few minutes for 100k rows, so opt in with RUN_BENCHMARKS=1
+benchmark = pytest.mark.skipif(
+    not os.getenv('RUN_BENCHMARKS'),
+    reason="100k-row XLSX memory benchmark; set RUN_BENCHMARKS=1 to run it"
+)
+
+
+def booking_rows(count):
+    for i in range(count):
+        yield [
+            f"booking-{i:06d}", f"Cliente {i}", f"cliente{i}@example.com", "+56912345678", "workshop", 10 + i % 30,
+            datetime(2025, 1 + i % 12, 1 + i % 28, 15, 0), "15:00", "Santiago", "confirmed", 150000.0, None,
+            datetime(2025, 1, 1, 9, 30)
+        ]
+
+
+def measure(writer, rows):
+    """(output bytes, peak traced bytes) of consuming the writer"""
+    tracemalloc.start()
+    try:
+        size = sum(len(chunk) for chunk in writer(COLUMNS, booking_rows(rows)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size, peak
+
+
+class TestExportMemory:
+    """Peak memory of the export writers does not grow with the number of rows"""
+
+    @pytest.mark.slow
+    @pytest.mark.integration
+    @pytest.mark.parametrize("writer, small, large", [
+        (csv_chunks, 100, 100_000),
+        pytest.param(xlsx_chunks, 100, 100_000, marks=benchmark)
+    ])
+    def test_peak_memory_is_flat(self, writer, small, large):
+        """The output grows with the rows while the peak stays under a fixed bound"""
+        # Warm up imports and module-level caches outside the measurement
+        measure(writer, 10)
+
+        small_size, small_peak = measure(writer, small)
+        large_size, large_peak = measure(writer, large)
+
+        assert large_size > 10 * small_size
+        assert large_peak < MAX_PEAK_BYTES, (
+            f"{writer.__name__}: {large} rows peaked at {large_peak / 1024:.0f} KiB "
+            f"({small} rows: {small_peak / 1024:.0f} KiB)"
+        )
@@ -0,0 +1,94 @@
+"""
+Benchmark for the public gallery event lookups
+Seeds 500 published events in the in-memory Firestore stand-in and compares
+the round trips of one get() per event against chunked get_all reads
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.batch_read_service import get_documents
+
+EVENTS = 500
+
+
+def seed_gallery(db, events=EVENTS):
+    for i in range(events):
+        event_id = f"event-{i:03d}"
+        db.collection("events").document(event_id).set({
+            "id": event_id,
+            "title": f"Pizza Party {i}",
+            "status": "completed",
+            "participants": 10 + i % 20,
+            "event_date": "2025-10-15"
+        })
+        for photo in range(2):
+            photo_id = f"{event_id}-photo-{photo}"
+            db.collection("gallery").document(photo_id).set({
+                "id": photo_id,
+                "event_id": event_id,
+                "url": f"https://storage.example.com/{photo_id}.jpg",
+                "is_published": True
+            })
+
+
+def sequential_lookups(db, event_ids):
+    """Previous behaviour: one document get() per event"""
+    documents = {}
+    for event_id in event_ids:
+        event_doc = db.collection("events").document(event_id).get()
+        if event_doc.exists:
+            documents[event_id] = event_doc
+    return documents
+
+
+@pytest.fixture
+def gallery_db():
+    from tests.in_memory_firestore import InMemoryFirestore
+
+    db = InMemoryFirestore()
+    seed_gallery(db)
+    db.round_trips = 0
+    return db
+
+
+class TestGalleryBatchReads:
+    """Round trips of the gallery event lookups"""
+
+    @pytest.mark.integration
+    def test_public_gallery_rebuild_round_trips(self, gallery_db):
+        """A full rebuild is one query for the images, one get_all per chunk of 100 events and one listing of the old shards"""
+        from services.gallery_snapshot_service import PublicGallerySnapshot
+
+        gallery = PublicGallerySnapshot(gallery_db).rebuild()
+
+        assert len(gallery) == EVENTS
+        assert all(len(event["images"]) == 2 for event in gallery)
+        assert gallery_db.round_trips == 1 + EVENTS // 100 + 1
+
+    @pytest.mark.integration
+    def test_missing_and_duplicate_ids(self, gallery_db):
+        """Only existing documents come back, each once"""
+        documents = get_documents(gallery_db, "events", ["event-001", "event-001", "missing", None], chunk_size=2)
+
+        assert list(documents) == ["event-001"]
+        assert documents["event-001"].to_dict()["title"] == "Pizza Party 1"
+
+    @pytest.mark.integration
+    def test_batched_lookups_round_trips(self, gallery_db):
+        """Batched reads need one round trip per 100 events instead of one per event"""
+        event_ids = [f"event-{i:03d}" for i in range(EVENTS)]
+
+        sequential = sequential_lookups(gallery_db, event_ids)
+        sequential_round_trips = gallery_db.round_trips
+
+        gallery_db.round_trips = 0
+        batched = get_documents(gallery_db, "events", event_ids)
+        batched_round_trips = gallery_db.round_trips
+
+        assert set(batched) == set(sequential) == set(event_ids)
+        assert sequential_round_trips == EVENTS
+        assert batched_round_trips == EVENTS // 100
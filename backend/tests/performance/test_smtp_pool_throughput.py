@@ -0,0 +1,250 @@
+"""
+Throughput benchmark for the shared SMTP pool
+Runs against a local aiosmtpd server with STARTTLS and AUTH and compares
+messages per second with the previous connect/STARTTLS/login/quit per message
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+import ipaddress
+import smtplib
+import socket
+import ssl
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+from aiosmtpd.smtp import AuthResult
+
+MESSAGES = 100
+USERNAME = 'pizzeria@example.com'
+PASSWORD = 'secret'
+
+# Wall-clock comparison: only meaningful on a quiet machine, so opt in with RUN_BENCHMARKS=1
+benchmark = pytest.mark.skipif(
+    not os.getenv('RUN_BENCHMARKS'),
+    reason="wall-clock benchmark; set RUN_BENCHMARKS=1 to run it"
+)
+
+
+class RecordingHandler:
+    """Keeps every delivered envelope and the client connection it came from"""
+
+    def __init__(self):
+        self.envelopes = []
+        self.peers = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.endswith('@rejected.example'):
+            return '550 Mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        self.peers.add(session.peer)
+        return '250 Message accepted for delivery'
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=auth_data.login.decode() == USERNAME and auth_data.password.decode() == PASSWORD)
+
+
+def write_self_signed_certificate(directory):
+    """Certificate for 127.0.0.1 so STARTTLS can be verified by the client"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=1))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address('127.0.0.1'))]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_path = os.path.join(directory, 'smtp.crt')
+    key_path = os.path.join(directory, 'smtp.key')
+    with open(cert_path, 'wb') as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def smtp_server(tmp_path_factory):
+    """Local SMTP server that requires STARTTLS before AUTH"""
+    cert_path, key_path = write_self_signed_certificate(str(tmp_path_factory.mktemp('smtp')))
+
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert_path, key_path)
+    client_context = ssl.create_default_context(cafile=cert_path)
+
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(
+        handler,
+        hostname='127.0.0.1',
+        port=free_port(),
+        tls_context=server_context,
+        require_starttls=True,
+        authenticator=authenticate,
+        auth_require_tls=True
+    )
+    controller.start()
+    yield controller, handler, client_context
+    controller.stop()
+
+
+@pytest.fixture
+def handler(smtp_server):
+    _, handler, _ = smtp_server
+    handler.envelopes.clear()
+    handler.peers.clear()
+    return handler
+
+
+@pytest.fixture
+def make_pool(smtp_server):
+    from services.smtp_pool_service import SMTPConnectionPool
+
+    controller, _, client_context = smtp_server
+    pools = []
+
+    def build(**kwargs):
+        pool = SMTPConnectionPool(
+            controller.hostname, controller.port,
+            username=USERNAME, password=PASSWORD,
+            ssl_context=client_context, **kwargs
+        )
+        pools.append(pool)
+        return pool
+
+    yield build
+    for pool in pools:
+        pool.close()
+
+
+def build_message(index):
+    msg = EmailMessage()
+    msg['From'] = USERNAME
+    msg['To'] = f'cliente{index}@example.com'
+    msg['Subject'] = f'Confirmación #{index}'
+    msg.set_content('¡Tu evento con Pablo\'s Pizza ha sido confirmado!')
+    return msg
+
+
+def send_with_new_connection(controller, client_context, msg):
+    """Previous main.py behaviour: one SMTP session per message"""
+    server = smtplib.SMTP(controller.hostname, controller.port)
+    server.starttls(context=client_context)
+    server.login(USERNAME, PASSWORD)
+    server.send_message(msg)
+    server.quit()
+
+
+class TestSMTPConnectionPool:
+    """Session reuse, NOOP probing and reconnection of the SMTP pool"""
+
+    @pytest.mark.integration
+    def test_many_messages_share_one_session(self, make_pool, handler):
+        """Sequential sends go over the same TLS-authenticated session"""
+        pool = make_pool(max_connections=1)
+
+        for index in range(20):
+            pool.send_message(build_message(index))
+
+        assert len(handler.envelopes) == 20
+        assert len(handler.peers) == 1
+        assert pool.stats()['connections_opened'] == 1
+        assert pool.stats()['messages_sent'] == 20
+
+    @pytest.mark.integration
+    def test_dead_session_is_replaced_transparently(self, make_pool, handler):
+        """A session that fails the NOOP probe is dropped and a new one is opened"""
+        pool = make_pool(max_connections=1)
+        pool.send_message(build_message(1))
+
+        # Simulate the server hanging up while the session sat idle
+        pool._idle[0].smtp.sock.shutdown(socket.SHUT_RDWR)
+
+        pool.send_message(build_message(2))
+
+        assert len(handler.envelopes) == 2
+        assert pool.stats()['reconnects'] == 1
+        assert pool.stats()['connections_opened'] == 2
+
+    @pytest.mark.integration
+    def test_idle_sessions_expire(self, make_pool, handler):
+        """Sessions idle longer than idle_timeout are closed instead of probed"""
+        now = [0.0]
+        pool = make_pool(max_connections=1, idle_timeout=60, clock=lambda: now[0])
+
+        pool.send_message(build_message(1))
+        now[0] += 61
+        pool.send_message(build_message(2))
+
+        assert pool.stats()['connections_opened'] == 2
+        assert pool.stats()['reconnects'] == 0
+        assert len(handler.envelopes) == 2
+
+    @pytest.mark.integration
+    def test_refused_recipient_keeps_session(self, make_pool, handler):
+        """A rejected message does not cost the pooled session"""
+        pool = make_pool(max_connections=1)
+
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            pool.send_message(build_message(1), to_addrs=['nadie@rejected.example'])
+        pool.send_message(build_message(2))
+
+        assert pool.stats()['connections_opened'] == 1
+        assert len(handler.envelopes) == 1
+
+    @benchmark
+    @pytest.mark.slow
+    @pytest.mark.integration
+    def test_pooled_throughput(self, smtp_server, make_pool, handler):
+        """The pool sends more messages per second than a session per message"""
+        controller, _, client_context = smtp_server
+        pool = make_pool(max_connections=1)
+        messages = [build_message(index) for index in range(MESSAGES)]
+
+        start = time.perf_counter()
+        for msg in messages:
+            send_with_new_connection(controller, client_context, msg)
+        per_message_rate = MESSAGES / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for msg in messages:
+            pool.send_message(msg)
+        pooled_rate = MESSAGES / (time.perf_counter() - start)
+
+        assert len(handler.envelopes) == 2 * MESSAGES
+        assert pool.stats()['connections_opened'] == 1
+        assert pooled_rate > per_message_rate, (
+            f"Reusing the session should beat reconnecting per message: "
+            f"{pooled_rate:.1f} msg/s pooled, {per_message_rate:.1f} msg/s with a session per message"
+        )
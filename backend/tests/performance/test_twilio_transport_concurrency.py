@@ -0,0 +1,253 @@
+"""
+Concurrency benchmark for the async Twilio transport
+Runs against a local aiohttp stand-in for the Messages API that takes a fixed
+time per request, and checks that concurrent sends overlap on a pooled
+keep-alive session instead of serializing, and that each loop's session is
+closed when its run ends
+"""
+import pytest
+from unittest.mock import patch
+import asyncio
+import base64
+import threading
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+web = pytest.importorskip('aiohttp.web')
+from services.twilio_transport import AsyncTwilioTransport, TwilioAPIError, TwilioSender
+
+ACCOUNT_SID = 'AC00000000000000000000000000000000'
+AUTH_TOKEN = 'secret'
+DELAY = 0.2
+SENDS = 10
+
+
+class MessagesStandIn:
+    """Local Messages.json endpoint that answers after `delay` seconds and tracks overlapping requests"""
+
+    def __init__(self, delay: float = DELAY):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self.peers = set()
+        self.base_url = None
+        self._loop = None
+        self._runner = None
+
+    async def create_message(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            form = await request.post()
+            self.requests.append({"auth": request.headers.get('Authorization'), **form})
+            sid = f"SM{len(self.requests):032d}"
+            self.peers.add(request.transport.get_extra_info('peername'))
+            await asyncio.sleep(self.delay)
+            if form["To"] == "whatsapp:+15005550000":
+                return web.Response(text="upstream unavailable", status=503, content_type="text/html")
+            if not form["To"].startswith("whatsapp:+"):
+                return web.json_response({"code": 21211, "message": "Invalid 'To' Phone Number"}, status=400)
+            return web.json_response({"sid": sid, "status": "queued"}, status=201)
+        finally:
+            self.in_flight -= 1
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post(f'/2010-04-01/Accounts/{ACCOUNT_SID}/Messages.json', self.create_message)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+
+    def start(self):
+        """Serve from a background thread with its own event loop"""
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(timeout=5)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+@pytest.fixture
+def stand_in():
+    server = MessagesStandIn()
+    server.start()
+    yield server
+    server.stop()
+
+
+def transport_for(server, **kwargs):
+    return AsyncTwilioTransport(ACCOUNT_SID, AUTH_TOKEN, base_url=server.base_url, **kwargs)
+
+
+class TestAsyncTwilioTransport:
+    """Pooled aiohttp session against the local Messages API stand-in"""
+
+    @pytest.mark.slow
+    @pytest.mark.integration
+    def test_concurrent_sends_overlap(self, stand_in):
+        """Ten sends of 200 ms each are all in flight at once on the stand-in"""
+        async def send_all():
+            transport = transport_for(stand_in)
+            try:
+                return await asyncio.gather(*(
+                    transport.send_message(f"whatsapp:+5691234{i:04d}", "Hola", "whatsapp:+14155238886")
+                    for i in range(SENDS)
+                ))
+            finally:
+                await transport.close()
+
+        messages = asyncio.run(send_all())
+
+        assert len({message["sid"] for message in messages}) == SENDS
+        assert stand_in.max_in_flight == SENDS
+
+    @pytest.mark.integration
+    def test_keep_alive_reuses_one_connection(self, stand_in):
+        """Sequential sends go over the same TCP connection, with Basic auth and form fields"""
+        stand_in.delay = 0
+
+        async def send_sequentially():
+            transport = transport_for(stand_in)
+            try:
+                for i in range(5):
+                    await transport.send_message(f"whatsapp:+569{i:08d}", f"Mensaje {i}", "whatsapp:+14155238886")
+                return transport.get_stats()
+            finally:
+                await transport.close()
+
+        stats = asyncio.run(send_sequentially())
+
+        assert stats == {"requests": 5, "connections_opened": 1}
+        assert len(stand_in.peers) == 1
+        credentials = base64.b64encode(f"{ACCOUNT_SID}:{AUTH_TOKEN}".encode()).decode()
+        assert [request["auth"] for request in stand_in.requests] == [f"Basic {credentials}"] * 5
+        assert stand_in.requests[0]["From"] == "whatsapp:+14155238886"
+        assert stand_in.requests[4]["Body"] == "Mensaje 4"
+
+    @pytest.mark.integration
+    def test_api_error(self, stand_in):
+        stand_in.delay = 0
+
+        async def send_invalid():
+            transport = transport_for(stand_in)
+            try:
+                await transport.send_message("+56912345678", "Hola", "whatsapp:+14155238886")
+            finally:
+                await transport.close()
+
+        with pytest.raises(TwilioAPIError) as error:
+            asyncio.run(send_invalid())
+
+        assert error.value.status == 400
+        assert error.value.code == 21211
+
+    @pytest.mark.integration
+    def test_non_json_error(self, stand_in):
+        """An HTML or plain-text error page is reported with its status instead of a JSON decode error"""
+        stand_in.delay = 0
+
+        async def send_to_unavailable():
+            transport = transport_for(stand_in)
+            try:
+                await transport.send_message("whatsapp:+15005550000", "Hola", "whatsapp:+14155238886")
+            finally:
+                await transport.close()
+
+        with pytest.raises(TwilioAPIError) as error:
+            asyncio.run(send_to_unavailable())
+
+        assert error.value.status == 503
+        assert "upstream unavailable" in str(error.value)
+
+    @pytest.mark.integration
+    def test_request_timeout(self, stand_in):
+        """A request over the per-request timeout fails instead of hanging"""
+        async def send_slow():
+            transport = transport_for(stand_in, timeout=0.05)
+            try:
+                await transport.send_message("whatsapp:+56912345678", "Hola", "whatsapp:+14155238886")
+            finally:
+                await transport.close()
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(send_slow())
+
+
+class TestTwilioSender:
+    """Synchronous callers share the background loop and its connections"""
+
+    @pytest.mark.slow
+    @pytest.mark.integration
+    def test_send_sync_from_threads_overlaps(self, stand_in):
+        """Flask-style callers in separate threads send concurrently over one pooled session"""
+        sender = TwilioSender(
+            ACCOUNT_SID, AUTH_TOKEN, "whatsapp:+14155238886",
+            transport_factory=lambda: transport_for(stand_in)
+        )
+        results = []
+        threads = [
+            threading.Thread(target=lambda i=i: results.append(sender.send_sync(f"whatsapp:+569{i:08d}", "Hola")))
+            for i in range(SENDS)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        try:
+            assert len(results) == SENDS
+            assert stand_in.max_in_flight == SENDS
+
+            # A later call reuses the warm connections instead of opening new ones
+            sender.send_sync("whatsapp:+56900000000", "Otra vez")
+            assert len(stand_in.peers) == SENDS
+        finally:
+            sender.close()
+
+    @pytest.mark.integration
+    def test_close_transport_closes_the_loop_session(self, stand_in):
+        """A loop that ends with asyncio.run closes its session instead of leaking it"""
+        stand_in.delay = 0
+        sender = TwilioSender(
+            ACCOUNT_SID, AUTH_TOKEN, "whatsapp:+14155238886",
+            transport_factory=lambda: transport_for(stand_in)
+        )
+
+        async def send_once():
+            await sender.send("whatsapp:+56900000001", "Hola")
+            transport = sender.transport()
+            await sender.close_transport()
+            return transport
+
+        transport = asyncio.run(send_once())
+
+        assert transport._session is None
+        assert len(sender._transports) == 0
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize("scheduled", ["resume_bulk_sends", "send_due_reminders"])
+    def test_scheduled_runs_close_their_session(self, flask_app, in_memory_db, scheduled):
+        """Each scheduled asyncio.run closes the Twilio session of its loop"""
+        import main
+        import services.notification_service as notification_service
+        closed = []
+
+        class Sender:
+            async def close_transport(self):
+                closed.append(asyncio.get_running_loop())
+
+        with patch.object(notification_service, 'sender', Sender()), \
+             patch('main.get_db', return_value=in_memory_db):
+            getattr(main, scheduled).__wrapped__(None)
+
+        assert len(closed) == 1
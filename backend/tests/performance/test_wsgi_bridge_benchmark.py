@@ -0,0 +1,145 @@
+"""
+Benchmark for the Firebase entry point dispatch
+Compares the direct WSGI bridge against the previous per-request werkzeug test Client path
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+from werkzeug.test import Client, EnvironBuilder
+import json
+import time
+import gc
+import statistics
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+ITERATIONS = 300
+ROUNDS = 7
+
+# Wall-clock comparison: only meaningful on a quiet machine, so opt in with RUN_BENCHMARKS=1
+benchmark = pytest.mark.skipif(
+    not os.getenv('RUN_BENCHMARKS'),
+    reason="wall-clock benchmark; set RUN_BENCHMARKS=1 to run it"
+)
+
+
+def build_firebase_request(path, method='GET', data=None, query_string=None):
+    """Build an https_fn.Request the way functions-framework hands it to main()"""
+    from firebase_functions import https_fn
+
+    builder = EnvironBuilder(
+        path=path,
+        method=method,
+        data=data,
+        query_string=query_string,
+        content_type='application/json' if data else None
+    )
+    return https_fn.Request(builder.get_environ())
+
+
+def legacy_dispatch(app, req):
+    """Previous main() implementation: a fresh test Client per request"""
+    from firebase_functions import https_fn
+
+    client = Client(app)
+    response = client.open(
+        path=req.path,
+        method=req.method,
+        headers=list(req.headers.items()),
+        data=req.get_data(),
+        query_string=req.query_string
+    )
+    return https_fn.Response(
+        response.get_data(),
+        status=response.status_code,
+        headers=dict(response.headers)
+    )
+
+
+def time_per_request(dispatch, make_request):
+    """Average seconds per dispatched request"""
+    # Start from a clean heap so a collection left over by earlier tests does not land in one loop
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        response = dispatch(make_request())
+        response.get_data()
+        response.close()
+    return (time.perf_counter() - start) / ITERATIONS
+
+
+class TestWSGIBridge:
+    """Behaviour and overhead of the direct WSGI bridge"""
+
+    @pytest.mark.integration
+    def test_bridge_matches_legacy_response(self, flask_app):
+        """The bridge returns the same status, body and content type as the legacy path"""
+        import main
+
+        with patch('main.get_db', return_value=MagicMock()):
+            legacy = legacy_dispatch(flask_app, build_firebase_request('/api/health'))
+            bridged = main.main(build_firebase_request('/api/health'))
+
+            assert bridged.status_code == legacy.status_code == 200
+            assert json.loads(bridged.get_data()) == json.loads(legacy.get_data())
+            assert bridged.headers['Content-Type'] == legacy.headers['Content-Type']
+
+    @pytest.mark.integration
+    def test_bridge_forwards_body_and_query_string(self, flask_app):
+        """POST bodies and query strings reach the Flask view, even if already read"""
+        import main
+
+        mock_db = MagicMock()
+        with patch('main.get_db', return_value=mock_db):
+            req = build_firebase_request(
+                '/api/contacts',
+                method='GET',
+                query_string='status=pending&limit=5'
+            )
+            response = main.main(req)
+            assert response.status_code == 200
+            mock_db.collection.return_value.where.assert_called_with("status", "==", "pending")
+
+            req = build_firebase_request('/api/bookings/', method='POST', data=json.dumps({}))
+            req.get_data()  # Consume the body before dispatching
+            response = main.main(req)
+            assert response.status_code == 400
+            assert json.loads(response.get_data()) == {"error": "No data provided"}
+
+    @benchmark
+    @pytest.mark.slow
+    @pytest.mark.integration
+    def test_bridge_per_request_overhead(self, flask_app):
+        """The bridge adds less per-request overhead than the test Client path (median of interleaved rounds)"""
+        import main
+
+        with patch('main.get_db', return_value=MagicMock()):
+            make_request = lambda: build_firebase_request('/')
+
+            # Warm up both paths
+            legacy_dispatch(flask_app, make_request())
+            main.wsgi_bridge(make_request())
+
+            ratios = []
+            for _ in range(ROUNDS):
+                legacy_time = time_per_request(lambda req: legacy_dispatch(flask_app, req), make_request)
+                bridge_time = time_per_request(main.wsgi_bridge, make_request)
+                ratios.append(bridge_time / legacy_time)
+
+        # 10% margin for scheduler noise; the bridge is normally well under the legacy path
+        assert statistics.median(ratios) < 1.1, "WSGI bridge should not be slower than the test Client path"
+
+    @pytest.mark.integration
+    def test_app_that_never_starts_the_response(self):
+        """An app returning an empty iterable without start_response fails with a clear error"""
+        from firebase_functions import https_fn
+        from utils.wsgi_bridge import WSGIBridge
+
+        class SilentApp:
+            def wsgi_app(self, environ, start_response):
+                return []
+
+        with pytest.raises(RuntimeError, match="start_response"):
+            WSGIBridge(SilentApp(), https_fn.Response)(build_firebase_request('/'))
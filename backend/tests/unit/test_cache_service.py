@@ -0,0 +1,120 @@
+"""
+Unit tests for the public read cache
+Tests TTL expiry, LRU eviction, write-driven invalidation and hit/miss counters
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
+
+from services.cache_service import RouteCache
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRouteCache:
+    """Test suite for RouteCache"""
+
+    @pytest.mark.unit
+    def test_entries_expire_after_route_ttl(self):
+        """Entries are served until their route TTL elapses"""
+        clock = FakeClock()
+        cache = RouteCache({"events_list": 60, "gallery_public": 300}, clock=clock)
+
+        cache.set("events_list", [{"id": "event-1"}])
+        cache.set("gallery_public", [{"id": "gallery-1"}])
+
+        clock.now += 59
+        assert cache.get("events_list") == [{"id": "event-1"}]
+
+        clock.now += 2
+        assert cache.get("events_list") is None
+        assert cache.get("gallery_public") == [{"id": "gallery-1"}]
+
+    @pytest.mark.unit
+    def test_least_recently_used_entry_is_evicted(self):
+        """The cache never grows beyond max_entries"""
+        cache = RouteCache({"reviews_featured": 300}, max_entries=2)
+
+        cache.set("reviews_featured", ["a"], key=1)
+        cache.set("reviews_featured", ["b"], key=2)
+        cache.get("reviews_featured", key=1)  # key=1 becomes most recently used
+        cache.set("reviews_featured", ["c"], key=3)
+
+        assert cache.get("reviews_featured", key=2) is None
+        assert cache.get("reviews_featured", key=1) == ["a"]
+        assert cache.get("reviews_featured", key=3) == ["c"]
+        assert cache.stats()["evictions"] == 1
+
+    @pytest.mark.unit
+    def test_invalidate_only_drops_named_routes(self):
+        """Invalidation removes every key of the named routes and nothing else"""
+        cache = RouteCache({"events_list": 60, "reviews_featured": 300})
+        cache.set("events_list", [1])
+        cache.set("reviews_featured", [2], key=6)
+        cache.set("reviews_featured", [3], key=10)
+
+        assert cache.invalidate("reviews_featured") == 2
+        assert cache.get("reviews_featured", key=6) is None
+        assert cache.get("events_list") == [1]
+
+    @pytest.mark.unit
+    def test_stats_count_hits_and_misses_per_route(self):
+        """Hit and miss counters are exposed per route and in total"""
+        cache = RouteCache({"events_list": 60})
+        cache.get("events_list")
+        cache.set("events_list", [])
+        cache.get("events_list")
+        cache.get("events_list")
+
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["routes"]["events_list"] == {"hits": 2, "misses": 1, "ttl_seconds": 60}
+        assert stats["hit_rate"] == 66.67
+
+
+class TestPublicEndpointsCache:
+    """Caching and invalidation wired into the Flask routes"""
+
+    @pytest.mark.integration
+    def test_events_list_is_cached_until_publish(self, client, mock_firestore):
+        """GET /api/events/ hits Firestore once until an event is published"""
+        event_doc = MagicMock()
+        event_doc.id = "event-1"
+        event_doc.to_dict.return_value = {"title": "Taller", "is_published": False}
+        events_query = mock_firestore['events'].order_by.return_value
+        events_query.stream.return_value = [event_doc]
+
+        published_doc = MagicMock()
+        published_doc.exists = True
+        published_doc.id = "event-1"
+        published_doc.to_dict.return_value = {"title": "Taller", "is_published": True}
+        mock_firestore['events'].document.return_value.get.return_value = published_doc
+
+        with patch('main.get_db', return_value=mock_firestore['db']):
+            assert client.get('/api/events/').status_code == 200
+            assert client.get('/api/events/').status_code == 200
+            assert events_query.stream.call_count == 1
+
+            response = client.put('/api/events/event-1/publish', json={"is_published": True})
+            assert response.status_code == 200
+
+            client.get('/api/events/')
+            assert events_query.stream.call_count == 2
+
+            stats = json.loads(client.get('/api/cache/stats').data)
+            assert stats["routes"]["events_list"]["hits"] == 1
+            assert stats["routes"]["events_list"]["misses"] == 2
@@ -0,0 +1,28 @@
+"""
+Conditional GET helpers for list endpoints
+Builds JSON responses with a strong ETag and answers If-None-Match with
+304 Not Modified
+"""
+from flask import jsonify, request
+import hashlib
+
+
+def conditional_json_response(payload):
+    """
+    JSON response for payload, or 304 if the client's copy is still current
+
+    Collection responses carry no Last-Modified: the newest timestamp among the
+    documents still present does not move when one is deleted, so If-Modified-Since
+    would keep answering 304 for a list that lost an item. The ETag covers the
+    exact bytes, deletions included.
+    """
+    response = jsonify(payload)
+
+    # Strong ETag: digest of the exact bytes we would send
+    response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest())
+
+    # Always revalidate, so polling clients send If-None-Match instead of reusing stale copies
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+
+    return response.make_conditional(request)
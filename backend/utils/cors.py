@@ -0,0 +1,64 @@
+"""
+Single CORS layer for the Flask app
+Preflight requests are answered before routing from precomputed header tuples
+(with a long Access-Control-Max-Age), and every other response gets the
+allowed origin reflected back. Public read-only paths answer any origin with *
+"""
+from flask import request
+
+
+class CORSLayer:
+    """Answer CORS preflights without running a route and tag actual responses"""
+
+    def __init__(self, app=None, origins=(), methods=('GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'),
+                 allow_headers=('Content-Type', 'Authorization'), max_age=86400, public_paths=()):
+        self.origins = frozenset(origin.strip() for origin in origins if origin.strip())
+        # Path prefixes embeddable from any site (no credentials involved)
+        self.public_paths = tuple(public_paths)
+
+        # Built once; every preflight reuses the same tuples
+        self.preflight_headers = (
+            ('Access-Control-Allow-Methods', ','.join(methods)),
+            ('Access-Control-Allow-Headers', ','.join(allow_headers)),
+            ('Access-Control-Max-Age', str(int(max_age))),
+            ('Vary', 'Origin'),
+        )
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self.handle_preflight)
+        app.after_request(self.add_cors_headers)
+
+    def allowed_origin(self, origin):
+        """The origin to reflect back, * on public paths, or None when it is not allowed"""
+        if self.public_paths and request.path.startswith(self.public_paths):
+            return '*'
+        if origin and origin in self.origins:
+            return origin
+        return None
+
+    def handle_preflight(self):
+        """Short-circuit OPTIONS preflights before any route runs"""
+        if request.method != 'OPTIONS' or 'Access-Control-Request-Method' not in request.headers:
+            return None
+
+        headers = list(self.preflight_headers)
+        origin = self.allowed_origin(request.headers.get('Origin'))
+        if origin is not None:
+            headers.append(('Access-Control-Allow-Origin', origin))
+
+        return self.app.response_class(status=204, headers=headers)
+
+    def add_cors_headers(self, response):
+        """Reflect an allowed origin on actual (non-preflight) responses"""
+        if 'Access-Control-Allow-Origin' in response.headers:
+            return response
+
+        origin = self.allowed_origin(request.headers.get('Origin'))
+        if origin is not None:
+            response.headers['Access-Control-Allow-Origin'] = origin
+        response.vary.add('Origin')
+        return response
@@ -0,0 +1,46 @@
+"""
+Phone number normalization
+One normalizer for every place that stores, indexes or sends to a phone:
+client input in any common format becomes E.164 (+<country><number>)
+"""
+import re
+
+# Chile; national numbers (9 digits, optionally with a trunk 0) get this prefix
+DEFAULT_COUNTRY_CODE = '56'
+NATIONAL_NUMBER_MAX_DIGITS = 9
+
+
+def normalize_phone(phone, default_country_code: str = DEFAULT_COUNTRY_CODE):
+    """
+    Phone number as E.164, or None if it cannot be one
+
+    Accepts "+56 9 1234 5678", "56912345678", "912345678", "0056912345678"
+    and "whatsapp:+56912345678"; all give "+56912345678".
+    """
+    if not phone or not isinstance(phone, str):
+        return None
+
+    phone = phone.strip()
+    if phone.lower().startswith('whatsapp:'):
+        phone = phone[len('whatsapp:'):].strip()
+
+    international = phone.startswith('+') or phone.startswith('00')
+    digits = re.sub(r'\D', '', phone)
+    if phone.startswith('00'):
+        digits = digits[2:]
+
+    if not international:
+        digits = digits.lstrip('0')
+        if len(digits) <= NATIONAL_NUMBER_MAX_DIGITS:
+            digits = default_country_code + digits
+
+    # E.164 allows at most 15 digits; anything this short is not a real number
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f'+{digits}'
+
+
+def whatsapp_address(phone):
+    """Twilio WhatsApp address (whatsapp:+<E.164>) for a phone, or None if it is invalid"""
+    normalized = normalize_phone(phone)
+    return f'whatsapp:{normalized}' if normalized else None
@@ -0,0 +1,94 @@
+"""
+Direct WSGI bridge for the Firebase Functions entry point
+Hands the incoming https_fn.Request environ straight to a WSGI app and streams
+the app's response back, without building a werkzeug test Client per request
+"""
+from io import BytesIO
+
+
+class WSGIBridge:
+    """Dispatch Firebase requests into a WSGI application"""
+
+    def __init__(self, app, response_class):
+        self.app = app
+        self.response_class = response_class
+
+    def build_environ(self, req) -> dict:
+        """Shallow copy of the request environ, safe to hand to another app"""
+        environ = dict(req.environ)
+
+        # If the body was already read (get_data caches it), the original input
+        # stream is exhausted - replay the cached bytes instead
+        cached_data = req.__dict__.get('_cached_data')
+        if cached_data is not None:
+            environ['wsgi.input'] = BytesIO(cached_data)
+            environ['CONTENT_LENGTH'] = str(len(cached_data))
+
+        return environ
+
+    def __call__(self, req):
+        """Run the WSGI app for req and wrap its iterable in a streamed response"""
+        environ = self.build_environ(req)
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started[:] = [status, headers]
+            return _write_not_supported
+
+        # Resolved on every call so middleware wrapped around app.wsgi_app applies
+        app_iter = self.app.wsgi_app(environ, start_response)
+
+        if not started:
+            # Lazy apps only call start_response once iteration begins
+            app_iter = _prime_iterable(app_iter)
+
+        if not started:
+            # An app that returns (even an empty iterable) without starting the response
+            # breaks the WSGI contract; fail clearly instead of unpacking an empty list
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
+            raise RuntimeError("The WSGI app returned without calling start_response")
+
+        status, headers = started
+        return self.response_class(
+            app_iter,
+            status=status,
+            headers=headers
+        )
+
+
+def _write_not_supported(data):
+    raise RuntimeError("The WSGI write() callable is not supported by WSGIBridge")
+
+
+def _prime_iterable(app_iter):
+    """Pull the first chunk so start_response runs, keeping close() reachable"""
+    iterator = iter(app_iter)
+    try:
+        first_chunk = next(iterator)
+    except StopIteration:
+        first_chunk = None
+
+    return _PrimedIterable(first_chunk, iterator, app_iter)
+
+
+class _PrimedIterable:
+    """Iterable that yields an already consumed first chunk before the rest"""
+
+    def __init__(self, first_chunk, iterator, original):
+        self.first_chunk = first_chunk
+        self.iterator = iterator
+        self.original = original
+
+    def __iter__(self):
+        if self.first_chunk is not None:
+            yield self.first_chunk
+        yield from self.iterator
+
+    def close(self):
+        close = getattr(self.original, 'close', None)
+        if close is not None:
+            close()